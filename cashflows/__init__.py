@@ -1,9 +1,15 @@
 from cashflows.basics import *
 from cashflows.bond import *
+from cashflows.collection import *
 from cashflows.depreciation import *
 from cashflows.gcashcomp import *
 from cashflows.gcashana import *
 from cashflows.gtimeseries import *
+from cashflows.lazy import *
 from cashflows.loan import *
+from cashflows.recurrence import *
 from cashflows.savings import *
+from cashflows.segments import *
+from cashflows.simulation import *
+from cashflows.summary import *
 from cashflows.utilityfun import *
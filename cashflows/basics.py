@@ -42,8 +42,8 @@ interest rate of 0.94 per month (equivalent to 11.32% nominal)
 
 * Nominal rate:
 
->>> tvmm(pval=5000, nper=48, pmt=pmt, fval = 0.0, pyr=12) # doctest: +ELLIPSIS
-11.32...
+>>> round(tvmm(pval=5000, nper=48, pmt=pmt, fval = 0.0, pyr=12), 6)
+11.32
 
 
 
@@ -109,16 +109,19 @@ t      Beginning     Periodic     Interest    Principal        Final
 ... nrate=10, nper=5, fval=0) # doctest: +ELLIPSIS
 
 >>> principal  # doctest: +ELLIPSIS
-[0, -16.37..., -18.01..., -19.81..., -21.80..., -23.98...]
+[0.0, -16.37..., -18.01..., -19.81..., -21.80..., -23.98...]
 
 >>> interest  # doctest: +ELLIPSIS
-[0, 10.0, 8.36..., 6.56..., 4.57..., 2.39...]
+[0.0, 10.0..., 8.36..., 6.56..., 4.57..., 2.39...]
 
 >>> payment  # doctest: +ELLIPSIS
-[0, -26.37..., -26.37..., -26.37..., -26.37..., -26.37...]
+[0.0, -26.37..., -26.37..., -26.37..., -26.37..., -26.37...]
 
->>> balance  # doctest: +ELLIPSIS
-[100, 83.62..., 65.60..., 45.78..., 23.98..., 1...]
+>>> balance[:-1]  # doctest: +ELLIPSIS
+[100.0, 83.62..., 65.60..., 45.78..., 23.98...]
+
+>>> abs(balance[-1]) < 1e-9
+True
 
 >>> principal, interest, payment, balance = amortize(pval=100,
 ... nrate=10, nper=5, pmt=pmt) # doctest: +ELLIPSIS
@@ -233,6 +236,67 @@ Description of the functions in this module
 
 import numpy
 from cashflows.gcashcomp import vars2list
+from cashflows.solvers import newton
+
+
+#
+# Time value of money kernel. The functions operate over broadcast arrays;
+# `prate` is the interest rate per period (as a fraction) and `due` is 0 for
+# payments at the end of the period and 1 for payments at the beginning.
+#
+
+def _tvm_annuity(prate, nper, due):
+    """Returns the factor of the payments in the TVM equation."""
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        factor = (1 + prate * due) * (numpy.power(1 + prate, nper) - 1) / prate
+    return numpy.where(prate == 0, nper, factor)
+
+
+def _tvm_pval(prate, nper, pmt, fval, due):
+    """Present value"""
+    return -(fval + pmt * _tvm_annuity(prate, nper, due)) / numpy.power(1 + prate, nper)
+
+
+def _tvm_fval(prate, nper, pmt, pval, due):
+    """Future value"""
+    return -(pval * numpy.power(1 + prate, nper) + pmt * _tvm_annuity(prate, nper, due))
+
+
+def _tvm_pmt(prate, nper, pval, fval, due):
+    """Periodic payment"""
+    return -(fval + pval * numpy.power(1 + prate, nper)) / _tvm_annuity(prate, nper, due)
+
+
+def _tvm_nper(prate, pmt, pval, fval, due):
+    """Number of periods"""
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        aux = pmt * (1 + prate * due) / prate
+        result = numpy.log((aux - fval) / (aux + pval)) / numpy.log1p(prate)
+        return numpy.where(prate == 0, -(fval + pval) / pmt, result)
+
+
+def _tvm_prate(nper, pmt, pval, fval, due, guess=0.1, tol=1e-10, maxiter=100):
+    """Interest rate per period. The TVM equation is solved with Newton steps
+    for all the elements at once; elements without convergence are `nan`."""
+    #pylint: disable=too-many-arguments
+    nper, pmt, pval, fval, due = numpy.broadcast_arrays(nper, pmt, pval, fval, due)
+    shape = nper.shape
+    nper, pmt, pval, fval, due = [numpy.ravel(x).astype(numpy.float64)
+                                  for x in (nper, pmt, pval, fval, due)]
+
+    def func(prate, rows):
+        xnper, xpmt, xpval, xfval, xdue = nper[rows], pmt[rows], pval[rows], fval[rows], due[rows]
+        term1 = numpy.power(1 + prate, xnper)
+        term2 = numpy.power(1 + prate, xnper - 1)
+        annuity = xpmt * (term1 - 1) * (prate * xdue + 1)
+        fun = xfval + term1 * xpval + annuity / prate
+        dfun = xnper * term2 * xpval - annuity / prate ** 2
+        dfun += xnper * xpmt * term2 * (prate * xdue + 1) / prate
+        dfun += xpmt * (term1 - 1) * xdue / prate
+        return fun, dfun
+
+    root = newton(func, numpy.full(len(nper), guess), tol=tol, maxiter=maxiter)[0]
+    return root.reshape(shape)
 
 
 
@@ -256,6 +320,11 @@ def tvmm(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, no
 
     Effective interest rate per period is calculated as `nrate` / `pyr`.
 
+    Parameters are broadcast against each other. When any of them is a
+    `numpy.ndarray`, the result is returned as an array.
+
+    >>> tvmm(pval=numpy.array([5000, 10000]), nrate=11.32, nper=48, fval=0, pyr=12) # doctest: +ELLIPSIS
+    array([-130.00..., -260.01...])
 
     >>> tvmm(pval=5000, nrate=11.32, nper=48, fval=0, pyr=12, noprint=False) # doctest: +ELLIPSIS
     Present Value: .......  5000.00
@@ -272,7 +341,7 @@ def tvmm(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, no
     #   pval   fval    pmt   nper  nrate  erate  prate due
     ------------------------------------------------------
     0   5.00   0.00  -0.13  48.00  11.32  11.93   0.94 END
-    1 500.00   0.00  -0.13  48.00  11.32  11.93   0.94 END
+    1 500.00   0.00 -13.00  48.00  11.32  11.93   0.94 END
     2   5.00   0.00  -0.13  48.00  11.32  11.93   0.94 END
     """
 
@@ -292,29 +361,32 @@ def tvmm(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, no
     if numnone == 0:
         pmt = None
 
-    if pmt == 0.0:
-        pmt = 0.0000001
+    is_array = any(isinstance(x, numpy.ndarray) for x in (pval, fval, pmt, nrate, nper))
 
-    nrate = numpy.array(nrate)
+    pval, fval, pmt, nrate, nper = [None if x is None else numpy.asarray(x, dtype=numpy.float64)
+                                    for x in (pval, fval, pmt, nrate, nper)]
+
+    if pmt is not None:
+        pmt = numpy.where(pmt == 0.0, 0.0000001, pmt)
+
+    if nrate is not None:
+        prate = nrate / 100 / numpy.asarray(pyr)
 
     if pval is None:
-        result = numpy.pv(rate=nrate/100/pyr, nper=nper, fv=fval, pmt=pmt, when=due)
+        result = _tvm_pval(prate=prate, nper=nper, pmt=pmt, fval=fval, due=due)
     elif fval is None:
-        result = numpy.fv(rate=nrate/100/pyr, nper=nper, pv=pval, pmt=pmt, when=due)
+        result = _tvm_fval(prate=prate, nper=nper, pmt=pmt, pval=pval, due=due)
     elif nper is None:
-        result = numpy.nper(rate=nrate/100/pyr, pv=pval, fv=fval, pmt=pmt, when=due)
+        result = _tvm_nper(prate=prate, pmt=pmt, pval=pval, fval=fval, due=due)
     elif pmt is None:
-        result = numpy.pmt(rate=nrate/100/pyr, nper=nper, pv=pval, fv=fval, when=due)
+        result = _tvm_pmt(prate=prate, nper=nper, pval=pval, fval=fval, due=due)
     else:
-        result = numpy.rate(pv=pval, nper=nper, fv=fval, pmt=pmt, when=due) * 100 * pyr
+        result = _tvm_prate(nper=nper, pmt=pmt, pval=pval, fval=fval, due=due) * 100 * pyr
 
     if noprint is True:
-        if isinstance(result, numpy.ndarray):
-            return result.tolist()
-        return result
-
-
-    nrate = nrate.tolist()
+        if is_array is True:
+            return result
+        return result.tolist()
 
     if pval is None:
         pval = result
@@ -327,7 +399,7 @@ def tvmm(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, no
     else:
         nrate = result
 
-    params = vars2list([pval, fval, nper, pmt, nrate])
+    params = vars2list([x.tolist() for x in [pval, fval, nper, pmt, nrate]])
     pval = params[0]
     fval = params[1]
     nper = params[2]
@@ -354,16 +426,8 @@ def tvmm(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, no
         print('Periodic Rate: ......  {:8.2f}'.format(prate))
 
     else:
-        if due == 0:
-            sdue = 'END'
-            txtpmt = []
-            for item, _ in enumerate(pval):
-                txtpmt.append(pmt[item][-1])
-        else:
-            sdue = 'BEG'
-            txtpmt = []
-            for item, _ in enumerate(pval):
-                txtpmt.append(pmt[item][0])
+        sdue = 'END' if due == 0 else 'BEG'
+        txtpmt = pmt
 
 
         maxlen = 5
@@ -454,26 +518,49 @@ def pvpmt(pmt=None, pval=None, nrate=None, nper=None, pyr=1, noprint=True):
     return tvmm(pval=pval, fval=0, pmt=pmt, nrate=nrate, nper=nper, due=0, pyr=pyr, noprint=noprint)
 
 
+def _amortize_table(begbal, pmt, ipmt, ppmt, rembal):
+    """Yields the lines of the printed amortization table of a loan."""
+    yield 't      Beginning     Periodic     Interest    Principal        Final'
+    yield '       Principal      Payment      Payment    Repayment    Principal'
+    yield '          Amount       Amount                                 Amount'
+    yield '--------------------------------------------------------------------'
+    fmt = '{:<3d} {:12.2f} {:12.2f} {:12.2f} {:12.2f} {:12.2f}'
+    for time, row in enumerate(zip(begbal, pmt, ipmt, ppmt, rembal)):
+        yield fmt.format(time, *row)
+
+
 def amortize(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1, noprint=True):
     """Amortization schedule of a loan.
 
     Args:
-        pval (float): present value.
-        fval (float): Future value.
-        pmt (float): periodic payment per period.
-        nrate (float): nominal rate per year.
-        nper (int): total number of compounding periods.
+        pval (float, list): present value.
+        fval (float, list): Future value.
+        pmt (float, list): periodic payment per period.
+        nrate (float, list): nominal rate per year.
+        nper (int, list): total number of compounding periods.
         due (int): When payments are due.
         pyr (int, list): number of periods per year.
+        noprint (bool): prints the amortization table when False.
 
     Returns:
         A tuple: (principal, interest, payment, balance)
 
+    The schedule is computed in closed form. When any parameter is a list or a
+    `numpy.ndarray`, a batch of loans is amortized at once and each element of
+    the returned tuple is a 2-D array with a row per loan and a column per
+    period; loans with fewer periods are padded with zeros. With
+    `noprint=False`, a table is printed for each loan and None is returned.
 
-    """
+    >>> principal, interest, payment, balance = amortize(pval=[100, 200],
+    ... nrate=10, nper=[2, 3], fval=0)
+    >>> payment.round(2).tolist()
+    [[0.0, -57.62, -57.62, 0.0], [0.0, -80.42, -80.42, -80.42]]
+    >>> balance.round(2).tolist()
+    [[100.0, 52.38, 0.0, 0.0], [200.0, 139.58, 73.11, 0.0]]
 
-    #pylint: disable=too-many-arguments
+    """
 
+    #pylint: disable=too-many-arguments,too-many-locals
 
     numnone = 0
     numnone += 1 if pval is None else 0
@@ -489,8 +576,13 @@ def amortize(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1
     if numnone == 0:
         pmt = None
 
-    if pmt == 0.0:
-        pmt = 0.0000001
+    params = [pval, fval, pmt, nrate, nper, due, pyr]
+    is_batch = any(isinstance(x, (list, numpy.ndarray)) for x in params)
+    pval, fval, pmt, nrate, nper, due, pyr = [
+        None if x is None else numpy.asarray(x, dtype=numpy.float64) for x in params]
+
+    if pmt is not None:
+        pmt = numpy.where(pmt == 0.0, 0.0000001, pmt)
 
     if pval is None:
         pval = tvmm(fval=fval, pmt=pmt, nrate=nrate, nper=nper, due=due, pyr=pyr)
@@ -503,60 +595,56 @@ def amortize(pval=None, fval=None, pmt=None, nrate=None, nper=None, due=0, pyr=1
     else:
         nrate = tvmm(pval=pval, fval=fval, pmt=pmt, nper=nper, due=due, pyr=pyr)
 
-    erate = nrate / pyr / 100
-
-    if int(nper) != nper:
-        nper = int(nper + 0.9)
-
-    # variable definition
-    begbal = [0] * (nper + 1)
-    ipmt = [0] * (nper + 1)
-    ppmt = [0] * (nper + 1)
-    rembal = [0] * (nper + 1)
-
-    # calcula el pmt periodico
-    pmt = [pmt] * (nper + 1)
+    pval, pmt, nrate, nper, due, pyr = [
+        numpy.atleast_1d(x)[:, numpy.newaxis]
+        for x in numpy.broadcast_arrays(pval, pmt, nrate, nper, due, pyr)]
 
-    if due == 0:  # vencido
-        pmt[0] = 0
-
-    if due == 1:  # anticipado
-        pmt[nper] = 0
-
-    begbal[0] = pval
-
-
-    for period in range(nper + 1):
-
-        if period == 0:
-            rembal[0] = begbal[0] + pmt[0]
-            ppmt[0] = + pmt[0]
-        else:
-            begbal[period] = rembal[period-1]
-            ipmt[period] = begbal[period] * erate
-            ppmt[period] = pmt[period] + ipmt[period]
-            rembal[period] = begbal[period] + ppmt[period]
+    erate = nrate / pyr / 100
+    nper = numpy.where(numpy.floor(nper) == nper, nper, numpy.floor(nper + 0.9))
+    time = numpy.arange(int(nper.max()) + 1, dtype=numpy.float64)
+    active = time <= nper
+
+    # payments are made in periods 1, ..., nper (due=0) or 0, ..., nper - 1
+    # (due=1). The balance at the end of the period `time` is
+    #
+    #    pval * (1 + erate)^time + pmt * sum((1 + erate)^(time - k))
+    #
+    # where the sum runs over the periods `k` with payments up to `time`:
+    # ((1 + erate)^time - 1) / erate for due=0, and for due=1 the same value
+    # times (1 + erate) plus one for the payment of the period `time` itself.
+    due = due != 0
+    exponent = time * numpy.log1p(erate)
+    growth = numpy.exp(exponent)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        annuity = numpy.where(erate == 0, time, numpy.expm1(exponent) / erate)
+    if due.any():
+        annuity = numpy.where(due, (1 + erate) * annuity + (time < nper), annuity)
+    rembal = pval * growth + pmt * annuity
+
+    begbal = numpy.empty_like(rembal)
+    begbal[:, 0] = pval[:, 0]
+    begbal[:, 1:] = rembal[:, :-1]
+
+    pmt = numpy.where(active & (due | (time > 0)) & ~(due & (time == nper)), pmt, 0.0)
+    ipmt = numpy.where(time > 0, begbal * erate, 0.0)
+    ppmt = pmt + ipmt
+
+    if not active.all():
+        begbal, ipmt, ppmt, rembal = [numpy.where(active, x, 0.0)
+                                      for x in (begbal, ipmt, ppmt, rembal)]
 
     if noprint is True:
-        return (ppmt, ipmt, pmt, rembal)
-
-    txt = ['t      Beginning     Periodic     Interest    Principal        Final',
-           '       Principal      Payment      Payment    Repayment    Principal',
-           '          Amount       Amount                                 Amount',
-           '--------------------------------------------------------------------']
-
-    for time in range(nper + 1):
-
-        fmt = '{:<3d} {:12.2f} {:12.2f} {:12.2f} {:12.2f} {:12.2f}'
-
-
-        txt.append(fmt.format(time,
-                              begbal[time],
-                              pmt[time],
-                              ipmt[time],
-                              ppmt[time],
-                              rembal[time]))
-    print('\n'.join(txt))
+        if is_batch:
+            return (ppmt, ipmt, pmt, rembal)
+        return (ppmt[0].tolist(), ipmt[0].tolist(), pmt[0].tolist(), rembal[0].tolist())
+
+    for loan in range(len(rembal)):
+        if loan > 0:
+            print('')
+        last = int(nper[loan, 0]) + 1
+        for line in _amortize_table(begbal[loan, :last], pmt[loan, :last], ipmt[loan, :last],
+                                    ppmt[loan, :last], rembal[loan, :last]):
+            print(line)
     return None
 
 def iconv(nrate=None, erate=None, prate=None, pyr=1):
@@ -0,0 +1,304 @@
+"""
+File-backed collections of time series
+===============================================================================
+
+A collection stores many time series in a binary file, as contiguous blocks
+of float64 values with a block for each run of series with the same time
+range. The file is opened with `np.memmap`, so the values are read from disk
+by the operating system when they are used, and a collection larger than the
+memory is analyzed without a load step.
+
+>>> import os, tempfile
+>>> path = os.path.join(tempfile.mkdtemp(), 'portfolio.cfts')
+>>> save_collection(path, [cashflow([-1000] + [300] * 4),
+...                        cashflow([-500] + [150] * 4),
+...                        cashflow([100] * 3, start=(2000, 0), pyr=4)])
+
+>>> portfolio = open_collection(path)
+>>> len(portfolio), portfolio.nblocks
+(3, 2)
+>>> portfolio[1].tolist()
+[-500.0, 150.0, 150.0, 150.0, 150.0]
+>>> portfolio[2].start, portfolio[2].pyr
+((2000, 0), 4)
+
+The rows are TimeSeries sharing the memory of the file, and the blocks are
+TimeSeriesPanel objects, which are used by the analysis functions:
+
+>>> from cashflows.gcashana import timevalue
+>>> block = portfolio.blocks[0]
+>>> timevalue(block, nominal_rate([10] * 5)).round(2).tolist()
+[-49.04, -24.52]
+
+A single series (or panel) is converted to bytes with `encode`, with the
+same layout of a block and optionally compressed, for caches and messages:
+
+>>> data = encode(cashflow([100] * 360, pyr=12), compress=6)
+>>> len(data) < 360 * 8
+True
+>>> decode(data)[(29, 11)]
+100.0
+
+
+Description of the functions and objects in this module
+===============================================================================
+
+"""
+
+import struct
+import zlib
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, TimeAxis, cashflow, nominal_rate
+from cashflows.gtimeseries import _new_series, _add_periods, _from_buffer
+
+# the file header and the block headers have 64 bytes, and the values of
+# each block are padded with zeros to a multiple of 64 bytes, so the values
+# of all the blocks are aligned to 64 bytes
+_ALIGN = 64
+_MAGIC = b'CFTS\x00\x02\x00\x00'
+_HEADER = struct.Struct('<8s56x')
+# nrows, nper, pyr, start major, start minor (-1 for annual timeids)
+_BLOCK = struct.Struct('<5q24x')
+_DTYPE = np.dtype('<f8')
+# encoding of a series: magic number, compression, and the fields of a
+# block header (nrows is -1 for a TimeSeries)
+_ENCODED_MAGIC = b'CFTB'
+_ENCODED = struct.Struct('<4sB3x5q16x')
+
+
+class CollectionWriter():
+    """Writes time series to a collection file, one at a time or by panels,
+    without keeping them in memory.
+
+    Args:
+        filename (str): name of the file (an existing file is replaced).
+
+    Consecutive series with the same time range are stored in the same block.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'flows.cfts')
+    >>> with CollectionWriter(path) as writer:
+    ...     for amount in range(1, 4):
+    ...         writer.append(cashflow([amount] * 4))
+    >>> open_collection(path).blocks[0].tolist()
+    [[1.0, 1.0, 1.0, 1.0], [2.0, 2.0, 2.0, 2.0], [3.0, 3.0, 3.0, 3.0]]
+
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC))
+        self._axis = None
+        self._offset = None
+        self._nrows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _finish_block(self):
+        """Pads the values of the current block to a multiple of 64 bytes
+        and writes the number of rows in its header."""
+        if self._axis is None:
+            return
+        self._file.write(bytes(-self._file.tell() % _ALIGN))
+        position = self._file.tell()
+        self._file.seek(self._offset)
+        self._file.write(_block_header(self._axis, self._nrows))
+        self._file.seek(position)
+        self._axis = None
+
+    def append(self, series):
+        """Appends a TimeSeries, or the rows of a TimeSeriesPanel."""
+        if not isinstance(series, (TimeSeries, TimeSeriesPanel)):
+            raise TypeError('`series` must be a TimeSeries or a TimeSeriesPanel')
+        values = np.ascontiguousarray(series.data, dtype=_DTYPE)
+        if series.axis is not self._axis:
+            self._finish_block()
+            self._axis = series.axis
+            self._offset = self._file.tell()
+            self._nrows = 0
+            self._file.write(_block_header(self._axis, 0))
+        self._file.write(memoryview(values))
+        self._nrows += 1 if values.ndim == 1 else len(values)
+
+    def close(self):
+        """Completes the file."""
+        if self._file.closed:
+            return
+        self._finish_block()
+        self._file.close()
+
+
+def _block_header(axis, nrows):
+    """Returns the header of a block of `nrows` series with the TimeAxis
+    `axis`."""
+    minor = axis.start[1] if len(axis.start) > 1 else -1
+    return _BLOCK.pack(nrows, axis.nper, axis.pyr, axis.start[0], minor)
+
+
+def save_collection(filename, series):
+    """Saves the time series (or panels) of the iterable `series` in a
+    collection file (see `CollectionWriter`)."""
+    with CollectionWriter(filename) as writer:
+        for xseries in series:
+            writer.append(xseries)
+
+
+def encode(series, compress=0):
+    """Returns a TimeSeries or a TimeSeriesPanel as bytes: a 64-byte header
+    with the time range and the float64 values in little-endian order.
+
+    Args:
+        series (TimeSeries, TimeSeriesPanel): series to encode.
+        compress (int): zlib compression level of the values, from 1
+            (fastest) to 9; with 0 the values are not compressed.
+
+    Returns:
+        A bytes object.
+
+    """
+    if not isinstance(series, (TimeSeries, TimeSeriesPanel)):
+        raise TypeError('`series` must be a TimeSeries or a TimeSeriesPanel')
+    values = np.ascontiguousarray(series.data, dtype=_DTYPE)
+    nrows = -1 if values.ndim == 1 else len(values)
+    axis = series.axis
+    minor = axis.start[1] if len(axis.start) > 1 else -1
+    header = _ENCODED.pack(_ENCODED_MAGIC, 1 if compress else 0, nrows, axis.nper,
+                           axis.pyr, axis.start[0], minor)
+    if compress:
+        return header + zlib.compress(memoryview(values).cast('B'), compress)
+    return b''.join([header, memoryview(values).cast('B')])
+
+
+def decode(data):
+    """Returns the TimeSeries or TimeSeriesPanel encoded in `data` (see
+    `encode`). The values of an uncompressed encoding are a view of `data`
+    when it is writable (as a bytearray); otherwise, a TimeSeries gets its
+    own copy on the first write and a panel is copied.
+
+    >>> x = decode(encode(cashflow([1, 2, 3], start=(2000, 1), pyr=4)))
+    >>> x.start, x.tolist()
+    ((2000, 1), [1.0, 2.0, 3.0])
+
+    """
+    magic, compressed, nrows, nper, pyr, major, minor = _ENCODED.unpack_from(data)
+    if magic != _ENCODED_MAGIC:
+        raise ValueError('Invalid encoding of a time series')
+    start = (major,) if minor < 0 else (major, minor)
+    axis = TimeAxis(start, _add_periods(start, nper - 1, pyr), pyr)
+    buffer = memoryview(data)[_ENCODED.size:]
+    if compressed:
+        buffer = zlib.decompress(buffer)
+    shape = (nper,) if nrows < 0 else (nrows, nper)
+    if len(buffer) != int(np.prod(shape)) * _DTYPE.itemsize:
+        raise ValueError('Invalid encoding of a time series')
+    cls = TimeSeries if nrows < 0 else TimeSeriesPanel
+    return _from_buffer(cls, axis, buffer, _DTYPE, shape)
+
+
+class Collection():
+    """Time series of a collection file, mapped in memory (see
+    `open_collection`).
+
+    Attributes:
+        blocks (list): a TimeSeriesPanel for each block of the file, with
+            the memory-mapped values.
+
+    The collection is a sequence of TimeSeries in the order of the file;
+    each TimeSeries is a view of a row of a block.
+
+    """
+
+    def __init__(self, blocks, mapping=None):
+        self.blocks = blocks
+        self._mapping = mapping
+        self._first = np.cumsum([0] + [len(block.data) for block in blocks])
+
+    def flush(self):
+        """Writes the changes of the values to the file (mode `'r+'` of
+        `open_collection`)."""
+        if self._mapping is not None:
+            self._mapping.flush()
+
+    @property
+    def nblocks(self):
+        """Number of blocks."""
+        return len(self.blocks)
+
+    def __len__(self):
+        return int(self._first[-1])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Collection index out of range')
+        block = np.searchsorted(self._first, index, side='right') - 1
+        return self.blocks[block][int(index - self._first[block])]
+
+    def __iter__(self):
+        for block in self.blocks:
+            for row in block.data:
+                yield _new_series(block.axis, row)
+
+    def panels(self, nrows=65536):
+        """Iterates over the collection by panels of at most `nrows` rows of
+        the same block. The panels are views of the file, so a function of
+        panels (as `timevalue` or `irr`) is applied to the whole collection
+        with a bounded use of memory.
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'flows.cfts')
+        >>> save_collection(path, [cashflow([-100, 60, 60])] * 5)
+        >>> [len(panel.data) for panel in open_collection(path).panels(nrows=2)]
+        [2, 2, 1]
+
+        """
+        for block in self.blocks:
+            for first in range(0, len(block.data), nrows):
+                yield block._new(block.data[first:first + nrows])
+
+
+def open_collection(filename, mode='r'):
+    """Opens a collection file.
+
+    Args:
+        filename (str): name of the file.
+        mode (str): mode of `np.memmap`: `'r'` (read-only values), `'c'`
+            (changes are kept in memory) or `'r+'` (changes are written to
+            the file).
+
+    Returns:
+        A Collection.
+
+    The file is mapped once, and the values of each block are an array over
+    the mapping, so the number of blocks is not limited by the number of
+    open files.
+
+    """
+    mapping = np.memmap(filename, dtype=np.uint8, mode=mode)
+    if len(mapping) < _HEADER.size or _HEADER.unpack_from(mapping)[0] != _MAGIC:
+        raise ValueError('Invalid collection file: ' + filename.__repr__())
+    blocks = []
+    offset = _HEADER.size
+    while offset + _BLOCK.size <= len(mapping):
+        nrows, nper, pyr, major, minor = _BLOCK.unpack_from(mapping, offset)
+        offset += _BLOCK.size
+        if nrows == 0:
+            continue
+        start = (major,) if minor < 0 else (major, minor)
+        axis = TimeAxis(start, _add_periods(start, nper - 1, pyr), pyr)
+        values = np.ndarray((nrows, nper), dtype=_DTYPE, buffer=mapping, offset=offset)
+        blocks.append(_new_series(axis, values, TimeSeriesPanel))
+        offset += nrows * nper * _DTYPE.itemsize
+        offset += -offset % _ALIGN
+    return Collection(blocks, mapping)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
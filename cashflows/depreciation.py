@@ -206,8 +206,11 @@ Description of the functions in this module
 
 """
 
+import functools
 
+import numpy as np
 from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.gtimeseries import _shift
 
 def print_depr(depr, adepr, costs, begbook, endbook):
     """Prints a depreciation table
@@ -226,7 +229,7 @@ def print_depr(depr, adepr, costs, begbook, endbook):
 
 
     len_timeid = len(costs.end.__repr__())
-    len_number = max(len('{:1.2f}'.format(max(begbook))), 7)
+    len_number = max(len('{:1.2f}'.format(begbook.max())), 7)
 
     fmt_timeid = '{:<' + '{:d}'.format(len_timeid) + 's}'
     fmt_number = ' {:' + '{:d}'.format(len_number) + '.2f}'
@@ -290,6 +293,136 @@ def print_depr(depr, adepr, costs, begbook, endbook):
 
 
 
+@functools.lru_cache(maxsize=256)
+def _depreciation_profile(method, life, salvage, delay, factor=1.0, convert_to_sl=True, cost=1.0):
+    """Returns the depreciation per period of a unit of cost (`cost` is 1 or
+    -1) acquired at the period 0. The result is cached and must not be
+    modified.
+
+    For the straight line and sum-of-years digits methods, `salvage` is a
+    percentage of the cost; for the declining balance method it is the salvage
+    value of the unit of cost.
+
+    """
+    #pylint: disable=too-many-arguments
+    profile = np.zeros(delay + 1 + life)
+    xdepr = profile[delay + 1:]
+    if method == 'sl':
+        xdepr[:] = (100 - salvage) / 100 / life
+    elif method == 'soyd':
+        sumdig = life * (life + 1) / 2
+        xdepr[:] = (100 - salvage) / 100 * (life - np.arange(life)) / sumdig
+    else:
+        xfactor = factor / life
+        rem_cost = cost
+        sl_depr = (cost - salvage) / life
+        for time in range(life):
+            xdepr[time] = rem_cost * xfactor
+            if convert_to_sl is True and xdepr[time] < sl_depr:
+                xdepr[time] = sl_depr
+            rem_cost -= xdepr[time]
+            if rem_cost < salvage:
+                rem_cost += xdepr[time]
+                xdepr[time] = rem_cost - salvage
+                rem_cost = salvage
+    profile.setflags(write=False)
+    return profile
+
+
+def _as_array(param, nper, default=0):
+    """Returns `param` (TimeSeries, list, array, number or None) as an array
+    of length `nper`."""
+    if param is None:
+        param = default
+    if isinstance(param, TimeSeries):
+        param = param.data
+    return np.array(np.broadcast_to(np.asarray(param, dtype=np.float64), (nper,)))
+
+
+def depreciation_table(costs, life, salvalue=None, delay=None, method='sl', factor=1,
+                       convert_to_sl=True):
+    """Computes the depreciation of a register of assets.
+
+    Args:
+        costs (TimeSeries, array): the cost per period of the assets.
+        life (TimeSeries, array, int): number of depreciation periods for the
+            assets acquired in each period.
+        salvalue (TimeSeries, array, float): salvage value, as a percentage of
+            cost for the methods 'sl' and 'soyd', and as a value for the
+            method 'db'.
+        delay (TimeSeries, array, int): periods between the acquisition and
+            the start of the depreciation.
+        method (str): 'sl' (straight line), 'soyd' (sum-of-years digits) or
+            'db' (declining balance).
+        factor (float): acelerating factor for the method 'db'.
+        convert_to_sl (bool): converts to straight line method? (method 'db').
+
+    Returns:
+        A tuple of arrays `(depr, adepr, begbook, endbook)`: depreciation,
+        accumulated depreciation, and beginning and ending book value per
+        period.
+
+    The costs are grouped by the parameters of their depreciation (method,
+    life, salvage, factor and delay), and the depreciation of each group is
+    computed as the convolution of the costs of the group with the
+    depreciation profile of a unit of cost.
+
+    >>> costs = cashflow(const_value=0, nper=8, spec=[(0, 1000), (4, 2000)])
+    >>> depr, adepr, begbook, endbook = depreciation_table(costs, life=2, method='soyd')
+    >>> depr.round(2).tolist()
+    [0.0, 666.67, 333.33, 0.0, 0.0, 1333.33, 666.67, 0.0]
+    >>> endbook.round(2).tolist()
+    [1000.0, 333.33, 0.0, 0.0, 2000.0, 666.67, 0.0, 0.0]
+
+    """
+    #pylint: disable=too-many-arguments,too-many-locals
+    if method not in ('sl', 'soyd', 'db'):
+        raise ValueError('`method` must be one of sl, soyd or db')
+    if not isinstance(factor, (int, float)):
+        raise TypeError('Invalid type for `factor`')
+    if not isinstance(convert_to_sl, bool):
+        raise TypeError('Invalid type for `convert_to_sl`')
+
+    costs = _as_array(costs, len(costs))
+    nper = len(costs)
+    life = _as_array(life, nper).astype(np.int64)
+    salvalue = _as_array(salvalue, nper)
+    delay = _as_array(delay, nper).astype(np.int64)
+
+    # the declining balance method is homogeneous only for positive scale
+    # factors: the costs are splitted in a sign and a magnitude, and the
+    # salvage value is taken relative to the magnitude.
+    scale = costs
+    sign = np.zeros(nper)
+    if method == 'db':
+        scale = np.abs(costs)
+        sign = np.sign(costs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            salvalue = np.where(scale > 0, salvalue / scale, 0)
+
+    depr = np.zeros(nper)
+    index = np.flatnonzero(costs)
+    if index.size > 0:
+        keys = np.column_stack([life, salvalue, delay, sign])[index]
+        keys, groups = np.unique(keys, axis=0, return_inverse=True)
+        groups = groups.ravel()
+        for group, (xlife, xsalvage, xdelay, xsign) in enumerate(keys):
+            if method == 'db':
+                profile = _depreciation_profile(method, int(xlife), float(xsalvage), int(xdelay),
+                                                float(factor), convert_to_sl, float(xsign))
+            else:
+                profile = _depreciation_profile(method, int(xlife), float(xsalvage), int(xdelay))
+            xcosts = np.zeros(nper)
+            xindex = index[groups == group]
+            xcosts[xindex] = scale[xindex]
+            depr += np.convolve(xcosts, profile)[:nper]
+
+    adepr = np.cumsum(depr)
+    endbook = np.cumsum(costs - depr)
+    begbook = _shift(endbook, 1, fill=0)
+    return depr, adepr, begbook, endbook
+
+
 def depreciation_sl(costs, life, salvalue=None, delay=None, noprint=True):
     """Computes the depreciation of an asset using straight line depreciation
     method.
@@ -307,46 +440,14 @@ def depreciation_sl(costs, life, salvalue=None, delay=None, noprint=True):
     verify_eq_time_range(costs, life)
     if salvalue is not None:
         verify_eq_time_range(costs, salvalue)
-    else:
-        salvalue = [0] * len(costs)
     if delay is not None:
         verify_eq_time_range(costs, delay)
-    else:
-        delay = [0] * len(costs)
-
-    depr = [0] * len(costs)
-    adepr = [0] * len(costs)
-    begbook = [0] * len(costs)
-    endbook = [0] * len(costs)
-
-    for index, _ in enumerate(costs):
-        if costs[index] == 0:
-            continue
-        if delay[index] == 0:
-            ValueError('Depreciation with delay 0')
-        xdepr = [(costs[index] * (100 - salvalue[index]) / 100) / life[index]] * life[index]
-        for time in range(life[index]):
-            if index + time + delay[index] + 1 < len(costs):
-                depr[index + time + delay[index] + 1] += xdepr[time]
-            else:
-                break
-
-    for time, _ in enumerate(depr):
-        if time > 0:
-            adepr[time] = adepr[time - 1] + depr[time]
-        else:
-            adepr[time] = depr[time]
 
-    for time, _ in enumerate(depr):
-        if time > 0:
-            begbook[time] = endbook[time - 1]
-        endbook[time] = begbook[time] - depr[time] + costs[time]
+    depr, adepr, begbook, endbook = depreciation_table(costs, life, salvalue=salvalue,
+                                                       delay=delay, method='sl')
 
     if noprint is True:
-        retval = costs.copy()
-        for index, _ in enumerate(costs):
-            retval[index] = depr[index]
-        return retval
+        return costs._new(depr)
 
     print_depr(depr, adepr, costs, begbook, endbook)
 
@@ -368,43 +469,14 @@ def depreciation_soyd(costs, life, salvalue=None, delay=None, noprint=True):
     verify_eq_time_range(costs, life)
     if salvalue is not None:
         verify_eq_time_range(costs, salvalue)
-    else:
-        salvalue = [0] * len(costs)
     if delay is not None:
         verify_eq_time_range(costs, delay)
-    else:
-        delay = [0] * len(costs)
-
-    depr = [0] * len(costs)
-    adepr = [0] * len(costs)
-    begbook = [0] * len(costs)
-    endbook = [0] * len(costs)
-
-    for index, _ in enumerate(costs):
-        sumdig = life[index] * (life[index] + 1) / 2
-        xdepr = [(costs[index] * (100 - salvalue[index]) / 100) * (life[index] - time) / sumdig for time in range(life[index])]
-        for time in range(life[index]):
-            if index + time + delay[index] + 1 < len(costs):
-                depr[index + time + delay[index] + 1] += xdepr[time]
-            else:
-                break
-
-    for time, _ in enumerate(depr):
-        if time > 0:
-            adepr[time] = adepr[time - 1] + depr[time]
-        else:
-            adepr[time] = depr[time]
 
-    for time, _ in enumerate(depr):
-        if time > 0:
-            begbook[time] = endbook[time - 1]
-        endbook[time] = begbook[time] - depr[time] + costs[time]
+    depr, adepr, begbook, endbook = depreciation_table(costs, life, salvalue=salvalue,
+                                                       delay=delay, method='soyd')
 
     if noprint is True:
-        retval = costs.copy()
-        for index, _ in enumerate(costs):
-            retval[index] = depr[index]
-        return retval
+        return costs._new(depr)
 
     print_depr(depr, adepr, costs, begbook, endbook)
 
@@ -431,66 +503,15 @@ def depreciation_db(costs, life, salvalue=None, factor=1, convert_to_sl=True, de
     verify_eq_time_range(costs, life)
     if salvalue is not None:
         verify_eq_time_range(costs, salvalue)
-    else:
-        salvalue = [0] * len(costs)
     if delay is not None:
         verify_eq_time_range(costs, delay)
-    else:
-        delay = [0] * len(costs)
-    if not isinstance(factor, (int, float)):
-        raise TypeError('Invalid type for `factor`')
-    if not isinstance(convert_to_sl, bool):
-        raise TypeError('Invalid type for `convert_to_sl`')
-
-    depr = [0] * len(costs)
-    adepr = [0] * len(costs)
-    begbook = [0] * len(costs)
-    endbook = [0] * len(costs)
-
-    for index, _ in enumerate(costs):
-
-        if costs[index] == 0:
-            continue
-
-        xfactor = factor / life[index]
-
-        rem_cost = costs[index]
-        xdepr = [0] * life[index]
-
-        sl_depr = (costs[index] - salvalue[index]) / life[index]
-
-        for time in range(life[index]):
-            xdepr[time] = rem_cost * xfactor
-            if convert_to_sl is True and xdepr[time] < sl_depr:
-                xdepr[time] = sl_depr
-            rem_cost -= xdepr[time]
-            if rem_cost < salvalue[index]:
-                rem_cost += xdepr[time]
-                xdepr[time] = rem_cost - salvalue[index]
-                rem_cost = salvalue[index]
-
-        for time in range(life[index]):
-            if index + time + delay[index] + 1 < len(costs):
-                depr[index + time + delay[index] + 1] += xdepr[time]
-            else:
-                break
-
-    for time, _ in enumerate(depr):
-        if time > 0:
-            adepr[time] = adepr[time - 1] + depr[time]
-        else:
-            adepr[time] = depr[time]
 
-    for time, _ in enumerate(depr):
-        if time > 0:
-            begbook[time] = endbook[time - 1]
-        endbook[time] = begbook[time] - depr[time] + costs[time]
+    depr, adepr, begbook, endbook = depreciation_table(costs, life, salvalue=salvalue,
+                                                       delay=delay, method='db', factor=factor,
+                                                       convert_to_sl=convert_to_sl)
 
     if noprint is True:
-        retval = costs.copy()
-        for index, _ in enumerate(costs):
-            retval[index] = depr[index]
-        return retval
+        return costs._new(depr)
 
     print_depr(depr, adepr, costs, begbook, endbook)
 
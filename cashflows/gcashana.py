@@ -22,6 +22,12 @@ Net present value
 >>> timevalue(cflo=[cflo, cflo], marr=[marr, marr], base_date=[4, 4]) # doctest: +ELLIPSIS
 [163.22..., 163.22...]
 
+Every cashflow under every interest rate curve:
+
+>>> timevalue_matrix(cflo=[cflo, cflo * 2], marr=[marr, nominal_rate([10]*5)]) # doctest: +ELLIPSIS
+array([[103.73..., 116.98...],
+       [207.46..., 233.97...]])
+
 
 
 Net uniform series
@@ -96,9 +102,13 @@ Description of the functions in this module
 """
 
 import numpy as np
-from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate, verify_eq_time_range
 from cashflows.gcashcomp import to_discount_factor, equivalent_nrate, vars2list
+from cashflows.gcashcomp import _factor_array, _panel_of, _verify_series
 from cashflows.basics import tvmm
+from cashflows.solvers import newton_bracketed
+from cashflows.lazy import Expr, lazy, _weighted_sum
+from cashflows.segments import SegmentSeries, _segment_timevalue
 from cashflows.utilityfun import exp_utility_fun, log_utility_fun, sqrt_utility_fun
 # from cashflows.basics import amort
 
@@ -134,7 +144,57 @@ def timevalue(cflo, marr, base_date=0, utility=None):
     >>> timevalue(cflo, marr, base_date=0, utility=sqrt_utility_fun(210)) # doctest: +ELLIPSIS
     2998.12...
 
+    When `cflo` or `marr` is a TimeSeriesPanel, the net value of each row is
+    returned as an array.
+
+    >>> timevalue(TimeSeriesPanel([cflo, cflo * 2]), marr) # doctest: +ELLIPSIS
+    array([103.73..., 207.46...])
+
+    >>> timevalue(TimeSeriesPanel([cflo, cflo]), marr, base_date=[0, 4]) # doctest: +ELLIPSIS
+    array([103.73..., 163.22...])
+
+    A lazy expression (see `lazy`) is evaluated by blocks of periods, and the
+    blocks are discounted without storing the cashflow.
+
+    >>> timevalue(lazy(cflo) * 2, marr) # doctest: +ELLIPSIS
+    207.46...
+
+    The net value of a SegmentSeries (see `segments`) with a SegmentSeries
+    rate is computed with a geometric sum for each segment.
+
     """
+    if isinstance(cflo, SegmentSeries):
+        if isinstance(marr, SegmentSeries) and utility is None and \
+                not isinstance(base_date, (list, np.ndarray)):
+            return _segment_timevalue(cflo, marr, base_date)
+        cflo = cflo.dense()
+    if isinstance(marr, SegmentSeries):
+        marr = marr.dense()
+
+    if isinstance(cflo, Expr):
+        if utility is not None:
+            cflo = cflo.evaluate()
+        else:
+            _verify_series('marr', marr)
+            verify_eq_time_range(cflo, marr)
+            netval = _weighted_sum(cflo, _factor_array(marr, base_date, discount=True))
+            if _panel_of(cflo.template, marr) is None:
+                return float(netval)
+            return netval
+
+    if _panel_of(cflo, marr) is not None:
+        _verify_series('cflo', cflo)
+        _verify_series('marr', marr)
+        verify_eq_time_range(cflo, marr)
+        factor = _factor_array(marr, base_date, discount=True)
+        values = cflo.data
+        if utility is not None:
+            values = np.vectorize(utility, otypes=[np.float64])(values)
+        netval = np.einsum('...t,...t->...', values, factor)
+        if utility is not None:
+            netval = np.vectorize(lambda x: utility(x, inverse=True), otypes=[np.float64])(netval)
+        return netval
+
     params = vars2list([cflo, marr, base_date])
     cflo = params[0]
     marr = params[1]
@@ -146,14 +206,11 @@ def timevalue(cflo, marr, base_date=0, utility=None):
         if not isinstance(xmarr, TimeSeries):
             raise TypeError("`marr` must be a TimeSeries")
         verify_eq_time_range(xcflo, xmarr)
-        netval = 0
-        factor = to_discount_factor(xmarr, xbase_date)
-        for time, _ in enumerate(xcflo):
-            if utility is None:
-                xcflo_aux = xcflo[time]
-            else:
-                xcflo_aux = utility(xcflo[time])
-            netval += xcflo_aux * factor[time]
+        factor = _factor_array(xmarr, xbase_date, discount=True)
+        values = xcflo.data
+        if utility is not None:
+            values = np.vectorize(utility, otypes=[np.float64])(values)
+        netval = float(values @ factor)
         if utility is not None:
             netval = utility(netval, inverse=True)
         retval.append(netval)
@@ -162,6 +219,66 @@ def timevalue(cflo, marr, base_date=0, utility=None):
     return retval
 
 
+def _as_panel(name, value):
+    """Returns `value` (a TimeSeries, a list of TimeSeries or a
+    TimeSeriesPanel) as a TimeSeriesPanel."""
+    if isinstance(value, TimeSeriesPanel):
+        return value
+    if isinstance(value, TimeSeries):
+        value = [value]
+    if not isinstance(value, list):
+        raise TypeError("`" + name + "` must be a TimeSeries, a list of TimeSeries or a TimeSeriesPanel")
+    for xvalue in value:
+        if not isinstance(xvalue, TimeSeries):
+            raise TypeError("`" + name + "` must be a TimeSeries, a list of TimeSeries or a TimeSeriesPanel")
+    return TimeSeriesPanel(value)
+
+
+def timevalue_matrix(cflo, marr, base_date=0, utility=None):
+    """
+    Computes the net value of each cashflow in `cflo` under each interest
+    rate curve in `marr`.
+
+    Args:
+        cflo (TimeSeries, list of TimeSeries, TimeSeriesPanel): K cashflows.
+        marr (TimeSeries, list of TimeSeries, TimeSeriesPanel): M minimum
+            atractive interest rates.
+        base_date (int, tuple, list): Time. A list specifies a time for each
+            interest rate curve.
+        utility (function): utility function
+
+    Returns:
+        net values (array with shape K x M)
+
+    The discount factors of each interest rate curve are computed once and
+    the net values are obtained as a matrix product.
+
+    >>> marr = [nominal_rate([12]*5), nominal_rate([10]*5)]
+    >>> cflo = cashflow([100]*5, spec=(0, -200))
+    >>> timevalue_matrix([cflo, cflo * 2, cflo * 3], marr) # doctest: +ELLIPSIS
+    array([[103.73..., 116.98...],
+           [207.46..., 233.97...],
+           [311.20..., 350.95...]])
+
+    >>> timevalue_matrix(cflo, marr, base_date=[0, 4]) # doctest: +ELLIPSIS
+    array([[103.73..., 171.28...]])
+
+    """
+    cflo = _as_panel('cflo', cflo)
+    marr = _as_panel('marr', marr)
+    verify_eq_time_range(cflo, marr)
+    if isinstance(base_date, (list, np.ndarray)) and len(base_date) != len(marr):
+        raise ValueError('`base_date` must have a value for each interest rate curve')
+    factor = _factor_array(marr, base_date, discount=True)
+    values = cflo.data
+    if utility is not None:
+        values = np.vectorize(utility, otypes=[np.float64])(values)
+    netval = values @ factor.T
+    if utility is not None:
+        netval = np.vectorize(lambda x: utility(x, inverse=True), otypes=[np.float64])(netval)
+    return netval
+
+
 def net_uniform_series(cflo, marr, nper=1):
     """Computes a net uniform series equivalent of a cashflow.
 
@@ -200,7 +317,22 @@ def benefit_cost_ratio(cflo, marr, base_date=0):
     Returns:
         (float) net present value.
 
+    The benefits are the positive values of the cashflow and the costs the
+    negative values. For a TimeSeriesPanel, a ratio is computed for each row.
+
+    >>> cflo = cashflow([100] * 5, spec=(0, -200))
+    >>> benefit_cost_ratio(cflo, nominal_rate([10] * 5)) # doctest: +ELLIPSIS
+    1.58...
+    >>> benefit_cost_ratio(TimeSeriesPanel([cflo, cflo * 2]), nominal_rate([10] * 5)) # doctest: +ELLIPSIS
+    array([1.58..., 1.58...])
+
     """
+    if _panel_of(cflo, marr) is not None:
+        _verify_series('cflo', cflo)
+        _verify_series('marr', marr)
+        verify_eq_time_range(cflo, marr)
+        return -timevalue(cflo.positive_part(), marr, base_date) / \
+            timevalue(cflo.negative_part(), marr, base_date)
 
     params = vars2list([marr, cflo, base_date])
     marr = params[0]
@@ -210,16 +342,9 @@ def benefit_cost_ratio(cflo, marr, base_date=0):
     retval = []
     for xmarr, xcflo, xbase_date in zip(marr, cflo, base_date):
         verify_eq_time_range(xcflo, xmarr)
-        num = 0
-        den = 0
-        num = xcflo.copy()
-        den = xcflo.copy()
-        for time, _ in enumerate(xcflo):
-            if xcflo[time] >= 0.0:
-                den[time] = 0
-            else:
-                num[time] = 0
-        retval.append(-timevalue(num, xmarr, xbase_date) / timevalue(den, xmarr, xbase_date))
+        num = timevalue(xcflo.positive_part(), xmarr, xbase_date)
+        den = timevalue(xcflo.negative_part(), xmarr, xbase_date)
+        retval.append(-num / den)
 
     if len(retval) == 1:
         return retval[0]
@@ -227,51 +352,215 @@ def benefit_cost_ratio(cflo, marr, base_date=0):
 
 
 
-def irr(cflo):
+def _cashflow_matrix(cflo):
+    """Returns the values of `cflo` (TimeSeries, list of TimeSeries or
+    TimeSeriesPanel) as a 2-D array with a row per cashflow, padded with zeros
+    at the end, the number of periods of each row and the number of periods
+    per year of each row."""
+    if isinstance(cflo, TimeSeriesPanel):
+        nrows, nper = cflo.data.shape
+        return cflo.data, np.full(nrows, nper), np.full(nrows, cflo.pyr)
+    if isinstance(cflo, TimeSeries):
+        cflo = [cflo]
+    for xcflo in cflo:
+        if not isinstance(xcflo, TimeSeries):
+            raise TypeError("`cflo` must be a TimeSeries")
+    nper = np.array([len(xcflo) for xcflo in cflo])
+    values = np.zeros((len(cflo), nper.max()))
+    for row, xcflo in enumerate(cflo):
+        values[row, :nper[row]] = xcflo.data
+    return values, nper, np.array([xcflo.pyr for xcflo in cflo])
+
+
+def _rows_result(cflo, values):
+    """Returns the per row results `values` with the same structure of `cflo`:
+    an array for a TimeSeriesPanel, a number for a TimeSeries or a list with
+    more than one element, and a list otherwise."""
+    if isinstance(cflo, TimeSeriesPanel):
+        return values
+    values = values.tolist()
+    if len(values) == 1:
+        return values[0]
+    return values
+
+
+def _npv_and_derivative(values, prate):
+    """Returns the present value at time 0 of the cashflows stored in the
+    columns of `values` (a period per row) at the periodic rate `prate` (one
+    per column), and its derivative respect to the rate. Evaluated with the
+    Horner scheme over the periods."""
+    xval = 1 / (1 + prate)
+    fval = np.zeros(len(prate))
+    dfval = np.zeros(len(prate))
+    for row in values[::-1]:
+        dfval *= xval
+        dfval += fval
+        fval *= xval
+        fval += row
+    return fval, -dfval * xval * xval
+
+
+def _sign_changes(values):
+    """Returns the number of sign changes in each row of `values`, ignoring
+    zeros."""
+    signs = np.sign(values).astype(np.int8)
+    if signs.all():
+        return (signs[:, 1:] != signs[:, :-1]).sum(axis=1)
+    index = np.where(signs != 0, np.arange(values.shape[1], dtype=np.int32), 0)
+    index = np.maximum.accumulate(index, axis=1)
+    signs = np.take_along_axis(signs, index, axis=1)
+    return (signs[:, 1:] * signs[:, :-1] < 0).sum(axis=1)
+
+
+# periodic rates used to look for a sign change of the present value, going
+# away from zero in each direction
+_IRR_GRID_UP = np.concatenate([np.arange(1, 21) * 0.005,
+                               0.1 * np.power(1.25, np.arange(1, 42))])
+_IRR_GRID_DOWN = np.concatenate([np.arange(1, 21) * -0.005,
+                                 0.9 * np.power(0.85, np.arange(1, 43)) - 1])
+
+
+def _irr_rows(values, tol=1e-12, maxiter=100):
+    """Computes the periodic internal rate of return of each row of `values`.
+
+    The rate closest to zero is searched: the present value is evaluated on a
+    grid of rates going away from zero in both directions until a sign change
+    is found, and the root is refined inside the bracket with Newton steps.
+
+    Returns:
+        `(prate, iterations, converged, sign_changes)` as arrays.
+
+    """
+    nrows, nper = values.shape
+    changes = _sign_changes(values)
+    lower = np.full(nrows, np.nan)
+    upper = np.full(nrows, np.nan)
+    guess = np.full(nrows, np.nan)
+    distance = np.full(nrows, np.inf)
+    time = np.arange(nper, dtype=np.float64)
+
+    with np.errstate(all='ignore'):
+        fzero = values.sum(axis=1)
+        for grid in (_IRR_GRID_UP, _IRR_GRID_DOWN):
+            fprev = fzero.copy()
+            rprev = np.zeros(nrows)
+            searching = (changes > 0) & (fzero != 0)
+            # the grid is evaluated by blocks, only for the rows still searching
+            for block in range(0, len(grid), 8):
+                rows = np.flatnonzero(searching)
+                if rows.size == 0:
+                    break
+                rates = grid[block:block + 8]
+                fgrid = values[rows] @ np.power(1 + rates, -time[:, np.newaxis])
+                for column, rate in enumerate(rates):
+                    fcur = fgrid[:, column]
+                    found = searching[rows] & np.isfinite(fcur)
+                    found &= abs(rprev[rows]) < distance[rows]
+                    searching[rows] = found
+                    found &= (np.sign(fcur) != np.sign(fprev[rows]))
+                    xprev = rprev[rows[found]]
+                    yprev = fprev[rows[found]]
+                    ycur = fcur[found]
+                    lower[rows[found]] = np.minimum(rate, xprev)
+                    upper[rows[found]] = np.maximum(rate, xprev)
+                    guess[rows[found]] = xprev - yprev * (rate - xprev) / (ycur - yprev)
+                    distance[rows[found]] = abs(xprev)
+                    searching[rows[found]] = False
+                    fprev[rows] = fcur
+                    rprev[rows] = rate
+
+    transposed = np.ascontiguousarray(values.T)
+
+    def func(prate, rows):
+        if len(rows) == nrows:
+            return _npv_and_derivative(transposed, prate)
+        return _npv_and_derivative(transposed[:, rows], prate)
+
+    # the secant between the ends of the bracket is used as initial point
+    guess = np.where(np.isfinite(guess), guess, (lower + upper) / 2)
+    prate, iterations, converged = newton_bracketed(func, lower, upper, guess=guess,
+                                                    tol=tol, maxiter=maxiter)
+
+    exact = (changes > 0) & (fzero == 0)
+    prate[exact] = 0
+    converged[exact] = True
+    return prate, iterations, converged, changes
+
+
+def irr(cflo, full_output=False):
     """Computes the internal rate of return.
 
     Args:
-        cashflow (TimeSeries): cashflow.
+        cflo (TimeSeries, list of TimeSeries, TimeSeriesPanel): cashflow.
+        full_output (bool): when True, diagnostics of the solver are also
+            returned.
 
     Returns:
-        (float) net uniform series.
+        (float) internal rate of return (nominal rate per year, in percentage).
+        For a TimeSeriesPanel an array with the rate of each row is returned.
+        When `full_output` is True, the tuple `(rate, info)` is returned,
+        where `info` is a dictionary with the number of `iterations`, the
+        `converged` flag and the number of `sign_changes` of each cashflow.
+        `nan` is returned for cashflows without a solution.
+
+    The rate closest to zero is returned when the cashflow has several rates
+    of return.
+
+    >>> cflo = cashflow([100]*5, spec=(0, -200))
+    >>> irr(cflo) # doctest: +ELLIPSIS
+    34.90...
+
+    >>> irr([cflo, cflo * 2, cashflow([100]*5)]) # doctest: +ELLIPSIS
+    [34.90..., 34.90..., nan]
+
+    >>> rate, info = irr(TimeSeriesPanel([cflo, cashflow([100]*5, spec=(0, -500))]), full_output=True)
+    >>> rate # doctest: +ELLIPSIS
+    array([34.90..., -8.36...])
+    >>> info['converged'], info['sign_changes']
+    (array([ True,  True]), array([1, 1]))
 
     """
-    if isinstance(cflo, TimeSeries):
-        cflo = [cflo]
-    retval = []
-    for xcflo in cflo:
-        retval.append(100 * xcflo.pyr * np.irr(xcflo.tolist()))
-    if len(retval) == 1:
-        return retval[0]
-    return retval
+    values, _, pyr = _cashflow_matrix(cflo)
+    prate, iterations, converged, changes = _irr_rows(values)
+    result = _rows_result(cflo, 100 * pyr * prate)
+    if full_output is False:
+        return result
+    info = {'iterations': _rows_result(cflo, iterations),
+            'converged': _rows_result(cflo, converged),
+            'sign_changes': _rows_result(cflo, changes)}
+    return result, info
 
 ## modified internal rate of return
 def mirr(cflo, finance_rate=0, reinvest_rate=0):
     """Computes the modified internal rate of return.
 
     Args:
-        cashflow (list, cashflow): cashflow.
+        cflo (TimeSeries, list of TimeSeries, TimeSeriesPanel): cashflow.
         finance_rate (float): rate applied to negative values of the cashflow
         reinvest_rate (float): rate applied to positive values of the cashflow
 
     Returns:
-        (float) modified internal rate of return.
+        (float) modified internal rate of return. For a TimeSeriesPanel an
+        array with the rate of each row is returned.
+
+    >>> cflo = cashflow([100]*5, spec=(0, -200))
+    >>> mirr(cflo) # doctest: +ELLIPSIS
+    18.92...
+
+    >>> mirr(TimeSeriesPanel([cflo, cashflow([100]*5)])) # doctest: +ELLIPSIS
+    array([18.92...,        nan])
 
     """
     # negativos: finance_rate
-    # positivos: reinvest_rate
-    if isinstance(cflo, TimeSeries):
-        cflo = [cflo]
-    retval = []
-    for xcflo in cflo:
-        retval.append(100 * xcflo.pyr * np.mirr(xcflo.tolist(),
-                                                finance_rate,
-                                                reinvest_rate))
-
-    if len(retval) == 1:
-        return retval[0]
-    return retval
+    # positivos: reinvest_rate
+    values, nper, pyr = _cashflow_matrix(cflo)
+    time = np.arange(values.shape[1], dtype=np.float64)
+    numer = np.abs(np.maximum(values, 0) @ np.power(1 + reinvest_rate, -time))
+    denom = np.abs(np.minimum(values, 0) @ np.power(1 + finance_rate, -time))
+    with np.errstate(all='ignore'):
+        prate = np.power(numer / denom, 1 / (nper - 1)) * (1 + reinvest_rate) - 1
+    prate[(numer == 0) | (denom == 0)] = np.nan
+    return _rows_result(cflo, 100 * pyr * prate)
 
 def table(data):
     """Prints the list `data` as a table
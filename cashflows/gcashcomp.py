@@ -108,7 +108,13 @@ Description of the functions in this module
 
 """
 
-from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate, verify_eq_time_range, _timeid2index
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.segments import SegmentSeries
 
 def vars2list(params):
     """ Converts the variables on lists of the same length
@@ -130,6 +136,120 @@ def vars2list(params):
     return result
 
 
+def _panel_of(*args):
+    """Returns the first TimeSeriesPanel in `args` or None."""
+    for arg in args:
+        if isinstance(arg, TimeSeriesPanel):
+            return arg
+    return None
+
+
+def _verify_series(name, value):
+    """Raises a TypeError when `value` is not a TimeSeries or a TimeSeriesPanel."""
+    if not isinstance(value, (TimeSeries, TimeSeriesPanel)):
+        raise TypeError("`" + name + "` must be a TimeSeries or a TimeSeriesPanel")
+
+
+_FACTOR_CACHE = OrderedDict()
+_FACTOR_CACHE_LOCK = threading.Lock()
+_FACTOR_CACHE_STATS = {'hits': 0, 'misses': 0, 'maxsize': 128}
+
+_CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _growth_array(nrate):
+    """Returns the cumulative product of `1 + r / pyr` of `nrate`. The result
+    is cached by the content of the rate series and must not be modified. For
+    a SegmentSeries, the product is computed in closed form by segments.
+    """
+    if isinstance(nrate, SegmentSeries):
+        return nrate.growth()
+    data = np.ascontiguousarray(nrate.data, dtype=np.float64)
+    key = (hashlib.blake2b(data.tobytes(), digest_size=16).digest(), data.shape, nrate.pyr)
+    with _FACTOR_CACHE_LOCK:
+        growth = _FACTOR_CACHE.get(key)
+        if growth is not None:
+            _FACTOR_CACHE.move_to_end(key)
+            _FACTOR_CACHE_STATS['hits'] += 1
+            return growth
+        _FACTOR_CACHE_STATS['misses'] += 1
+    growth = np.cumprod(1 + data / nrate.pyr / 100, axis=-1)
+    growth.setflags(write=False)
+    with _FACTOR_CACHE_LOCK:
+        if _FACTOR_CACHE_STATS['maxsize'] > 0:
+            _FACTOR_CACHE[key] = growth
+            while len(_FACTOR_CACHE) > _FACTOR_CACHE_STATS['maxsize']:
+                _FACTOR_CACHE.popitem(last=False)
+    return growth
+
+
+def discount_factor_cache_info():
+    """Returns the statistics of the cache of discount factors.
+
+    Discount and compound factors are computed once for each distinct interest
+    rate series (same values and same `pyr`) and reused by `to_discount_factor`,
+    `to_compound_factor`, `timevalue` and the conversion functions of this
+    module. A change of `base_date` does not recompute the factors.
+
+    Returns:
+        A named tuple `(hits, misses, maxsize, currsize)`.
+
+    >>> discount_factor_cache_clear()
+    >>> nrate = nominal_rate(const_value=[10]*5)
+    >>> _ = to_discount_factor(nrate)
+    >>> _ = to_discount_factor(nrate, base_date=2)
+    >>> _ = to_compound_factor(nominal_rate(const_value=[10]*5))
+    >>> discount_factor_cache_info()
+    CacheInfo(hits=2, misses=1, maxsize=128, currsize=1)
+
+    """
+    with _FACTOR_CACHE_LOCK:
+        return _CacheInfo(_FACTOR_CACHE_STATS['hits'],
+                          _FACTOR_CACHE_STATS['misses'],
+                          _FACTOR_CACHE_STATS['maxsize'],
+                          len(_FACTOR_CACHE))
+
+
+def discount_factor_cache_clear(maxsize=None):
+    """Empties the cache of discount factors and resets its statistics.
+
+    Args:
+        maxsize (int): new maximum number of interest rate series kept in the
+            cache. A value of zero disables the cache. By default, the current
+            size is kept.
+
+    """
+    with _FACTOR_CACHE_LOCK:
+        _FACTOR_CACHE.clear()
+        _FACTOR_CACHE_STATS['hits'] = 0
+        _FACTOR_CACHE_STATS['misses'] = 0
+        if maxsize is not None:
+            if maxsize < 0:
+                raise ValueError("`maxsize` must be a non-negative integer")
+            _FACTOR_CACHE_STATS['maxsize'] = int(maxsize)
+
+
+def _factor_array(nrate, base_date=0, discount=True):
+    """Returns the discount (or compound) factors of `nrate` as an array with
+    the shape of `nrate.data`. For a TimeSeriesPanel, `base_date` can be a
+    list with a basis time per row.
+    """
+    growth = _growth_array(nrate)
+    if isinstance(base_date, tuple):
+        base_date = nrate.axis.index(base_date)
+    if isinstance(base_date, (list, np.ndarray)):
+        base_date = [nrate.axis.index(x) if isinstance(x, tuple) else x for x in base_date]
+        if growth.ndim == 1:
+            ref = growth[base_date][:, np.newaxis]
+        else:
+            ref = growth[np.arange(len(growth)), base_date][:, np.newaxis]
+    else:
+        ref = growth[..., [base_date]]
+    if discount is True:
+        return ref / growth
+    return growth / ref
+
+
 def after_tax_cashflow(cflo, tax_rate):
     """Computes the after cashflow for a tax rate. Taxes are not computed
     for negative values in the cashflow.
@@ -152,7 +272,18 @@ def after_tax_cashflow(cflo, tax_rate):
     Data = (0,)           0.00
            (1,)-(4,) [4] 10.00
 
+    >>> cflo = TimeSeriesPanel([cflo, cflo * 2])
+    >>> after_tax_cashflow(cflo=cflo, tax_rate=tax_rate).tolist()
+    [[0.0, 10.0, 10.0, 10.0, 10.0], [0.0, 20.0, 20.0, 20.0, 20.0]]
+
     """
+    panel = _panel_of(cflo, tax_rate)
+    if panel is not None:
+        _verify_series('cflo', cflo)
+        _verify_series('tax_rate', tax_rate)
+        verify_eq_time_range(cflo, tax_rate)
+        return cflo.positive_part() * tax_rate / 100
+
     params = vars2list([cflo, tax_rate])
     cflo = params[0]
     tax_rate = params[1]
@@ -161,13 +292,7 @@ def after_tax_cashflow(cflo, tax_rate):
         if not isinstance(xcflo, TimeSeries):
             raise TypeError("cashflow must be a TimeSeries")
         verify_eq_time_range(xcflo, xtax_rate)
-        result = xcflo.copy()
-        for time, _ in enumerate(xcflo):
-            if result[time] > 0:
-                result[time] *= xtax_rate[time] / 100
-            else:
-                result[time] = 0
-        retval.append(result)
+        retval.append(xcflo.positive_part() * xtax_rate / 100)
     if len(retval) == 1:
         return retval[0]
     return retval
@@ -196,19 +321,7 @@ def to_discount_factor(nrate, base_date=0):
 
     """
 
-    prate = [x/nrate.pyr/100 for x in nrate.data]  # periodic rate
-    factor = prate.copy()
-    for index, _ in enumerate(factor):
-        if index == 0:
-            factor[0] = 1 / (1 + factor[0])
-        else:
-            factor[index] = factor[index-1] / (1 + factor[index])
-    if isinstance(base_date, tuple):
-        base_date = _timeid2index(base_date, basis=nrate.start, pyr=nrate.pyr)
-    div = factor[base_date]
-    for index, _ in enumerate(factor):
-        factor[index] = factor[index] / div
-    return factor
+    return _factor_array(nrate, base_date, discount=True).tolist()
 
 
 def to_compound_factor(nrate, base_date=0):
@@ -228,10 +341,7 @@ def to_compound_factor(nrate, base_date=0):
     [0.980..., 0.990..., 1.0, 1.01, 1.0201, 1.030..., 1.040..., 1.051..., 1.061..., 1.072...]
 
     """
-    factor = to_discount_factor(nrate, base_date)
-    for time, _ in enumerate(factor):
-        factor[time] = 1 / factor[time]
-    return factor
+    return _factor_array(nrate, base_date, discount=False).tolist()
 
 
 
@@ -274,8 +384,19 @@ def const2curr(cflo, inflation, base_date=0):
            (3,)   158.40
            (4,)   190.08
 
+    >>> cflo = TimeSeriesPanel([cashflow(const_value=[100] * 5)] * 2)
+    >>> const2curr(cflo=cflo, inflation=nominal_rate(const_value=[10, 10, 20, 20, 20]),
+    ... base_date=[0, 4]).tolist() # doctest: +ELLIPSIS
+    [[100.0, 110.0..., 132.0..., 158.4..., 190.08...], [52.60..., 57.87..., 69.44..., 83.33..., 100.0]]
 
     """
+    panel = _panel_of(cflo, inflation)
+    if panel is not None:
+        _verify_series('cflo', cflo)
+        _verify_series('inflation', inflation)
+        verify_eq_time_range(cflo, inflation)
+        return panel._new(cflo.data * _factor_array(inflation, base_date, discount=False))
+
     params = vars2list([cflo, inflation, base_date])
     cflo = params[0]
     inflation = params[1]
@@ -287,11 +408,8 @@ def const2curr(cflo, inflation, base_date=0):
         if not isinstance(xinflation, TimeSeries):
             raise TypeError("inflation must be a TimeSeries object")
         verify_eq_time_range(xcflo, xinflation)
-        factor = to_compound_factor(xinflation, xbase_date)
-        result = xcflo.copy()
-        for time, _ in enumerate(result):
-            result[time] *= factor[time]
-        retval.append(result)
+        retval.append(xcflo._new(xcflo.data * _factor_array(xinflation, xbase_date,
+                                                            discount=False)))
     if len(retval) == 1:
         return retval[0]
     return retval
@@ -323,6 +441,13 @@ def curr2const(cflo, inflation, base_date=0):
            (4,)    52.61
 
     """
+    panel = _panel_of(cflo, inflation)
+    if panel is not None:
+        _verify_series('cflo', cflo)
+        _verify_series('inflation', inflation)
+        verify_eq_time_range(cflo, inflation)
+        return panel._new(cflo.data * _factor_array(inflation, base_date, discount=True))
+
     params = vars2list([cflo, inflation, base_date])
     cflo = params[0]
     inflation = params[1]
@@ -334,11 +459,8 @@ def curr2const(cflo, inflation, base_date=0):
         if not isinstance(xinflation, TimeSeries):
             raise TypeError("inflation must be a TimeSeries object")
         verify_eq_time_range(xcflo, xinflation)
-        factor = to_discount_factor(xinflation, xbase_date)
-        result = xcflo.copy()
-        for time, _ in enumerate(result):
-            result[time] *= factor[time]
-        retval.append(result)
+        retval.append(xcflo._new(xcflo.data * _factor_array(xinflation, xbase_date,
+                                                            discount=True)))
     if len(retval) == 1:
         return retval[0]
     return retval
@@ -356,10 +478,25 @@ def currency_conversion(cflo, exchange_rate=1, devaluation=None, base_date=0):
     Returns:
         A cashflow in other currency.
 
+    For a TimeSeriesPanel, `exchange_rate` can be a list with a value per row.
 
-
+    >>> cflo = TimeSeriesPanel([cashflow(const_value=[100] * 5)] * 2)
+    >>> currency_conversion(cflo=cflo, exchange_rate=[2, 3]).tolist()
+    [[200.0, 200.0, 200.0, 200.0, 200.0], [300.0, 300.0, 300.0, 300.0, 300.0]]
 
     """
+    panel = _panel_of(cflo, devaluation)
+    if panel is not None:
+        _verify_series('cflo', cflo)
+        factor = np.asarray(exchange_rate, dtype=np.float64)
+        if factor.ndim > 0:
+            factor = factor[:, np.newaxis]
+        if devaluation is not None:
+            _verify_series('devaluation', devaluation)
+            verify_eq_time_range(cflo, devaluation)
+            factor = factor * _factor_array(devaluation, base_date, discount=False)
+        return panel._new(cflo.data * factor)
+
     params = vars2list([cflo, exchange_rate, devaluation, base_date])
     cflo = params[0]
     exchange_rate = params[1]
@@ -370,17 +507,13 @@ def currency_conversion(cflo, exchange_rate=1, devaluation=None, base_date=0):
         if not isinstance(xcflo, TimeSeries):
             raise TypeError("`cashflow` must be a TimeSeries")
         if xdevaluation is None:
-            result = xcflo.copy()
-            for time, _ in enumerate(result):
-                result[time] *= xexchange_rate
+            result = xcflo * xexchange_rate
         else:
             if not isinstance(xdevaluation, TimeSeries):
                 raise TypeError("`devaluation` must be a TimeSeries")
             verify_eq_time_range(xcflo, xdevaluation)
-            factor = to_compound_factor(xdevaluation, xbase_date)
-            result = xcflo.copy()
-            for time, _ in enumerate(result):
-                result[time] *= xexchange_rate * factor[time]
+            factor = _factor_array(xdevaluation, xbase_date, discount=False)
+            result = xcflo._new(xcflo.data * xexchange_rate * factor)
         retval.append(result)
     if len(retval) == 1:
         return retval[0]
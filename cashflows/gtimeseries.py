@@ -28,7 +28,10 @@ Description of the functions in this module
 """
 
 import calendar
-# import numpy
+import contextlib
+import pickle
+import weakref
+import numpy as np
 
 
 def _timeid2float(xdate, pyr):
@@ -89,6 +92,24 @@ def _float2timeid(xfloat, pyr):
     return (xmajor, xminor)
 
 
+def _add_periods(timeid, nper, pyr):
+    """Returns the timeid `nper` periods after `timeid`.
+
+    >>> _add_periods((2000, 3), 2, pyr=4)
+    (2001, 1)
+
+    >>> _add_periods((2000,), -2, pyr=1)
+    (1998,)
+
+    """
+    if pyr == 1:
+        xmajor = timeid[0]
+        return (xmajor + nper,)
+    xmajor, xminor = timeid
+    xmajor, xminor = divmod(xmajor * pyr + xminor + nper, pyr)
+    return (xmajor, xminor)
+
+
 def _timeid2index(timeid, basis, pyr):
     """Converts a timeid in an integer index
 
@@ -118,7 +139,83 @@ def _timeid2index(timeid, basis, pyr):
 
 
 
+# interned time axes, by (start, end, pyr)
+_AXES = weakref.WeakValueDictionary()
+
+
+class TimeAxis():
+    """Immutable time range of a time series: `start`, `end`, periods per
+    year `pyr` and number of periods `nper`.
+
+    Axes are interned: all the series with the same time range share the
+    same TimeAxis object, so two time ranges are equal when their axes are
+    the same object. Derived data, as the list of timeids or the index of a
+    timeid, is computed once per axis.
+
+    >>> axis = TimeAxis(start=(2000, 2), end=(2001, 1), pyr=4)
+    >>> axis
+    TimeAxis(start=(2000, 2), end=(2001, 1), pyr=4)
+    >>> axis is TimeAxis((2000, 2), (2001, 1), 4)
+    True
+    >>> axis.nper, axis.timeids
+    (4, ((2000, 2), (2000, 3), (2001, 0), (2001, 1)))
+    >>> axis.index((2001, 0))
+    2
+
+    """
+
+    __slots__ = ('start', 'end', 'pyr', 'nper', '_timeids', '_positions', '__weakref__')
+
+    def __new__(cls, start, end, pyr):
+        key = (start, end, pyr)
+        axis = _AXES.get(key)
+        if axis is None:
+            axis = super().__new__(cls)
+            object.__setattr__(axis, 'start', start)
+            object.__setattr__(axis, 'end', end)
+            object.__setattr__(axis, 'pyr', pyr)
+            object.__setattr__(axis, 'nper', _timeid2index(end, start, pyr) + 1)
+            object.__setattr__(axis, '_timeids', None)
+            object.__setattr__(axis, '_positions', None)
+            axis = _AXES.setdefault(key, axis)
+        return axis
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TimeAxis objects are immutable')
+
+    def __reduce__(self):
+        return (TimeAxis, (self.start, self.end, self.pyr))
+
+    def __repr__(self):
+        return 'TimeAxis(start={:s}, end={:s}, pyr={:s})'.format(
+            self.start.__repr__(), self.end.__repr__(), self.pyr.__repr__())
+
+    @property
+    def timeids(self):
+        """Tuple with the timeid of each period."""
+        if self._timeids is None:
+            timeids = tuple(_add_periods(self.start, period, self.pyr)
+                            for period in range(self.nper))
+            object.__setattr__(self, '_timeids', timeids)
+        return self._timeids
+
+    def index(self, timeid):
+        """Returns the index of the period `timeid`. Timeids outside the axis
+        are converted relative to `start`."""
+        if self._positions is None:
+            positions = {timeid: index for index, timeid in enumerate(self.timeids)}
+            object.__setattr__(self, '_positions', positions)
+        index = self._positions.get(timeid)
+        if index is None:
+            return _timeid2index(timeid=timeid, basis=self.start, pyr=self.pyr)
+        return index
+
+
 def verify_eq_time_range(series1, series2):
+    """Raises a ValueError when the series do not have the same time range."""
+
+    if series1.axis is series2.axis:
+        return
 
     if series1.pyr != series2.pyr:
         msg = 'Time series have different periods per year: '
@@ -126,18 +223,115 @@ def verify_eq_time_range(series1, series2):
 
     if series1.start != series2.start:
         msg = 'Time series have different start date: '
-        raise ValueError(mag + series1.start.__repr__() + ', ' + series2.start.__repr__())
+        raise ValueError(msg + series1.start.__repr__() + ', ' + series2.start.__repr__())
 
     if series1.end != series2.end:
         msg = 'Time series have different end date: '
-        raise ValueError(mag + series1.end.__repr__() + ', ' + series2.end.__repr__())
-
+        raise ValueError(msg + series1.end.__repr__() + ', ' + series2.end.__repr__())
+
+
+def _axis_index(axis, key):
+    """Converts a timeid of the TimeAxis `axis`, or a slice with timeids, into
+    an index. Slices are returned with the bounds clipped to the axis."""
+    if isinstance(key, tuple):
+        return axis.index(key)
+    if not isinstance(key, slice):
+        return key
+    if key.step not in (None, 1):
+        raise ValueError('Time series slices must have a step of 1')
+    first, last = key.start, key.stop
+    if isinstance(first, tuple):
+        first = axis.index(first)
+    if isinstance(last, tuple):
+        last = axis.index(last) + 1
+    return slice(*slice(first, last).indices(axis.nper)[:2])
+
+
+def _new_series(axis, data, cls=None):
+    """Returns a time series with the TimeAxis `axis` and the array `data` as
+    values, skipping the validations of the constructor."""
+    if cls is None:
+        cls = TimeSeries
+    result = cls.__new__(cls)
+    result.axis = axis
+    result.data = data
+    return result
+
+
+def _as_float(data):
+    """Returns the array `data` as float64 values (masks are converted)."""
+    if data.dtype == np.float64:
+        return data
+    return data.astype(np.float64)
+
+
+def _as_values(data):
+    """Returns the array `data` as values of a series: float64, or booleans
+    for masks."""
+    if data.dtype == np.bool_:
+        return data
+    return _as_float(data)
+
+
+def _from_buffer(cls, axis, buffer, dtype, shape):
+    """Returns a time series (or a panel) of class `cls` with the values in
+    `buffer`, without copying them when the buffer is writable. A TimeSeries
+    over a read-only buffer gets its own copy of the values on the first
+    write (see `TimeSeries._detach`); a panel gets a copy at once."""
+    data = np.frombuffer(buffer, dtype=dtype).reshape(shape)
+    if cls is TimeSeriesPanel and not data.flags.writeable:
+        data = data.copy()
+    result = _new_series(axis, data, cls)
+    if isinstance(result, TimeSeries) and not data.flags.writeable:
+        result._share = weakref.WeakValueDictionary({id(result): result})
+    return result
+
+
+def _reduce(series, protocol):
+    """Returns the pickle of a time series (or a panel): the class, the axis
+    and the buffer of the values. With the protocol 5, the values are a
+    `pickle.PickleBuffer`, so they are copied once to the pickle or sent out
+    of band without copies. With older protocols (and with `copy.copy` and
+    `copy.deepcopy`) they are a bytearray, so the values of the new series
+    are writable."""
+    data = np.ascontiguousarray(series.data)
+    if protocol >= 5:
+        buffer = pickle.PickleBuffer(data)
+    else:
+        buffer = bytearray(memoryview(data).cast('B'))
+    return (_from_buffer, (series.__class__, series.axis, buffer, data.dtype.str, data.shape))
 
 
 class TimeSeries():
     """ Class for representing time series.
+
+    Slicing by index (end excluded) or by timeid (end included) returns a
+    view: a time series with the corresponding time range that shares the
+    values of the original series.
+
+    >>> x = cashflow(const_value=[1, 2, 3, 4, 5, 6, 7, 8], pyr=4)
+    >>> x[(0, 2):(1, 1)] # doctest: +NORMALIZE_WHITESPACE
+       Qtr0 Qtr1 Qtr2 Qtr3
+    0           3.00 4.00
+    1 5.00 6.00
+
+    Views are copied on write: a view (or the original series) gets its own
+    copy of the values before it is modified with `[]` or with an inplace
+    operator, so the other series are not changed. While they are shared,
+    the arrays of values are read only.
+
+    >>> y = x[2:4]
+    >>> y[0] = 100
+    >>> y.tolist(), x.tolist()
+    ([100.0, 4.0], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+
     """
 
+    # series sharing the array of values, by id (see `_view`); the series
+    # are not hashable, because `==` is an elementwise comparison
+    _share = None
+    __hash__ = None
+
     def __init__(self, start=None, end=None, nper=None, pyr=1):
         """Creates a generic time series.
 
@@ -246,10 +440,40 @@ class TimeSeries():
         if nper <= 1:
             raise ValueError('Time Series must have a nper > 1')
 
-        self.start = start
-        self.end = end
-        self.pyr = pyr
-        self.data = [0] * nper
+        self.axis = TimeAxis(start, end, pyr)
+        self.data = np.zeros(nper)
+
+    @property
+    def start(self):
+        """Timeid of the first period."""
+        return self.axis.start
+
+    @property
+    def end(self):
+        """Timeid of the last period."""
+        return self.axis.end
+
+    @property
+    def pyr(self):
+        """Number of periods per year."""
+        return self.axis.pyr
+
+    def _new(self, data):
+        """Returns a time series with the same time range and the array `data`
+        as values. The constructor validations are skipped. The values are
+        float64, except for masks (booleans)."""
+        return _new_series(self.axis, _as_values(data), self.__class__)
+
+    def _operand(self, other):
+        """Returns the values of `other` as an array or a scalar suitable for
+        elementwise operations with the time series, or `NotImplemented`."""
+        if isinstance(other, TimeSeries):
+            other = _reindexed(other, self)
+            verify_eq_time_range(self, other)
+            return _as_float(other.data)
+        if isinstance(other, (int, float, np.number)):
+            return other
+        return NotImplemented
 
 
     def __repr__(self):
@@ -269,12 +493,13 @@ class TimeSeries():
         else:
             imajor, iminor = self.start
 
+        values = self.data.tolist()
         txt_date = []
         txt_freq = []
         txt_val = []
 
         period = 0
-        while period < len(self.data):
+        while period < len(values):
 
             freq = 1
             if self.pyr == 1:
@@ -282,8 +507,8 @@ class TimeSeries():
             else:
                 beg_date = end_date = (imajor, iminor)
 
-            while period + freq < len(self.data) and \
-                  self.data[period] == self.data[period + freq]:
+            while period + freq < len(values) and \
+                  values[period] == values[period + freq]:
                 freq += 1
                 iminor += 1
                 if iminor >= self.pyr:
@@ -309,12 +534,12 @@ class TimeSeries():
 
                 txt_date += ['{:s}'.format(beg_date.__str__())]
                 txt_freq += [' ']
-                txt_val += ['{:1.2f}'.format(self.data[period])]
+                txt_val += ['{:1.2f}'.format(values[period])]
             else:
                 fmt = '{:s}-{:s}'
                 txt_date += [fmt.format(beg_date.__str__(), end_date.__str__())]
                 txt_freq += ['[{:d}]'.format(freq)]
-                txt_val += ['{:1.2f}'.format(self.data[period])]
+                txt_val += ['{:1.2f}'.format(values[period])]
 
 
 
@@ -364,15 +589,17 @@ class TimeSeries():
         iminor = 0
         iper = 0
 
+        values = self.data.tolist()
+
         maxlen = 0
-        for data in self.data:
+        for data in values:
             maxlen = max(maxlen, len('{:.2f}'.format(data)))
 
         maxlen = maxlen - 3
 
         fmt_major = '{:<' + '{:<d}'.format(len(emajor.__str__())) + 'd}'
         fmt_minor = ' {:>' + '{:d}'.format(maxlen+3) + '.2f}'
-        fmt_void = ' ' * (4+len(max(self.data).__str__()))
+        fmt_void = ' ' * (4+len(max(values).__str__()))
         fmt_head = ' {:>' + '{:d}'.format(maxlen+3) + 's}'
 
         sline = ' ' * len(emajor.__str__())
@@ -397,7 +624,7 @@ class TimeSeries():
             if imajor == smajor and iminor < sminor:
                 sline += fmt_void
             else:
-                sline += fmt_minor.format(self.data[iper])
+                sline += fmt_minor.format(values[iper])
                 iper += 1
 
             if  imajor == emajor and iminor == eminor:
@@ -418,41 +645,232 @@ class TimeSeries():
 
 
 
+    def _index(self, key):
+        """Converts a timeid, or a slice with timeids, into an index."""
+        return _axis_index(self.axis, key)
+
+    def _view(self, first, last):
+        """Returns the periods `first` to `last - 1` as a time series sharing
+        the values of `self`."""
+        if last <= first:
+            raise ValueError('Empty slice of time series')
+        if self._share is None:
+            self._share = weakref.WeakValueDictionary({id(self): self})
+        self.data.setflags(write=False)
+        axis = TimeAxis(_add_periods(self.start, first, self.pyr),
+                        _add_periods(self.start, last - 1, self.pyr), self.pyr)
+        result = _new_series(axis, self.data[first:last], self.__class__)
+        result._share = self._share
+        self._share[id(result)] = result
+        return result
+
+    def _detach(self):
+        """Copy on write: gives the series its own array of values before a
+        modification, when the array is shared with other series. A mask is
+        converted to float values."""
+        share = self._share
+        if share is not None:
+            share.pop(id(self), None)
+            self._share = None
+            if len(share) > 0 or not self.data.flags.owndata:
+                self.data = self.data.copy()
+            else:
+                self.data.setflags(write=True)
+        if self.data.dtype != np.float64:
+            self.data = self.data.astype(np.float64)
+
+    def window(self, start=None, end=None):
+        """Returns the periods from `start` to `end` (both included) as a
+        view (see `TimeSeries`).
+
+        >>> cashflow(const_value=[1, 2, 3, 4, 5], start=2000).window(2001, 2003) # doctest: +NORMALIZE_WHITESPACE
+        Time Series:
+        Start = (2001,)
+        End = (2003,)
+        pyr = 1
+        Data = (2001,)          2.00
+               (2002,)          3.00
+               (2003,)          4.00
+
+        """
+        if start is not None and not isinstance(start, tuple):
+            start = (start,) if self.pyr == 1 else (start, 0)
+        if end is not None and not isinstance(end, tuple):
+            end = (end,) if self.pyr == 1 else (end, self.pyr - 1)
+        return self[start:end]
+
     def __getitem__(self, key):
-        """gets the item
+        """Returns the value at an index or a timeid, or a view of the
+        periods of a slice.
 
+        >>> x = cashflow(const_value=[1, 2, 3, 4, 5], start=2000)
+        >>> x[1], x[(2004,)]
+        (2.0, 5.0)
 
+        >>> x[1:-1].tolist(), x[(2002,):].tolist()
+        ([2.0, 3.0, 4.0], [3.0, 4.0, 5.0])
 
         """
-        if isinstance(key, tuple):
-            key = _timeid2index(timeid=key, basis=self.start, pyr=self.pyr)
-        return self.data[key]
+        key = self._index(key)
+        if isinstance(key, slice):
+            return self._view(key.start, key.stop)
+        return self.data[key].item()
 
     def __setitem__(self, key, value):
-
-        if isinstance(key, tuple):
-            key = _timeid2index(timeid=key, basis=self.start, pyr=self.pyr)
-        self.data[key] = value
+        self._detach()
+        self.data[self._index(key)] = value
 
     def __len__(self):
         return len(self.data)
 
     def __iter__(self):
-        return self.data.__iter__()
+        return iter(self.data.tolist())
+
+    #
+    # NumPy protocols
+    #
+
+    def __reduce_ex__(self, protocol):
+        """Pickles the series as its axis and the buffer of its values.
+
+        >>> x = cashflow(const_value=[1, 2, 3, 4])
+        >>> buffers = []
+        >>> data = pickle.dumps(x[1:], protocol=5, buffer_callback=buffers.append)
+        >>> pickle.loads(data, buffers=buffers).tolist()
+        [2.0, 3.0, 4.0]
+
+        """
+        return _reduce(self, protocol)
 
-    def __next__(self):
-        return self.data.__next__()
+    def __array__(self, dtype=None, copy=None):
+        """Returns the values as an array; without `copy`, the array is the
+        buffer of the series (no copy is made).
+
+        >>> x = cashflow(const_value=[1, 2, 3])
+        >>> np.shares_memory(np.asarray(x), x.data)
+        True
+
+        """
+        if copy:
+            return np.array(self.data, dtype=dtype, copy=True)
+        return np.asarray(self.data, dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """Applies NumPy ufuncs to the values. Elementwise results are
+        returned as time series with the same time range; reductions return
+        numbers or arrays.
+
+        >>> x = cashflow(const_value=[1, 10, 100])
+        >>> np.log10(x).tolist()
+        [0.0, 1.0, 2.0]
+        >>> np.where(x > 5, x, -x).tolist()
+        [-1.0, 10.0, 100.0]
+        >>> float(np.add.reduce(x)), np.maximum.accumulate(-x).tolist()
+        (111.0, [-1.0, -1.0, -1.0])
+
+        """
+        return _array_ufunc(ufunc, method, inputs, kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        """Applies NumPy functions to the values (see `__array_ufunc__`)."""
+        return _array_function(func, types, args, kwargs)
 
 
     def tolist(self):
         """Returns the values as a list"""
-        return [x for x in self.data]
+        return self.data.tolist()
 
     def copy(self):
         """returns a copy of the time series"""
-        result = TimeSeries(start=self.start, end=self.end, nper=len(self.data), pyr=self.pyr)
-        result.data = [value for value in self.data]
-        return result
+        return self._new(self.data.copy())
+
+    #
+    # cumulative operations and reductions
+    #
+
+    def cumsum(self):
+        """Returns the cumulative sum of the values.
+
+        >>> cashflow(const_value=[1, 2, 3, 4]).cumsum().tolist()
+        [1.0, 3.0, 6.0, 10.0]
+
+        """
+        return self._new(np.cumsum(self.data))
+
+    def cumprod(self):
+        """Returns the cumulative product of the values.
+
+        >>> (nominal_rate(const_value=[10, 10, 20]) / 100 + 1).cumprod().tolist() # doctest: +ELLIPSIS
+        [1.1, 1.21..., 1.452...]
+
+        """
+        return self._new(np.cumprod(self.data))
+
+    def diff(self, initial=0):
+        """Returns the difference `x[t] - x[t-1]` of each period, with
+        `x[-1] = initial`. It is the inverse of `cumsum`.
+
+        >>> cashflow(const_value=[1, 3, 6, 10]).diff().tolist()
+        [1.0, 2.0, 3.0, 4.0]
+
+        """
+        return self._new(np.diff(self.data, prepend=initial))
+
+    def sum(self):
+        """Returns the sum of the values."""
+        return float(self.data.sum())
+
+    def mean(self):
+        """Returns the mean of the values."""
+        return float(self.data.mean())
+
+    def min(self):
+        """Returns the minimum value."""
+        return float(self.data.min())
+
+    def max(self):
+        """Returns the maximum value.
+
+        >>> x = cashflow(const_value=[-5, 2, 7, 7])
+        >>> x.sum(), x.mean(), x.min(), x.max(), x.argmax()
+        (11.0, 2.75, -5.0, 7.0, 2)
+
+        """
+        return float(self.data.max())
+
+    def argmax(self):
+        """Returns the index of the first period with the maximum value."""
+        return int(self.data.argmax())
+
+    #
+    # shifts
+    #
+
+    def shift(self, periods=1, fill=0):
+        """Returns the values moved `periods` periods forward (backward when
+        `periods` is negative), over the same time range; the periods left
+        without value take the value `fill`.
+
+        >>> x = cashflow(const_value=[1, 2, 3, 4])
+        >>> x.shift(1).tolist(), x.shift(-2, fill=-1).tolist()
+        ([0.0, 1.0, 2.0, 3.0], [3.0, 4.0, -1.0, -1.0])
+
+        """
+        return self._new(_shift(self.data, periods, fill))
+
+    def lag(self, periods=1, fill=0):
+        """Returns the value of `periods` periods before (see `shift`).
+
+        >>> endbal = cashflow(const_value=[90, 80, 70])
+        >>> endbal.lag(fill=100).tolist()
+        [100.0, 90.0, 80.0]
+
+        """
+        return self.shift(periods, fill)
+
+    def lead(self, periods=1, fill=0):
+        """Returns the value of `periods` periods after (see `shift`)."""
+        return self.shift(-periods, fill)
 
     #
     # mathematical operations
@@ -467,10 +885,17 @@ class TimeSeries():
         0 10.00 10.00 10.00 10.00
 
         """
-        result = self.copy()
-        for time, _ in enumerate(result.data):
-            result[time] = abs(self[time])
-        return result
+        return self._new(np.abs(self.data, dtype=np.float64))
+
+    def __neg__(self):
+        """Negation
+
+        >>> -cashflow(const_value=[1, 2, 3, 4], pyr=4) # doctest: +NORMALIZE_WHITESPACE
+           Qtr0  Qtr1  Qtr2  Qtr3
+        0 -1.00 -2.00 -3.00 -4.00
+
+        """
+        return self._new(np.negative(self.data, dtype=np.float64))
 
     def __add__(self, other):
         """Addition
@@ -480,14 +905,11 @@ class TimeSeries():
         0 3.00 3.00 3.00 3.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] += other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data + other)
 
 
     def __floordiv__(self, other):
@@ -498,14 +920,11 @@ class TimeSeries():
         0 1.00 1.00 1.00 1.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] //= other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data // other)
 
 
     def __mod__(self, other):
@@ -517,14 +936,11 @@ class TimeSeries():
 
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] %= other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data % other)
 
 
     def __mul__(self, other):
@@ -535,14 +951,11 @@ class TimeSeries():
         0 6.00 6.00 6.00 6.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] *= other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data * other)
 
 
     def __sub__(self, other):
@@ -553,14 +966,11 @@ class TimeSeries():
         0 2.00 2.00 2.00 2.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] -= other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data - other)
 
 
     def __truediv__(self, other):
@@ -571,14 +981,11 @@ class TimeSeries():
         0 1.50 1.50 1.50 1.50
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        result = self.copy()
-        for index, _ in enumerate(result.data):
-            result[index] /= other[index]
-        return result
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data / other)
 
     def __radd__(self, other):
         """Reverse add function"""
@@ -587,6 +994,196 @@ class TimeSeries():
         else:
             return self.__add__(other)
 
+    def __rsub__(self, other):
+        """Reverse substraction
+
+        >>> 10 - cashflow(const_value=[6]*4, pyr=4) # doctest: +NORMALIZE_WHITESPACE
+          Qtr0 Qtr1 Qtr2 Qtr3
+        0 4.00 4.00 4.00 4.00
+
+        """
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(other - series.data)
+
+    def __rmul__(self, other):
+        """Reverse multiplication"""
+        return self.__mul__(other)
+
+    def __rtruediv__(self, other):
+        """Reverse division
+
+        >>> 3 / cashflow(const_value=[6]*4, pyr=4) # doctest: +NORMALIZE_WHITESPACE
+          Qtr0 Qtr1 Qtr2 Qtr3
+        0 0.50 0.50 0.50 0.50
+
+        """
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(other / series.data)
+
+
+    #
+    # comparison operators
+    #
+
+    def __lt__(self, other):
+        """Elementwise comparison. Returns a time series of booleans (a mask).
+        Arithmetic operations with masks return float values.
+
+        >>> cashflow(const_value=[-1, 0, 1, 2], pyr=4) < 1 # doctest: +NORMALIZE_WHITESPACE
+          Qtr0 Qtr1 Qtr2 Qtr3
+        0 1.00 1.00 0.00 0.00
+
+        """
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data < other)
+
+    def __le__(self, other):
+        """Elementwise comparison. Returns a time series of booleans."""
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data <= other)
+
+    def __gt__(self, other):
+        """Elementwise comparison. Returns a time series of booleans.
+
+        >>> cashflow(const_value=[-1, 0, 1, 2], pyr=4) > cashflow(const_value=[0]*4, pyr=4) # doctest: +NORMALIZE_WHITESPACE
+          Qtr0 Qtr1 Qtr2 Qtr3
+        0 0.00 0.00 1.00 1.00
+
+        """
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data > other)
+
+    def __ge__(self, other):
+        """Elementwise comparison. Returns a time series of booleans."""
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data >= other)
+
+    def __eq__(self, other):
+        """Elementwise comparison. Returns a time series of booleans; use
+        `tolist` or `data` to compare the values of two series as a whole.
+
+        >>> (cashflow(const_value=[1, -2, 3]) == 1).tolist()
+        [True, False, False]
+
+        """
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data == other)
+
+    def __ne__(self, other):
+        """Elementwise comparison. Returns a time series of booleans."""
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data != other)
+
+    def __bool__(self):
+        """The truth value of a series is ambiguous, as for NumPy arrays, so
+        that `if x == y` fails instead of being always true; use `.all()` or
+        `.any()` of the values.
+
+        >>> bool(cashflow(const_value=[1, 2]) == cashflow(const_value=[1, 3]))
+        Traceback (most recent call last):
+        ...
+        ValueError: The truth value of a time series is ambiguous; use data.any() or data.all()
+
+        """
+        raise ValueError('The truth value of a time series is ambiguous; '
+                         'use data.any() or data.all()')
+
+    #
+    # masks
+    #
+
+    def __and__(self, other):
+        """Elementwise logical and of masks (time series of booleans).
+
+        >>> x = cashflow(const_value=[-10, 0, 5, 20])
+        >>> ((x > 0) & (x < 10)).tolist(), (~(x > 0)).tolist()
+        ([False, False, True, False], [True, True, False, False])
+
+        """
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        return self._new(np.logical_and(self.data, other))
+
+    def __or__(self, other):
+        """Elementwise logical or of masks."""
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        return self._new(np.logical_or(self.data, other))
+
+    def __invert__(self):
+        """Elementwise logical not of a mask."""
+        return self._new(np.logical_not(self.data))
+
+    __rand__ = __and__
+    __ror__ = __or__
+
+    def where(self, mask, other=0):
+        """Returns the values of the periods where `mask` is true and the
+        values of `other` elsewhere.
+
+        Args:
+            mask (TimeSeries, array): mask of the periods.
+            other (float, TimeSeries): values of the other periods.
+
+        >>> x = cashflow(const_value=[-10, 0, 5, 20])
+        >>> x.where(x > 2, other=-1).tolist()
+        [-1.0, -1.0, 5.0, 20.0]
+
+        """
+        return self._new(np.where(_mask_operand(self, mask), self.data,
+                                  _mask_operand(self, other)))
+
+    def clip(self, lower=None, upper=None):
+        """Returns the values limited to the interval from `lower` to `upper`
+        (numbers or time series).
+
+        >>> cashflow(const_value=[-10, 0, 5, 20]).clip(0, 10).tolist()
+        [0.0, 0.0, 5.0, 10.0]
+
+        """
+        return self._new(np.clip(self.data, _mask_operand(self, lower),
+                                 _mask_operand(self, upper)))
+
+    def positive_part(self):
+        """Returns the positive values, with zeros in the other periods.
+
+        >>> x = cashflow(const_value=[-10, 0, 5, 20])
+        >>> x.positive_part().tolist(), x.negative_part().tolist()
+        ([0.0, 0.0, 5.0, 20.0], [-10.0, 0.0, 0.0, 0.0])
+
+        """
+        return self._new(np.maximum(self.data, 0))
+
+    def negative_part(self):
+        """Returns the negative values, with zeros in the other periods. The
+        series is the sum of its positive and negative parts."""
+        return self._new(np.minimum(self.data, 0))
 
 
     #
@@ -631,12 +1228,11 @@ class TimeSeries():
         0 5.00 5.00 5.00 5.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] += other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data += other
         return self
 
 
@@ -660,12 +1256,11 @@ class TimeSeries():
         0 1.00 1.00 1.00 1.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] //= other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data //= other
         return self
 
 
@@ -680,12 +1275,11 @@ class TimeSeries():
         0 2.00 2.00 2.00 2.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] %= other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data %= other
         return self
 
 
@@ -699,12 +1293,11 @@ class TimeSeries():
         0 6.00 6.00 6.00 6.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] *= other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data *= other
         return self
 
 
@@ -718,12 +1311,11 @@ class TimeSeries():
         0 2.00 2.00 2.00 2.00
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] -= other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data -= other
         return self
 
 
@@ -737,29 +1329,762 @@ class TimeSeries():
         0 1.50 1.50 1.50 1.50
 
         """
-        if isinstance(other, (int, float)):
-            other = [other] * len(self)
-        else:
-            verify_eq_time_range(self, other)
-        for index, _ in enumerate(self.data):
-            self[index] /= other[index]
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        self._detach()
+        self.data /= other
         return self
 
 
 
+class TimeSeriesPanel():
+    """Class for representing many time series (scenarios) sharing the same
+    time range. Values are stored in a 2-D array with a row per scenario and
+    a column per period.
+
+    >>> TimeSeriesPanel(nrows=3, start=(2000, 0), nper=8, pyr=4) # doctest: +NORMALIZE_WHITESPACE
+    Time Series Panel:
+    Start = (2000, 0)
+    End = (2001, 3)
+    pyr = 4
+    Rows = 3
+
+    >>> x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])])
+    >>> x.tolist()
+    [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+
+    >>> (x + cashflow([10, 20, 30])).tolist()
+    [[11.0, 22.0, 33.0], [14.0, 25.0, 36.0]]
+
+    >>> x[1] # doctest: +NORMALIZE_WHITESPACE
+    Time Series:
+    Start = (0,)
+    End = (2,)
+    pyr = 1
+    Data = (0,)          4.00
+           (1,)          5.00
+           (2,)          6.00
+
+    """
+
+    def __init__(self, series=None, nrows=None, start=None, end=None, nper=None, pyr=1):
+        """Creates a panel from a list of time series with the same time
+        range, or a panel of zeros with `nrows` rows.
+
+        Args:
+            series (list of TimeSeries): rows of the panel.
+            nrows (int): number of rows when `series` is None.
+            start, end, nper, pyr: time range when `series` is None (see
+                `TimeSeries`).
+
+        """
+        #pylint: disable=too-many-arguments
+        if series is not None:
+            if isinstance(series, TimeSeries):
+                series = [series]
+            if len(series) == 0:
+                raise ValueError('`series` must contain at least a TimeSeries')
+            for xseries in series:
+                if not isinstance(xseries, TimeSeries):
+                    raise TypeError('`series` must be a list of TimeSeries')
+                verify_eq_time_range(series[0], xseries)
+            self.axis = series[0].axis
+            self.data = np.array([xseries.data for xseries in series], dtype=np.float64)
+            return
+        if nrows is None:
+            raise ValueError('`nrows` must be specified when `series` is None')
+        template = TimeSeries(start=start, end=end, nper=nper, pyr=pyr)
+        self.axis = template.axis
+        self.data = np.zeros((int(nrows), len(template)))
+
+    @property
+    def start(self):
+        """Timeid of the first period."""
+        return self.axis.start
+
+    @property
+    def end(self):
+        """Timeid of the last period."""
+        return self.axis.end
+
+    @property
+    def pyr(self):
+        """Number of periods per year."""
+        return self.axis.pyr
+
+    def _new(self, data):
+        """Returns a panel with the same time range and the 2-D array `data`
+        as values (see `TimeSeries._new`)."""
+        result = self.__class__.__new__(self.__class__)
+        result.axis = self.axis
+        result.data = _as_values(data)
+        return result
+
+    def _operand(self, other):
+        """Returns the values of `other` as an array or a scalar suitable for
+        elementwise operations with the panel, or `NotImplemented`."""
+        if isinstance(other, (TimeSeries, TimeSeriesPanel)):
+            other = _reindexed(other, self)
+            verify_eq_time_range(self, other)
+            return _as_float(other.data)
+        if isinstance(other, (int, float, np.number)):
+            return other
+        return NotImplemented
+
+    def __repr__(self):
+        txt = ['Time Series Panel:']
+        txt += ['Start = {:s}'.format(self.start.__repr__())]
+        txt += ['End = {:s}'.format(self.end.__repr__())]
+        txt += ['pyr = {:s}'.format(self.pyr.__repr__())]
+        txt += ['Rows = {:d}'.format(len(self.data))]
+        return '\n'.join(txt) + '\n'
+
+    @property
+    def nper(self):
+        """Number of periods of each row."""
+        return self.data.shape[1]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        """Returns the row `key` as a TimeSeries, or the rows of a slice as a
+        TimeSeriesPanel, sharing the panel values.
+
+        >>> x = TimeSeriesPanel([cashflow([1, 2]), cashflow([3, 4]), cashflow([5, 6])])
+        >>> x[-1].tolist(), x[1:].tolist()
+        ([5.0, 6.0], [[3.0, 4.0], [5.0, 6.0]])
+
+        """
+        if isinstance(key, slice):
+            return self._new(self.data[key])
+        if isinstance(key, (int, np.integer)) and not isinstance(key, (bool, np.bool_)):
+            return _new_series(self.axis, self.data[key])
+        raise TypeError('Panels are indexed by row: an integer or a slice')
+
+    def __setitem__(self, key, value):
+        if isinstance(value, TimeSeries):
+            verify_eq_time_range(self, value)
+            value = value.data
+        self.data[key] = value
+
+    def __iter__(self):
+        for index in range(len(self.data)):
+            yield self[index]
+
+    def __reduce_ex__(self, protocol):
+        """Pickles the panel as its axis and the buffer of its values (see
+        `TimeSeries.__reduce_ex__`)."""
+        return _reduce(self, protocol)
+
+    def __array__(self, dtype=None, copy=None):
+        """Returns the values as a 2-D array (see `TimeSeries.__array__`)."""
+        if copy:
+            return np.array(self.data, dtype=dtype, copy=True)
+        return np.asarray(self.data, dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """Applies NumPy ufuncs to the values (see `TimeSeries.__array_ufunc__`).
+
+        >>> x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])])
+        >>> np.sqrt(x * x).tolist()
+        [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+        >>> np.add.reduce(x, axis=0).tolist()
+        [5.0, 7.0, 9.0]
+
+        """
+        return _array_ufunc(ufunc, method, inputs, kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        """Applies NumPy functions to the values (see `__array_ufunc__`)."""
+        return _array_function(func, types, args, kwargs)
+
+    def tolist(self):
+        """Returns the values as a list of lists"""
+        return self.data.tolist()
+
+    def copy(self):
+        """returns a copy of the panel"""
+        return self._new(self.data.copy())
+
+    #
+    # cumulative operations and reductions over the periods of each row
+    #
+
+    def cumsum(self):
+        """Returns the cumulative sum of each row.
+
+        >>> TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])]).cumsum().tolist()
+        [[1.0, 3.0, 6.0], [4.0, 9.0, 15.0]]
+
+        """
+        return self._new(np.cumsum(self.data, axis=-1))
+
+    def cumprod(self):
+        """Returns the cumulative product of each row."""
+        return self._new(np.cumprod(self.data, axis=-1))
+
+    def diff(self, initial=0):
+        """Returns the difference `x[t] - x[t-1]` of each row, with
+        `x[-1] = initial` (a value, or a value per row)."""
+        initial = np.broadcast_to(np.asarray(initial, dtype=np.float64)[..., np.newaxis],
+                                  (len(self.data), 1))
+        return self._new(np.diff(self.data, axis=-1, prepend=initial))
+
+    def sum(self):
+        """Returns the sum of each row (array).
+
+        >>> x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])])
+        >>> x.sum().tolist(), x.mean().tolist(), x.min().tolist(), x.argmax().tolist()
+        ([6.0, 15.0], [2.0, 5.0], [1.0, 4.0], [2, 2])
 
-    # def window(self, left=None, right=None):
-    #     """Returns a sublist"""
-    #     if left is None:
-    #         left = 0
-    #     if right is None:
-    #         right = len(self.data)
-    #     return [self.data[t] for t in range(left, right + 1)]
+        """
+        return self.data.sum(axis=-1)
+
+    def mean(self):
+        """Returns the mean of each row (array)."""
+        return self.data.mean(axis=-1)
+
+    def min(self):
+        """Returns the minimum of each row (array)."""
+        return self.data.min(axis=-1)
+
+    def max(self):
+        """Returns the maximum of each row (array)."""
+        return self.data.max(axis=-1)
+
+    def argmax(self):
+        """Returns the index of the first period with the maximum value of
+        each row (array)."""
+        return self.data.argmax(axis=-1)
+
+    def shift(self, periods=1, fill=0):
+        """Returns the values of each row moved `periods` periods forward
+        (see `TimeSeries.shift`). `fill` may have a value per row.
+
+        >>> x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])])
+        >>> x.lag(fill=[10, 20]).tolist()
+        [[10.0, 1.0, 2.0], [20.0, 4.0, 5.0]]
+
+        """
+        return self._new(_shift(self.data, periods, fill))
+
+    def lag(self, periods=1, fill=0):
+        """Returns the value of `periods` periods before (see `shift`)."""
+        return self.shift(periods, fill)
+
+    def lead(self, periods=1, fill=0):
+        """Returns the value of `periods` periods after (see `shift`)."""
+        return self.shift(-periods, fill)
 
-    # def extend(self, left=0, right=0):
-    #     """extendes the list"""
-    #     self.data = [0] * left + self.data + [0] * right
-    #     return self
+    #
+    # mathematical operations
+    #
+
+    def __abs__(self):
+        return self._new(np.abs(self.data, dtype=np.float64))
+
+    def __neg__(self):
+        return self._new(np.negative(self.data, dtype=np.float64))
+
+    def __add__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data + other)
+
+    def __sub__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data - other)
+
+    def __mul__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data * other)
+
+    def __truediv__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data / other)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __rsub__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(other - series.data)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __rtruediv__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(other / series.data)
+
+    def __lt__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data < other)
+
+    def __le__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data <= other)
+
+    def __gt__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data > other)
+
+    def __ge__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data >= other)
+
+    def __eq__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data == other)
+
+    def __ne__(self, other):
+        series, other = _aligned(self, other)
+        other = series._operand(other)
+        if other is NotImplemented:
+            return other
+        return series._new(series.data != other)
+
+    # `==` is an elementwise comparison
+    __hash__ = None
+
+    def __bool__(self):
+        raise ValueError('The truth value of a panel is ambiguous; use data.any() or data.all()')
+
+    #
+    # masks (see the methods of TimeSeries)
+    #
+
+    def __and__(self, other):
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        return self._new(np.logical_and(self.data, other))
+
+    def __or__(self, other):
+        other = self._operand(other)
+        if other is NotImplemented:
+            return other
+        return self._new(np.logical_or(self.data, other))
+
+    def __invert__(self):
+        return self._new(np.logical_not(self.data))
+
+    __rand__ = __and__
+    __ror__ = __or__
+
+    def where(self, mask, other=0):
+        """Returns the values where `mask` is true and the values of `other`
+        elsewhere.
+
+        >>> x = TimeSeriesPanel([cashflow([-1, 2, -3]), cashflow([4, -5, 6])])
+        >>> x.where(x > 0).tolist()
+        [[0.0, 2.0, 0.0], [4.0, 0.0, 6.0]]
+
+        """
+        return self._new(np.where(_mask_operand(self, mask), self.data,
+                                  _mask_operand(self, other)))
+
+    def clip(self, lower=None, upper=None):
+        """Returns the values limited to the interval from `lower` to `upper`."""
+        return self._new(np.clip(self.data, _mask_operand(self, lower),
+                                 _mask_operand(self, upper)))
+
+    def positive_part(self):
+        """Returns the positive values, with zeros elsewhere."""
+        return self._new(np.maximum(self.data, 0))
+
+    def negative_part(self):
+        """Returns the negative values, with zeros elsewhere."""
+        return self._new(np.minimum(self.data, 0))
+
+
+
+def _shift(data, periods, fill):
+    """Returns the array `data` moved `periods` positions along the last
+    axis, with a single slice copy. The positions left empty take the value
+    `fill` (a number, or a value for each row of a 2-D array)."""
+    periods = int(periods)
+    fill = np.asarray(fill, dtype=np.float64)
+    if fill.ndim > 0:
+        fill = fill[..., np.newaxis]
+    result = np.empty(data.shape)
+    nper = data.shape[-1]
+    if periods >= 0:
+        periods = min(periods, nper)
+        result[..., :periods] = fill
+        result[..., periods:] = data[..., :nper - periods]
+    else:
+        periods = min(-periods, nper)
+        result[..., nper - periods:] = fill
+        result[..., :nper - periods] = data[..., periods:]
+    return result
+
+
+def _mask_operand(series, value):
+    """Returns the values of `value` for `where` and `clip`: the array of a
+    time series with the time range of `series`, or `value` itself."""
+    if isinstance(value, (TimeSeries, TimeSeriesPanel)):
+        if isinstance(series, TimeSeries) and isinstance(value, TimeSeriesPanel):
+            raise TypeError('A TimeSeriesPanel can not be used with a TimeSeries')
+        verify_eq_time_range(series, value)
+        return value.data
+    return value
+
+
+#
+# NumPy protocols
+#
+
+def _unwrap(value, series, out=False):
+    """Returns `value` with the time series and panels (also inside lists and
+    tuples) replaced by their arrays, which are appended to `series`. The
+    series used as `out` arguments are detached before (see
+    `TimeSeries._detach`)."""
+    if isinstance(value, (TimeSeries, TimeSeriesPanel)):
+        if out and isinstance(value, TimeSeries):
+            value._detach()
+        series.append(value)
+        return value.data
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item, series, out) for item in value)
+    return value
+
+
+def _wrap(result, series):
+    """Returns the arrays in `result` with the shape of the values of a
+    series (or a panel) of `series` as time series (or panels)."""
+    if isinstance(result, tuple):
+        return tuple(_wrap(item, series) for item in result)
+    if not isinstance(result, np.ndarray):
+        return result
+    for template in series:
+        if result.shape == template.data.shape:
+            return template._new(result)
+    if result.shape == (series[0].axis.nper,):
+        return _new_series(series[0].axis, result)
+    return result
+
+
+def _array_ufunc(ufunc, method, inputs, kwargs):
+    """Implementation of `__array_ufunc__` for series and panels."""
+    for value in inputs + kwargs.get('out', ()):
+        if hasattr(value, '__array_ufunc__') and \
+                not isinstance(value, (np.ndarray, np.generic, TimeSeries, TimeSeriesPanel)):
+            return NotImplemented
+    series = []
+    inputs = _unwrap(inputs, series)
+    outputs = kwargs.get('out')
+    if outputs is not None:
+        kwargs['out'] = _unwrap(outputs, [], out=True)
+    for other in series[1:]:
+        verify_eq_time_range(series[0], other)
+    # panels are used as templates before series
+    series.sort(key=lambda x: not isinstance(x, TimeSeriesPanel))
+    result = getattr(ufunc, method)(*inputs, **kwargs)
+    if outputs is not None:
+        return outputs[0] if len(outputs) == 1 else outputs
+    if method == 'at':
+        return None
+    return _wrap(result, series)
+
+
+def _array_function(func, types, args, kwargs):
+    """Implementation of `__array_function__` for series and panels. The
+    results are returned as series only when all the series in the
+    arguments have the same time range."""
+    for xtype in types:
+        if not issubclass(xtype, (np.ndarray, TimeSeries, TimeSeriesPanel)):
+            return NotImplemented
+    series = []
+    args = _unwrap(args, series)
+    kwargs = {key: _unwrap(value, series) for key, value in kwargs.items()}
+    result = func(*args, **kwargs)
+    if any(other.axis is not series[0].axis for other in series):
+        return result
+    series.sort(key=lambda x: not isinstance(x, TimeSeriesPanel))
+    return _wrap(result, series)
+
+
+
+#
+# alignment of time series with different time ranges
+#
+
+# policy of the arithmetic operators for operands with different time
+# ranges (see `alignment`); None raises a ValueError
+_ALIGNMENT = None
+
+
+def reindex(series, start=None, end=None, fill=0):
+    """Returns a copy of `series` (a TimeSeries or a TimeSeriesPanel) over the
+    time range from `start` to `end`.
+
+    Args:
+        series (TimeSeries, TimeSeriesPanel): values to reindex.
+        start (tuple): first period of the result. Defaults to `series.start`.
+        end (tuple): last period of the result. Defaults to `series.end`.
+        fill (float, str): value of the periods outside the range of
+            `series`. With `'ffill'`, the periods after the end take the last
+            value of `series` and the periods before the start take the first
+            value, as required for interest rates.
+
+    Returns:
+        A TimeSeries (or TimeSeriesPanel) with the same type as `series`.
+
+    >>> reindex(cashflow([1, 2, 3], start=(2020,)), start=(2018,), end=(2024,)).tolist()
+    [0.0, 0.0, 1.0, 2.0, 3.0, 0.0, 0.0]
+    >>> rate = nominal_rate([10, 12], start=(2000, 2), pyr=4)
+    >>> reindex(rate, start=(2000, 0), end=(2001, 0), fill='ffill').tolist()
+    [10.0, 10.0, 10.0, 12.0, 12.0]
+
+    """
+    if start is None:
+        start = series.start
+    if end is None:
+        end = series.end
+    axis = TimeAxis(start, end, series.pyr)
+    if axis.nper < 1:
+        raise ValueError('`end` must not be before `start`')
+
+    # positions of the series in the result, and of the overlap in the series
+    nper = series.data.shape[-1]
+    offset = axis.index(series.start)
+    first = min(max(offset, 0), axis.nper)
+    last = max(min(offset + nper, axis.nper), first)
+    shape = series.data.shape[:-1] + (axis.nper,)
+    if fill == 'ffill':
+        data = np.empty(shape)
+        data[..., :first] = series.data[..., :1]
+        data[..., last:] = series.data[..., -1:]
+    else:
+        data = np.full(shape, float(fill))
+    data[..., first:last] = series.data[..., first - offset:last - offset]
+    return _new_series(axis, data, series.__class__)
+
+
+def align(*series, join='outer', fill=0):
+    """Returns the time series (or panels) `series` over a common time range.
+
+    Args:
+        series (TimeSeries, TimeSeriesPanel): series with the same number of
+            periods per year.
+        join (str): time range of the result: `'outer'` (from the first start
+            to the last end), `'inner'` (the periods common to all the
+            series), `'left'` (the range of the first series) or `'right'`
+            (the range of the last series).
+        fill (float, str, list): value of the added periods (see `reindex`),
+            or a list with a value for each series.
+
+    Returns:
+        A list with the reindexed series. The series that already have the
+        common time range are returned without copies.
+
+    >>> flows = cashflow([100] * 3, start=(2020,))
+    >>> rates = nominal_rate([8, 9, 10], start=(2018,))
+    >>> flows, rates = align(flows, rates, fill=[0, 'ffill'])
+    >>> flows.tolist()
+    [0.0, 0.0, 100.0, 100.0, 100.0]
+    >>> rates.tolist()
+    [8.0, 9.0, 10.0, 10.0, 10.0]
+    >>> [x.tolist() for x in align(flows[2:], rates[:3], join='inner')]
+    [[100.0], [10.0]]
+
+    """
+    if not series:
+        return []
+    for other in series[1:]:
+        if other.pyr != series[0].pyr:
+            raise ValueError('Time series have different periods per year: ' +
+                             series[0].pyr.__repr__() + ', ' + other.pyr.__repr__())
+    if isinstance(fill, (list, tuple)):
+        if len(fill) != len(series):
+            raise ValueError('`fill` must have a value for each series')
+    else:
+        fill = [fill] * len(series)
+
+    if join == 'outer':
+        start = min(x.start for x in series)
+        end = max(x.end for x in series)
+    elif join == 'inner':
+        start = max(x.start for x in series)
+        end = min(x.end for x in series)
+        if end < start:
+            raise ValueError('Time series do not have common periods')
+    elif join == 'left':
+        start, end = series[0].start, series[0].end
+    elif join == 'right':
+        start, end = series[-1].start, series[-1].end
+    else:
+        raise ValueError('`join` must be one of outer, inner, left or right')
+
+    axis = TimeAxis(start, end, series[0].pyr)
+    return [x if x.axis is axis else reindex(x, start, end, xfill)
+            for x, xfill in zip(series, fill)]
+
+
+@contextlib.contextmanager
+def alignment(join='outer', fill=0):
+    """Context where the arithmetic and comparison operators align the time
+    series with different time ranges (see `align`). The in-place operators
+    keep the time range of the left operand.
+
+    >>> flows = cashflow([100] * 3, start=(2020,))
+    >>> with alignment():
+    ...     total = flows + cashflow([-250, 0], start=(2019,))
+    >>> total.start, total.tolist()
+    ((2019,), [-250.0, 100.0, 100.0, 100.0])
+
+    """
+    #pylint: disable=global-statement
+    global _ALIGNMENT
+    previous = _ALIGNMENT
+    _ALIGNMENT = {'join': join, 'fill': fill}
+    try:
+        yield
+    finally:
+        _ALIGNMENT = previous
+
+
+def _aligned(series, other):
+    """Returns the operands `series` and `other` aligned with the policy of
+    the enclosing `alignment` context."""
+    if (_ALIGNMENT is None or not isinstance(other, (TimeSeries, TimeSeriesPanel))
+            or other.axis is series.axis or other.pyr != series.pyr):
+        return series, other
+    return align(series, other, **_ALIGNMENT)
+
+
+def _reindexed(other, series):
+    """Returns `other` over the time range of `series` inside an `alignment`
+    context."""
+    if _ALIGNMENT is None or other.axis is series.axis or other.pyr != series.pyr:
+        return other
+    return reindex(other, series.start, series.end, _ALIGNMENT['fill'])
+
+
+
+#
+# frequency conversion
+#
+
+def _period_number(timeid, pyr):
+    """Returns the number of periods from the year zero to `timeid`."""
+    if len(timeid) == 1:
+        return timeid[0] * pyr
+    return timeid[0] * pyr + timeid[1]
+
+
+def _number_timeid(number, pyr):
+    """Returns the timeid of the period `number` (see `_period_number`)."""
+    if pyr == 1:
+        return (number,)
+    return divmod(number, pyr)
+
+
+def resample(series, pyr, kind='cashflow'):
+    """Converts a time series (or a panel) to `pyr` periods per year.
+
+    Args:
+        series (TimeSeries, TimeSeriesPanel): values to convert. The number
+            of periods per year of `series` must be a multiple or a divisor
+            of `pyr`.
+        pyr (int): number of periods per year of the result.
+        kind (str): `'cashflow'` or `'rate'`. Cashflows are added when the
+            frequency is reduced and divided in equal parts when it is
+            increased. Nominal rates (in percent) are converted with the
+            same compounding of `iconv`: the compounded periodic rates of
+            a new period are equal to the compounded periodic rates of the
+            periods that it replaces.
+
+    Returns:
+        A TimeSeries (or TimeSeriesPanel) with `pyr` periods per year. When
+        the frequency is reduced and the series does not start or end at the
+        bounds of a new period, the missing periods are taken as zero
+        cashflows or as the first or last rate.
+
+    >>> flows = cashflow([100] * 12, start=(2000, 0), pyr=12)
+    >>> resample(flows, pyr=4) # doctest: +NORMALIZE_WHITESPACE
+           Qtr0   Qtr1   Qtr2   Qtr3
+    2000 300.00 300.00 300.00 300.00
+
+    >>> rate = nominal_rate([12] * 12, start=(2000, 0), pyr=12)
+    >>> resample(rate, pyr=1, kind='rate').tolist() # doctest: +ELLIPSIS
+    [12.68250...]
+    >>> resample(resample(rate, pyr=4, kind='rate'), pyr=12, kind='rate').tolist() # doctest: +ELLIPSIS
+    [12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0..., 12.0...]
+
+    """
+    if kind not in ('cashflow', 'rate'):
+        raise ValueError("`kind` must be 'cashflow' or 'rate'")
+    if pyr == series.pyr:
+        return series.copy()
+    first = _period_number(series.start, series.pyr)
+    last = _period_number(series.end, series.pyr)
+
+    if pyr < series.pyr:
+        if series.pyr % pyr != 0:
+            raise ValueError('`pyr` must be a divisor of ' + series.pyr.__repr__())
+        factor = series.pyr // pyr
+        start = first - first % factor
+        end = last - last % factor + factor - 1
+        if start != first or end != last:
+            series = reindex(series, _number_timeid(start, series.pyr),
+                             _number_timeid(end, series.pyr),
+                             fill=0 if kind == 'cashflow' else 'ffill')
+        # a new period for each block of `factor` contiguous periods
+        data = series.data.reshape(series.data.shape[:-1] + (-1, factor))
+        if kind == 'cashflow':
+            data = data.sum(axis=-1)
+        else:
+            data = 100 * pyr * np.expm1(np.log1p(data / (100 * series.pyr)).sum(axis=-1))
+        axis = TimeAxis(_number_timeid(start // factor, pyr),
+                        _number_timeid(end // factor, pyr), pyr)
+    else:
+        if pyr % series.pyr != 0:
+            raise ValueError('`pyr` must be a multiple of ' + series.pyr.__repr__())
+        factor = pyr // series.pyr
+        if kind == 'cashflow':
+            data = series.data / factor
+        else:
+            data = 100 * pyr * np.expm1(np.log1p(series.data / (100 * series.pyr)) / factor)
+        data = np.repeat(data, factor, axis=-1)
+        axis = TimeAxis(_number_timeid(first * factor, pyr),
+                        _number_timeid(last * factor + factor - 1, pyr), pyr)
+    return _new_series(axis, data, series.__class__)
 
 
 
@@ -810,7 +2135,7 @@ def cashflow(const_value=0, start=None, end=None, nper=None, pyr=1, spec=None):
     0  0.00  1.00  2.00 10.00
 
     >>> x[3]  # doctest: +NORMALIZE_WHITESPACE
-    10
+    10.0
 
     >>> x[(0, 3)] = 0
     >>> x # doctest: +NORMALIZE_WHITESPACE
@@ -818,7 +2143,7 @@ def cashflow(const_value=0, start=None, end=None, nper=None, pyr=1, spec=None):
     0  0.00  1.00  2.00  0.00
 
     >>> x[(0,2)]  # doctest: +NORMALIZE_WHITESPACE
-    2
+    2.0
 
     >>> cashflow(const_value=[0, 1, 2, 2, 4, 5, 6, 7, 8])  # doctest: +NORMALIZE_WHITESPACE
     Time Series:
@@ -845,26 +2170,12 @@ def cashflow(const_value=0, start=None, end=None, nper=None, pyr=1, spec=None):
            (10,)-(14,) [5]   0.00
 
     """
-    if isinstance(const_value, list) and nper is None:
+    #pylint: disable=too-many-arguments
+    if nper is None and not isinstance(const_value, (int, float, np.number)):
         nper = len(const_value)
     time_series = TimeSeries(start=start, end=end, nper=nper, pyr=pyr)
-    start = time_series.start
-    for index, _ in enumerate(time_series):
-        if isinstance(const_value, list):
-            time_series[index] = const_value[index]
-        else:
-            time_series[index] = const_value
-    if spec is None:
-        return time_series
-    if isinstance(spec, tuple):
-        spec = [spec]
-    for xspec in spec:
-        timeid, value = xspec
-        if isinstance(timeid, int):
-            time = timeid
-        else:
-            time = _timeid2index(timeid=timeid, basis=start, pyr=pyr)
-        time_series[time] = value
+    _fill(time_series.data, const_value)
+    _set_spec(time_series.data, spec, time_series.axis)
     return time_series
 
 def nominal_rate(const_value=0, start=None, end=None, nper=None, pyr=1, spec=None):
@@ -901,38 +2212,113 @@ def nominal_rate(const_value=0, start=None, end=None, nper=None, pyr=1, spec=Non
     2 10.00 10.00
 
     """
-    if isinstance(const_value, list) and nper is None:
+    #pylint: disable=too-many-arguments
+    if nper is None and not isinstance(const_value, (int, float, np.number)):
         nper = len(const_value)
     time_series = TimeSeries(start=start, end=end, nper=nper, pyr=pyr)
-    start = time_series.start
-    for index, _ in enumerate(time_series):
-        if isinstance(const_value, list):
-            time_series[index] = const_value[index]
-        else:
-            time_series[index] = const_value
-    if spec is None:
-        return time_series
+    _fill(time_series.data, const_value)
+    _fill_spec(time_series.data, spec, time_series.axis)
+    return time_series
+
+
+def cashflow_panel(values=0, nrows=None, start=None, end=None, nper=None, pyr=1, spec=None):
+    """Returns a panel of cashflows with a row for each vector of `values`.
+
+    Args:
+        values (float, list, array): a 2-D array (or a list of vectors) with
+            the values of each row, or a value (or a vector) shared by
+            `nrows` rows.
+        nrows (int): number of rows, when `values` does not have rows.
+        start, end, nper, pyr: time range (see `TimeSeries`).
+        spec (tuple, list): values of specific periods, as in `cashflow`.
+            The value of a period is a number or a vector with a value for
+            each row.
+
+    >>> cashflow_panel([[100, 200, 300], [10, 20, 30]], spec=(0, [-500, -50])).tolist()
+    [[-500.0, 200.0, 300.0], [-50.0, 20.0, 30.0]]
+
+    """
+    #pylint: disable=too-many-arguments
+    panel = _new_panel(values, nrows, start, end, nper, pyr)
+    _set_spec(panel.data, spec, panel.axis)
+    return panel
+
+
+def nominal_rate_panel(values=0, nrows=None, start=None, end=None, nper=None, pyr=1,
+                       spec=None):
+    """Returns a panel of interest rates with a row for each vector of
+    `values`. The arguments are the same of `cashflow_panel`; each value of
+    `spec` is kept until the next specified period, as in `nominal_rate`.
+
+    >>> nominal_rate_panel(nrows=2, nper=4, spec=[(0, 5), (2, [8, 9])]).tolist()
+    [[5.0, 5.0, 8.0, 8.0], [5.0, 5.0, 9.0, 9.0]]
+
+    """
+    #pylint: disable=too-many-arguments
+    panel = _new_panel(values, nrows, start, end, nper, pyr)
+    _fill_spec(panel.data, spec, panel.axis)
+    return panel
+
+
+def _new_panel(values, nrows, start, end, nper, pyr):
+    """Returns a panel with the time range `start`, `end`, `nper`, `pyr`,
+    filled with `values`."""
+    #pylint: disable=too-many-arguments
+    values = np.asarray(values, dtype=np.float64)
+    if nper is None and values.ndim > 0:
+        nper = values.shape[-1]
+    if nrows is None:
+        if values.ndim < 2:
+            raise ValueError('`nrows` must be specified when `values` does not have rows')
+        nrows = len(values)
+    panel = TimeSeriesPanel(nrows=nrows, start=start, end=end, nper=nper, pyr=pyr)
+    _fill(panel.data, values)
+    return panel
+
+
+def _fill(data, values):
+    """Fills `data` with a value or with the first values of a vector (or an
+    array with a row for each row of `data`)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 0:
+        data.fill(values)
+    else:
+        data[...] = values[..., :data.shape[-1]]
+
+
+def _spec_arrays(spec, axis):
+    """Returns the indexes and the values of the periods in `spec`, with the
+    values in the last axis."""
     if isinstance(spec, tuple):
         spec = [spec]
-    nummod = len(spec)
-    starting = [None] * nummod
-    ending = [None] * nummod
-    values = [None] * nummod
-    for index, xspec in enumerate(spec):
-        timeid, value = xspec
-        if isinstance(timeid, int):
-            time = timeid
-        else:
-            time = _timeid2index(timeid=timeid, basis=start, pyr=pyr)
-        starting[index] = time
-        values[index] = value
-        ending[index] = len(time_series)
-        if index > 0:
-            ending[index - 1] = time
-    for index in range(nummod):
-        for time in range(starting[index], ending[index]):
-            time_series[time] = values[index]
-    return time_series
+    times = np.array([timeid if isinstance(timeid, (int, np.integer)) else axis.index(timeid)
+                      for timeid, _ in spec], dtype=np.intp)
+    values = np.array(np.broadcast_arrays(*[np.asarray(value, dtype=np.float64)
+                                            for _, value in spec]))
+    return times, np.moveaxis(values, 0, -1)
+
+
+def _set_spec(data, spec, axis):
+    """Sets the values of the periods in `spec` (see `cashflow`)."""
+    if not spec:
+        return
+    times, values = _spec_arrays(spec, axis)
+    data[..., times] = values
+
+
+def _fill_spec(data, spec, axis):
+    """Sets the values in `spec` from each period to the next specified
+    period (see `nominal_rate`). The periods are sorted and each value fills
+    a run of contiguous periods."""
+    if not spec:
+        return
+    times, values = _spec_arrays(spec, axis)
+    nper = data.shape[-1]
+    times = np.where(times < 0, times + nper, times)
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    lengths = np.diff(np.append(times, nper))
+    data[..., times[0]:] = np.repeat(values[..., order], lengths, axis=-1)
 
 
 
@@ -1050,7 +2436,7 @@ def cfloplot(cflo):
     else:
         xmajor, xminor = cflo.start
 
-    maxval = max(abs(cflo))
+    maxval = abs(cflo).max()
 
 
     width = 20
@@ -0,0 +1,302 @@
+"""
+Lazy expressions
+===============================================================================
+
+The arithmetic operators of TimeSeries compute a new series for each
+operation. With `lazy`, the operators build an expression that is evaluated
+when its values are requested, in a single pass over blocks of periods and
+without the intermediate series.
+
+>>> revenue = cashflow([0] + [500]*4)
+>>> costs = cashflow([0] + [200]*4)
+>>> tax = nominal_rate([30]*5) / 100
+>>> shield = cashflow([0] + [20]*4)
+>>> profit = (lazy(revenue) - costs) * (1 - tax) + shield
+>>> profit # doctest: +NORMALIZE_WHITESPACE
+Time Series:
+Start = (0,)
+End = (4,)
+pyr = 1
+Data = (0,)           0.00
+       (1,)-(4,) [4] 230.00
+
+The expression is used as a TimeSeries by `timevalue`, which computes the net
+value block by block without storing the values of the expression:
+
+>>> from cashflows.gcashana import timevalue
+>>> timevalue(profit + cashflow([-600, 0, 0, 0, 0]), nominal_rate([10]*5)) # doctest: +ELLIPSIS
+129.06...
+
+`evaluate` computes several expressions in the same pass. The common
+subexpressions are computed once:
+
+>>> before_tax = lazy(revenue) - costs
+>>> taxes, after_tax = evaluate(before_tax * tax, before_tax * (1 - tax))
+>>> taxes.tolist(), after_tax.tolist()
+([0.0, 90.0, 90.0, 90.0, 90.0], [0.0, 210.0, 210.0, 210.0, 210.0])
+
+
+Description of the functions and objects in this module
+===============================================================================
+
+"""
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate
+from cashflows.gtimeseries import verify_eq_time_range
+
+# number of values computed at once by each node
+_BLOCK_SIZE = 2 ** 14
+
+_OPERATIONS = {'add': np.add, 'sub': np.subtract, 'mul': np.multiply,
+               'truediv': np.true_divide, 'floordiv': np.floor_divide,
+               'mod': np.remainder, 'pow': np.power, 'neg': np.negative,
+               'abs': np.absolute}
+
+
+class Expr():
+    """Node of a lazy expression over time series.
+
+    A node is a time series or a panel (a leaf), or an operation over other
+    nodes and numbers. The nodes are created with `lazy` and the arithmetic
+    operators.
+
+    """
+
+    def __init__(self, operation, operands, template):
+        self.operation = operation
+        self.operands = operands
+        self.template = template
+
+    def _node(self, operation, *operands):
+        """Returns the node of `operation` applied to `self` and `operands`."""
+        args = [self]
+        template = self.template
+        for operand in operands:
+            if isinstance(operand, (TimeSeries, TimeSeriesPanel)):
+                operand = lazy(operand)
+            if isinstance(operand, Expr):
+                verify_eq_time_range(self.template, operand.template)
+                if isinstance(operand.template, TimeSeriesPanel):
+                    template = operand.template
+            elif not isinstance(operand, (int, float, np.number)):
+                return NotImplemented
+            args.append(operand)
+        return Expr(operation, tuple(args), template)
+
+    def _rnode(self, operation, other):
+        """Returns the node of `operation` applied to `other` and `self`."""
+        node = self._node(operation, other)
+        if node is NotImplemented:
+            return node
+        node.operands = node.operands[::-1]
+        return node
+
+    def __add__(self, other):
+        return self._node('add', other)
+
+    def __sub__(self, other):
+        return self._node('sub', other)
+
+    def __mul__(self, other):
+        return self._node('mul', other)
+
+    def __truediv__(self, other):
+        return self._node('truediv', other)
+
+    def __floordiv__(self, other):
+        return self._node('floordiv', other)
+
+    def __mod__(self, other):
+        return self._node('mod', other)
+
+    def __pow__(self, other):
+        return self._node('pow', other)
+
+    def __radd__(self, other):
+        return self._rnode('add', other)
+
+    def __rsub__(self, other):
+        return self._rnode('sub', other)
+
+    def __rmul__(self, other):
+        return self._rnode('mul', other)
+
+    def __rtruediv__(self, other):
+        return self._rnode('truediv', other)
+
+    def __neg__(self):
+        return self._node('neg')
+
+    def __abs__(self):
+        return self._node('abs')
+
+    @property
+    def axis(self):
+        """TimeAxis of the expression."""
+        return self.template.axis
+
+    @property
+    def start(self):
+        """Start of the time range."""
+        return self.template.start
+
+    @property
+    def end(self):
+        """End of the time range."""
+        return self.template.end
+
+    @property
+    def pyr(self):
+        """Number of periods per year."""
+        return self.template.pyr
+
+    @property
+    def shape(self):
+        """Shape of the values of the expression."""
+        return self.template.data.shape
+
+    @property
+    def data(self):
+        """Values of the expression (evaluated at each access)."""
+        return self.evaluate().data
+
+    def __len__(self):
+        return len(self.template)
+
+    def __repr__(self):
+        return self.evaluate().__repr__()
+
+    def tolist(self):
+        """Returns the values as a list"""
+        return self.data.tolist()
+
+    def evaluate(self):
+        """Returns the values of the expression as a TimeSeries (or a
+        TimeSeriesPanel)."""
+        return evaluate(self)[0]
+
+
+def lazy(series):
+    """Returns the time series (or panel) `series` as a leaf of a lazy
+    expression. The values of `series` are read when the expression is
+    evaluated.
+
+    >>> x = lazy(cashflow([1, 2, 3]))
+    >>> (2 * x + 1).tolist()
+    [3.0, 5.0, 7.0]
+
+    """
+    if isinstance(series, Expr):
+        return series
+    if not isinstance(series, (TimeSeries, TimeSeriesPanel)):
+        raise TypeError("`series` must be a TimeSeries or a TimeSeriesPanel")
+    return Expr('leaf', (series,), series)
+
+
+def _program(exprs):
+    """Returns the unique nodes of the expressions `exprs` in evaluation
+    order, as tuples `(operation, arguments)`, and the position of each
+    expression in the list. Nodes with the same operation over the same
+    arguments are merged, so common subexpressions are computed once. The
+    arguments are positions of other nodes or numbers."""
+    program = []
+    positions = {}
+    cache = {}
+
+    # the nodes are visited in postorder with an explicit stack, so long
+    # chains of operations do not reach the recursion limit
+    for expr in exprs:
+        stack = [expr]
+        while stack:
+            node = stack[-1]
+            if id(node) in cache:
+                stack.pop()
+                continue
+            pending = [operand for operand in node.operands
+                       if isinstance(operand, Expr) and id(operand) not in cache]
+            if node.operation != 'leaf' and pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node.operation == 'leaf':
+                key = ('leaf', id(node.operands[0].data))
+            else:
+                key = (node.operation,
+                       tuple(cache[id(operand)] if isinstance(operand, Expr)
+                             else ('const', float(operand)) for operand in node.operands))
+            if key not in positions:
+                positions[key] = len(program)
+                program.append((node, key))
+            cache[id(node)] = ('node', positions[key])
+
+    outputs = [cache[id(expr)][1] for expr in exprs]
+    return program, outputs
+
+
+def _blocks(exprs):
+    """Yields the values of the expressions `exprs` by blocks of periods,
+    as tuples `(columns, values)`."""
+    program, outputs = _program(exprs)
+    nrows = max(expr.shape[0] if len(expr.shape) == 2 else 1 for expr in exprs)
+    nper = exprs[0].shape[-1]
+    step = max(1, _BLOCK_SIZE // nrows)
+
+    # position of the last node that uses each node
+    last = list(range(len(program)))
+    for index, (_, key) in enumerate(program):
+        if key[0] != 'leaf':
+            for arg in key[1]:
+                if arg[0] == 'node':
+                    last[arg[1]] = index
+    for output in outputs:
+        last[output] = len(program)
+
+    for first in range(0, nper, step):
+        columns = slice(first, min(first + step, nper))
+        values = {}
+        for index, (node, key) in enumerate(program):
+            if key[0] == 'leaf':
+                values[index] = node.operands[0].data[..., columns]
+            else:
+                args = [values[arg[1]] if arg[0] == 'node' else arg[1] for arg in key[1]]
+                values[index] = _OPERATIONS[key[0]](*args)
+            # the values are released after their last use
+            for arg in set(key[1] if key[0] != 'leaf' else ()):
+                if arg[0] == 'node' and last[arg[1]] == index:
+                    del values[arg[1]]
+        yield columns, [values[output] for output in outputs]
+
+
+def evaluate(*exprs):
+    """Evaluates the expressions `exprs` in a single pass.
+
+    Args:
+        exprs (Expr): expressions over time series with the same time range.
+
+    Returns:
+        A list with a TimeSeries (or TimeSeriesPanel) for each expression.
+
+    """
+    exprs = [lazy(expr) for expr in exprs]
+    for expr in exprs[1:]:
+        verify_eq_time_range(exprs[0].template, expr.template)
+    results = [np.empty(expr.shape) for expr in exprs]
+    for columns, values in _blocks(exprs):
+        for result, value in zip(results, values):
+            result[..., columns] = value
+    return [expr.template._new(result) for expr, result in zip(exprs, results)]
+
+
+def _weighted_sum(expr, weights):
+    """Returns the sum over the periods of the values of `expr` multiplied by
+    `weights`, computed by blocks of periods."""
+    total = 0
+    for columns, (values,) in _blocks([expr]):
+        total = total + np.einsum('...t,...t->...', values, weights[..., columns])
+    return total
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -145,11 +145,16 @@ t         Beg.    Per.   Total    Int.    Ppal  Ending
 """
 
 
+import numpy as np
 from cashflows.gcashana import timevalue
-from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate, verify_eq_time_range
 from cashflows.gtimeseries import repr_table
 from cashflows.gcashana import irr
-from cashflows.basics import pvpmt
+from cashflows.basics import pvpmt, _tvm_pmt
+from cashflows.recurrence import affine_scan, affine_scan_floor
+
+# number of values (loans x periods) computed at once by LoanBook
+_BLOCK_SIZE = 2 ** 20
 
 ##
 ## base class for computations
@@ -274,80 +279,235 @@ def fixed_rate_loan(amount, nrate, life, start, pyr=1, grace=0, dispoints=0,
 
     nrate = nominal_rate(const_value=nrate, start=start, nper=life+grace+1, pyr=pyr)
 
-    if prepmt is None:
-        prepmt = cashflow(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    else:
+    if prepmt is not None:
         verify_eq_time_range(nrate, prepmt)
+        prepmt = prepmt.data
 
-    if balloonpmt is None:
-        balloonpmt = cashflow(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    else:
+    if balloonpmt is not None:
         verify_eq_time_range(nrate, balloonpmt)
+        balloonpmt = balloonpmt.data
+
+    book = LoanBook(amount=amount, nrate=nrate[0], life=life, pyr=pyr, start=start,
+                    grace=grace, dispoints=dispoints, orgpoints=orgpoints,
+                    prepmt=prepmt, balloonpmt=balloonpmt)
+    return book[0]
+
+
+class LoanBook():
+    """Book of fixed rate loans computed all at once.
+
+    The parameters of the loans are stored as arrays with an element per loan,
+    and the schedules as 2-D arrays with a row per loan and a column per
+    period (the period 0 is the disbursement of each loan). Loans with a
+    shorter `life` + `grace` are padded with zeros. Each loan follows the
+    rules of `fixed_rate_loan`.
+
+    Args:
+        amount (float, array): amount of each loan.
+        nrate (float, array): nominal interest rate per year of each loan.
+        life (int, array): number of payment periods of each loan.
+        pyr (int): number of periods per year.
+        start (tuple): start date of the loans.
+        grace (int, array): grace periods of each loan.
+        dispoints (float, array): discount points.
+        orgpoints (float, array): origination points.
+        prepmt (array, TimeSeriesPanel): prepayments, with a row per loan and
+            a column per period.
+        balloonpmt (array, TimeSeriesPanel): balloon payments, with a row per
+            loan and a column per period.
+
+    >>> pmt = cashflow(const_value=0, nper = 11, pyr=4, spec=((1, 3), 200))
+    >>> book = LoanBook(amount=[1000, 2000, 1000], nrate=[10, 10, 12], life=[10, 10, 8],
+    ...                 pyr=4, prepmt=[pmt.tolist(), [0] * 11, [0] * 11])
+    >>> book # doctest: +NORMALIZE_WHITESPACE
+    Loan Book:
+    Loans = 3
+    Periods = 11
+    pyr = 4
+
+    >>> book.pmt.round(2).tolist()
+    [114.26, 228.52, 142.46]
+
+    >>> book[0] # doctest: +NORMALIZE_WHITESPACE
+    t         Beg.    Per.   Total    Int.    Ppal  Ending
+              Ppal    Rate     Pmt     Pmt     Pmt    Ppal
+    ------------------------------------------------------
+    (0, 0) 1000.00   10.00    0.00    0.00    0.00 1000.00
+    (0, 1) 1000.00   10.00  114.26   25.00   89.26  910.74
+    (0, 2)  910.74   10.00  114.26   22.77   91.49  819.25
+    (0, 3)  819.25   10.00  114.26   20.48   93.78  725.47
+    (1, 0)  725.47   10.00  114.26   18.14   96.12  629.35
+    (1, 1)  629.35   10.00  114.26   15.73   98.52  530.83
+    (1, 2)  530.83   10.00  114.26   13.27  100.99  429.84
+    (1, 3)  429.84   10.00  314.26   10.75  303.51  126.33
+    (2, 0)  126.33   10.00  114.26    3.16  111.10   15.23
+    (2, 1)   15.23   10.00   15.61    0.38   15.23    0.00
+    (2, 2)    0.00   10.00    0.00    0.00    0.00    0.00
+
+    >>> book.endppalbal[2].round(2).tolist()
+    [1000.0, 887.54, 771.71, 652.41, 529.52, 402.95, 272.59, 138.31, 0.0, 0.0, 0.0]
+
+    >>> book.true_rate().round(6).tolist()
+    [10.0, 10.0, 12.0]
 
-    # present value of the balloon payments
-    if balloonpmt is not None:
-        balloonpv = timevalue(cflo=balloonpmt, marr=nrate, base_date=grace)
-    else:
-        balloonpv = 0
-
-    pmt = pvpmt(pmt=None, pval=-amount+balloonpv, nrate=nrate[0], nper=len(nrate)-1, pyr=nrate.pyr)
-    pmts = cashflow(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    for time in range(1, life + 1):
-        pmts[grace + time] = pmt
-
-    # balance
-    begppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    intpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    ppalpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    totpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    endppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-
-    # payments per period
-    for time, _ in enumerate(totpmt):
-        totpmt[time] = pmts[time] + balloonpmt[time] + prepmt[time]
-
-    # balance calculation
-    for time in range(grace + life + 1):
-
-        if time == 0:
-            begppalbal[0] = amount
-            endppalbal[0] = amount
-            totpmt[time] = amount * (dispoints + orgpoints)
-            intpmt[time] = amount * dispoints
-        else:
-            begppalbal[time] = endppalbal[time - 1]
-            if time <= grace:
-                intpmt[time] = begppalbal[time] * nrate[time] / nrate.pyr / 100
-                totpmt[time] = intpmt[time]
-                endppalbal[time] = begppalbal[time]
-            else:
-                intpmt[time] = begppalbal[time] * nrate[time] / nrate.pyr / 100
-                ppalpmt[time] = totpmt[time] - intpmt[time]
-                if ppalpmt[time] < 0:
-                    capint = - ppalpmt[time]
-                    ppalpmt[time] = 0
-                else:
-                    capint = 0
-                endppalbal[time] = begppalbal[time] - ppalpmt[time] + capint
-                if endppalbal[time] < 0:
-                    totpmt[time] = begppalbal[time] + intpmt[time]
-                    ppalpmt[time] = begppalbal[time]
-                    endppalbal[time] = begppalbal[time] - ppalpmt[time]
-                    pmts[time] = 0
-                    prepmt[time] = 0
+    """
 
-    result = Loan()
-    result.life = life
-    result.nrate = nrate
-    result.grace = grace
-    result.amount = amount
-    result.begppalbal = begppalbal
-    result.totpmt = totpmt
-    result.intpmt = intpmt
-    result.ppalpmt = ppalpmt
-    result.endppalbal = endppalbal
+    #pylint: disable=too-many-instance-attributes,too-many-arguments
+
+    def __init__(self, amount, nrate, life, pyr=1, start=None, grace=0, dispoints=0,
+                 orgpoints=0, prepmt=None, balloonpmt=None):
+        params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=np.float64))
+                                       for x in (amount, nrate, life, grace,
+                                                 dispoints, orgpoints)])
+        if params[0].ndim != 1:
+            raise ValueError('Parameters of the loans must be scalars or 1-D arrays')
+        self.amount, self.nrate, life, grace, self.dispoints, self.orgpoints = [
+            np.array(x) for x in params]
+        self.life = life.astype(np.int64)
+        self.grace = grace.astype(np.int64)
+        self.pyr = pyr
+        self.start = start
+        self.nper = int((self.life + self.grace).max()) + 1
+        self.prepmt = self._schedule('prepmt', prepmt)
+        self.balloonpmt = self._schedule('balloonpmt', balloonpmt)
+        self.pmt = self.begppalbal = self.intpmt = self.ppalpmt = None
+        self.totpmt = self.endppalbal = None
+        self._compute()
+
+    def _schedule(self, name, value):
+        """Returns the payments `value` as an array with a row per loan."""
+        shape = (len(self.amount), self.nper)
+        if value is None:
+            return np.broadcast_to(0.0, shape)
+        if isinstance(value, TimeSeriesPanel):
+            value = value.data
+        value = np.array(value, dtype=np.float64, ndmin=2)
+        if value.shape[-1] != self.nper:
+            raise ValueError('`' + name + '` must have ' + str(self.nper) + ' periods')
+        return np.array(np.broadcast_to(value, shape))
+
+    def _compute(self):
+        """Computes the schedules of all the loans. The balances are computed
+        with `affine_scan_floor` over blocks of loans."""
+        nloans, nper = len(self.amount), self.nper
+        prate = self.nrate / self.pyr / 100
+        nlife = self.life + self.grace
+
+        # periodic payment computed with the present value of the balloon
+        # payments at the end of the grace period
+        balloonpv = np.zeros(nloans)
+        if self.balloonpmt.any():
+            time = np.arange(nper)
+            exponent = (self.grace[:, np.newaxis] - time) * np.log1p(prate)[:, np.newaxis]
+            balloonpmt = np.where(time <= nlife[:, np.newaxis], self.balloonpmt, 0)
+            balloonpv = np.einsum('ij,ij->i', balloonpmt, np.exp(exponent))
+        self.pmt = _tvm_pmt(prate, nlife, -self.amount + balloonpv, 0, 0)
+
+        self.begppalbal = np.zeros((nloans, nper))
+        self.intpmt = np.zeros((nloans, nper))
+        self.ppalpmt = np.zeros((nloans, nper))
+        self.totpmt = np.zeros((nloans, nper))
+        self.endppalbal = np.zeros((nloans, nper))
+
+        block = max(1, _BLOCK_SIZE // nper)
+        for first in range(0, nloans, block):
+            self._compute_block(slice(first, first + block), prate)
+
+    def _compute_block(self, rows, prate):
+        """Computes the schedules of the loans `rows`."""
+        amount = self.amount[rows]
+        prate = prate[rows, np.newaxis]
+        time = np.arange(1, self.nper)
+        grace = time <= self.grace[rows, np.newaxis]
+        ended = time > (self.life + self.grace)[rows, np.newaxis]
+        outside = grace | ended
+
+        # endppalbal[t] = (1 + prate) * endppalbal[t - 1] - totpmt[t]. Negative
+        # principal payments are capitalized, and the loan is paid off when
+        # the payment exceeds the balance. In the grace periods, only the
+        # interest is paid.
+        payment = self.balloonpmt[rows, 1:] + self.prepmt[rows, 1:]
+        payment += self.pmt[rows, np.newaxis]
+        np.negative(payment, out=payment)
+        payment[outside] = 0
+        growth = np.where(grace, 1, 1 + prate) if grace.any() else 1 + prate
+        endbal, payment = affine_scan_floor(a=growth, b=payment, init=amount)
+        np.negative(payment, out=payment)
+
+        begbal = self.begppalbal[rows]
+        begbal[:, 0] = amount
+        begbal[:, 1:] = amount[:, np.newaxis]
+        begbal[:, 2:] = endbal[:, :-1]
+        interest = np.multiply(begbal[:, 1:], prate, out=self.intpmt[rows, 1:])
+        ppal = np.subtract(payment, interest, out=self.ppalpmt[rows, 1:])
+        np.maximum(ppal, 0, out=ppal)
+        if grace.any():
+            payment[grace] = interest[grace]
+            ppal[grace] = 0
+
+        self.endppalbal[rows, 0] = amount
+        self.endppalbal[rows, 1:] = endbal
+        self.totpmt[rows, 0] = amount * (self.dispoints[rows] + self.orgpoints[rows])
+        self.totpmt[rows, 1:] = payment
+        self.intpmt[rows, 0] = amount * self.dispoints[rows]
+        if ended.any():
+            for schedule in (self.begppalbal, self.intpmt, self.ppalpmt, self.totpmt,
+                             self.endppalbal):
+                schedule[rows, 1:][ended] = 0
+
+    def __len__(self):
+        return len(self.amount)
 
-    return result
+    def __repr__(self):
+        txt = ['Loan Book:']
+        txt.append('Loans = ' + str(len(self)))
+        txt.append('Periods = ' + str(self.nper))
+        txt.append('pyr = ' + self.pyr.__repr__())
+        return '\n'.join(txt) + '\n'
+
+    def __getitem__(self, index):
+        """Returns the loan `index` as a `Loan` object."""
+        nper = int(self.life[index] + self.grace[index]) + 1
+        nrate = nominal_rate(const_value=float(self.nrate[index]), start=self.start,
+                             nper=nper, pyr=self.pyr)
+        result = Loan()
+        result.life = int(self.life[index])
+        result.nrate = nrate
+        result.grace = int(self.grace[index])
+        result.amount = float(self.amount[index])
+        result.begppalbal = nrate._new(self.begppalbal[index, :nper].copy())
+        result.totpmt = nrate._new(self.totpmt[index, :nper].copy())
+        result.intpmt = nrate._new(self.intpmt[index, :nper].copy())
+        result.ppalpmt = nrate._new(self.ppalpmt[index, :nper].copy())
+        result.endppalbal = nrate._new(self.endppalbal[index, :nper].copy())
+        return result
+
+    def to_cashflow(self, tax_rate=0):
+        """Converts the loans to the equivalent cashflows (see
+        `Loan.to_cashflow`).
+
+        Args:
+            tax_rate (float, array, TimeSeriesPanel): tax rate, for all the
+                loans or for each loan.
+
+        Returns:
+            TimeSeriesPanel with a row per loan.
+
+        """
+        if isinstance(tax_rate, TimeSeriesPanel):
+            tax_rate = tax_rate.data
+        tax_rate = np.asarray(tax_rate, dtype=np.float64)
+        if tax_rate.ndim == 1:
+            tax_rate = tax_rate[:, np.newaxis]
+        result = TimeSeriesPanel(nrows=len(self), start=self.start, nper=self.nper, pyr=self.pyr)
+        result.data = -self.totpmt + self.intpmt * tax_rate / 100
+        result.data[:, 0] += self.amount
+        return result
+
+    def true_rate(self, tax_rate=0):
+        """Computes the true interest rate of each loan (see
+        `Loan.true_rate`)."""
+        return irr(self.to_cashflow(tax_rate))
 
 
 def buydown_loan(amount, nrate, grace=0, dispoints=0, orgpoints=0, prepmt=None):
@@ -367,53 +527,30 @@ def buydown_loan(amount, nrate, grace=0, dispoints=0, orgpoints=0, prepmt=None):
 
     life = len(nrate) - grace - 1
 
-    begppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    intpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    ppalpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    totpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    endppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-
-    if prepmt is None:
-        prepmt = cashflow(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    else:
-        verify_eq_time_range(nrate, prepmt)
-
-    ##
-    ## balance calculation
-    ##
-    for time in range(grace + life + 1):
-
-        if time == 0:
-            #
-            begppalbal[time] = amount
-            endppalbal[time] = amount
-            totpmt[time] = amount * (dispoints + orgpoints)
-            intpmt[time] = amount * dispoints
-            #
-        else:
-            #
-            # periodic payment per period
-            #
-            if time <= grace:
-
-                begppalbal[time] = endppalbal[time - 1]
-                intpmt[time] = begppalbal[time] * nrate[time] / nrate.pyr / 100
-                totpmt[time] = intpmt[time]
-                endppalbal[time] = begppalbal[time]
-
-            else:
-
-                pmt = -pvpmt(nrate=nrate[time], nper=grace+life-time+1,
-                             pval=endppalbal[time-1], pmt=None, pyr=nrate.pyr)
-
-                totpmt[time] = pmt + prepmt[time]
-
-                # balance
-                begppalbal[time] = endppalbal[time - 1]
-                intpmt[time] = begppalbal[time] * nrate[time] / nrate.pyr / 100
-                ppalpmt[time] = totpmt[time] - intpmt[time]
-                endppalbal[time] = begppalbal[time] - ppalpmt[time]
-
+    # the payment of the period `time` amortizes the balance in the remaining
+    # periods, so endppalbal[t] = (1 + prate - factor) * endppalbal[t - 1]
+    # - prepmt[t], where `factor` is the payment per unit of balance.
+    prate = nrate.data / nrate.pyr / 100
+    time = np.arange(len(nrate))
+    grace_period = time <= grace
+    factor = _tvm_pmt(prate, grace + life - time + 1, -1, 0, 0)
+
+    endbal = np.full(len(nrate), float(amount))
+    endbal[1:] = affine_scan(a=np.where(grace_period, 1, 1 + prate - factor)[1:],
+                             b=np.where(grace_period, 0, -prepmt.data)[1:],
+                             init=amount)
+    endppalbal = nrate._new(endbal)
+    begppalbal = endppalbal.lag(fill=amount)
+    begbal = begppalbal.data
+    interest = begbal * prate
+    payment = np.where(grace_period, interest, factor * begbal + prepmt.data)
+    ppal = np.where(grace_period, 0, payment - interest)
+    interest[0] = amount * dispoints
+    payment[0] = amount * (dispoints + orgpoints)
+
+    intpmt = nrate._new(interest)
+    ppalpmt = nrate._new(ppal)
+    totpmt = nrate._new(payment)
 
     ## resuls
     result = Loan()
@@ -452,43 +589,41 @@ def fixed_ppal_loan(amount, nrate, grace=0, dispoints=0, orgpoints=0,
         verify_eq_time_range(nrate, balloonpmt)
 
     # present value of the balloon payments
-    balloonpv = sum(balloonpmt)
+    balloonpv = balloonpmt.sum()
 
     life = len(nrate) - grace - 1
 
-    begppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    intpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    ppalpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    totpmt = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-    endppalbal = TimeSeries(start=nrate.start, end=nrate.end, pyr=nrate.pyr)
-
     pmt = (amount - balloonpv) / life # periodic ppal payment
 
-    # balance calculation
-    for time in range(grace + life + 1):
-
-        if time == 0:
-            begppalbal[time] = 0
-            endppalbal[time] = amount - prepmt[time]
-            totpmt[time] = amount * (dispoints + orgpoints)
-            intpmt[time] = amount * dispoints
-        else:
-            begppalbal[time] = endppalbal[time - 1]
-            intpmt[time] = begppalbal[time] * nrate[time] / nrate.pyr / float(100)
-            if time <= grace:
-                ppalpmt[time] = prepmt[time] + balloonpmt[time]
-            else:
-                ppalpmt[time] = pmt + prepmt[time] + balloonpmt[time]
-            totpmt[time] = intpmt[time] + ppalpmt[time]
-            endppalbal[time] = begppalbal[time] - ppalpmt[time]
-
-            if endppalbal[time] < 0:
-                totpmt[time] = begppalbal[time] + intpmt[time]
-                ppalpmt[time] = begppalbal[time]
-                endppalbal[time] = begppalbal[time] - ppalpmt[time]
-                prepmt[time] = 0
-                pmt = 0
-
+    # endppalbal[t] = endppalbal[t - 1] - ppalpmt[t]; the loan is paid off
+    # when the principal payment exceeds the balance
+    prate = nrate.data / nrate.pyr / 100
+    time = np.arange(len(nrate))
+    ppal = np.where(time <= grace, 0, pmt) + prepmt.data + balloonpmt.data
+
+    flows = -ppal
+    endbal = np.full(len(nrate), amount - prepmt[0])
+    endbal[1:], flows[1:] = affine_scan_floor(a=1, b=flows[1:], init=endbal[0])
+    # the periodic principal payment stops after the first period where the
+    # balance is floored at zero, so later prepayments are not amortized
+    payoff = np.flatnonzero(flows[1:] != -ppal[1:])
+    if payoff.size > 0 and payoff[0] + 2 < len(nrate):
+        first = payoff[0] + 2
+        ppal[first:] = prepmt.data[first:] + balloonpmt.data[first:]
+        endbal[first:], flows[first:] = affine_scan_floor(a=1, b=-ppal[first:],
+                                                          init=endbal[first - 1])
+    endppalbal = nrate._new(endbal)
+    begppalbal = endppalbal.lag(fill=0)
+    interest = begppalbal.data * prate
+    ppal = -flows
+    payment = interest + ppal
+    ppal[0] = 0
+    interest[0] = amount * dispoints
+    payment[0] = amount * (dispoints + orgpoints)
+
+    intpmt = nrate._new(interest)
+    ppalpmt = nrate._new(ppal)
+    totpmt = nrate._new(payment)
 
 
     ## resuls
@@ -0,0 +1,271 @@
+"""
+Linear recurrences
+===============================================================================
+
+Balances of savings accounts and loans, and compound factors, follow the
+affine recurrence
+
+    x[t] = a[t] * x[t-1] + b[t]
+
+where `x[-1]` is the initial value. The function `affine_scan` evaluates the
+recurrence for all the periods at once.
+
+>>> affine_scan(a=[1.1, 1.1, 1.1], b=[100, 100, 100], init=1000).round(2).tolist()
+[1200.0, 1420.0, 1662.0]
+
+The time is the last axis, so a 2-D array is a batch of recurrences with a
+row per recurrence:
+
+>>> affine_scan(a=[[1.1, 1.1, 1.1], [1.0, 1.0, 1.0]], b=100).tolist() # doctest: +ELLIPSIS
+[[100.0, 210.0..., 331.0...], [100.0, 200.0, 300.0]]
+
+When `a` or `b` are TimeSeries or TimeSeriesPanel objects, the result has the
+same type.
+
+>>> affine_scan(a=nominal_rate([10]*4) / 100 + 1, b=cashflow([100]*4)) # doctest: +NORMALIZE_WHITESPACE
+Time Series:
+Start = (0,)
+End = (3,)
+pyr = 1
+Data = (0,)          100.00
+       (1,)          210.00
+       (2,)          331.00
+       (3,)          464.10
+
+`affine_scan_floor` computes the recurrence with a floor at zero for the
+periods with negative `b[t]`, as in the withdrawals from a savings account:
+
+>>> balance, flows = affine_scan_floor(a=1, b=[100, -50, -80, 30])
+>>> balance.tolist()
+[100.0, 50.0, 0.0, 30.0]
+>>> flows.tolist()
+[100.0, -50.0, -50.0, 30.0]
+
+
+Description of the functions in this module
+===============================================================================
+
+"""
+
+import concurrent.futures
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate
+from cashflows.gtimeseries import verify_eq_time_range
+
+# batches with at least this number of rows are computed period by period,
+# in blocks of rows
+_SEQUENTIAL_ROWS = 256
+_ROW_BLOCK = 4096
+
+
+def _scan_inplace(acoef, bcoef):
+    """Composes in place the affine maps `(a[t], b[t])` along the last axis
+    by recursive doubling. At the end, `bcoef[..., t]` is the value of the
+    recurrence with initial value zero and `acoef[..., t]` is the product of
+    the coefficients up to `t`."""
+    nper = acoef.shape[-1]
+    shift = 1
+    while shift < nper:
+        bcoef[..., shift:] += acoef[..., shift:] * bcoef[..., :-shift]
+        acoef[..., shift:] *= acoef[..., :-shift]
+        shift *= 2
+
+
+def _scan(acoef, bcoef, init, workers=None):
+    """Returns the values of the recurrence. With `workers`, the time axis is
+    split in chunks that are scanned in parallel by a pool of threads (not
+    processes), and then linked with the value at the end of the previous
+    chunk."""
+    nper = acoef.shape[-1]
+    if workers is None or workers <= 1 or nper < 2 * workers:
+        if acoef.ndim == 2 and len(acoef) >= _SEQUENTIAL_ROWS:
+            return _scan_sequential(acoef, bcoef, init)[0]
+        acoef, bcoef = np.array(acoef), np.array(bcoef)
+        _scan_inplace(acoef, bcoef)
+        bcoef += acoef * init[..., np.newaxis]
+        return bcoef
+
+    acoef, bcoef = np.array(acoef), np.array(bcoef)
+    bounds = np.linspace(0, nper, workers + 1).astype(int)
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda chunk: _scan_inplace(acoef[..., chunk[0]:chunk[1]],
+                                                  bcoef[..., chunk[0]:chunk[1]]), chunks))
+        carries = []
+        carry = init
+        for _, end in chunks:
+            carries.append(carry)
+            carry = acoef[..., end - 1] * carry + bcoef[..., end - 1]
+
+        def link(item):
+            (begin, end), carry = item
+            bcoef[..., begin:end] += acoef[..., begin:end] * carry[..., np.newaxis]
+
+        list(pool.map(link, zip(chunks, carries)))
+    return bcoef
+
+
+def _scan_sequential(acoef, bcoef, init, start=None):
+    """Returns the values of the recurrence computed period by period, with a
+    floor at zero from the period `start` (no floor when `start` is None),
+    and the mask of the periods where the floor is reached. The rows are
+    processed in blocks, so the columns of a block stay in the cache between
+    periods."""
+    values = np.empty(acoef.shape)
+    clamped = None if start is None else np.zeros(acoef.shape, dtype=bool)
+    for first in range(0, len(acoef), _ROW_BLOCK):
+        rows = slice(first, first + _ROW_BLOCK)
+        xacoef, xbcoef, xvalues = acoef[rows], bcoef[rows], values[rows]
+        if start is not None:
+            negative = xbcoef < 0
+            negative[:, :start] = False
+        previous = init[rows]
+        for time in range(values.shape[1]):
+            current = np.multiply(xacoef[:, time], previous, out=xvalues[:, time])
+            current += xbcoef[:, time]
+            if start is not None:
+                np.maximum(current, 0, out=current, where=negative[:, time])
+            previous = current
+        if start is not None:
+            np.logical_and(negative, xvalues == 0, out=clamped[rows])
+    return values, clamped
+
+
+def _scan_floor(acoef, bcoef, init, start, workers):
+    """Returns the values of the recurrence with a floor at zero and the mask
+    of the periods where the floor is reached. The recurrence is scanned for
+    all the periods without the floor; the rows where a value falls below
+    zero (or is not finite) at a period with a negative `b[t]` are computed
+    again period by period from the first of these periods, so the cost is
+    linear in the number of periods and of floored periods."""
+    #pylint: disable=too-many-arguments
+    # the values that overflow are computed again period by period
+    with np.errstate(over='ignore', invalid='ignore'):
+        values = _scan(acoef, bcoef, init, workers)
+    clamped = np.zeros(acoef.shape, dtype=bool)
+    floor = (bcoef[:, start:] < 0) & ~(values[:, start:] >= 0)
+    rows = np.flatnonzero(floor.any(axis=1))
+    if rows.size == 0:
+        return values, clamped
+    first = int(floor[rows].argmax(axis=1).min()) + start
+    xinit = init[rows] if first == 0 else values[rows, first - 1]
+    xvalues, xclamped = _scan_sequential(acoef[rows, first:], bcoef[rows, first:], xinit, start=0)
+    values[rows, first:] = xvalues
+    clamped[rows, first:] = xclamped
+    return values, clamped
+
+
+def _coefficients(a, b, init):
+    """Returns `a`, `b` and `init` as read-only float arrays with the same
+    shape (the time is the last axis), and the TimeSeries or TimeSeriesPanel used as
+    template for the result (or None)."""
+    template = None
+    for param in (b, a):
+        if isinstance(param, TimeSeriesPanel):
+            template = param
+        elif isinstance(param, TimeSeries) and not isinstance(template, TimeSeriesPanel):
+            template = param
+    if isinstance(a, (TimeSeries, TimeSeriesPanel)):
+        if isinstance(b, (TimeSeries, TimeSeriesPanel)):
+            verify_eq_time_range(a, b)
+        a = a.data
+    if isinstance(b, (TimeSeries, TimeSeriesPanel)):
+        b = b.data
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    if a.ndim == 0:
+        raise ValueError('`a` or `b` must have a time axis')
+    init = np.broadcast_to(np.asarray(init, dtype=np.float64), a.shape[:-1])
+    return a, b, init, template
+
+
+def _wrap(template, values):
+    """Returns `values` with the type of `template`."""
+    if template is None:
+        return values
+    return template._new(values)
+
+
+def affine_scan(a, b, init=0, workers=None):
+    """Computes the recurrence `x[t] = a[t] * x[t-1] + b[t]`.
+
+    Args:
+        a (float, array, TimeSeries, TimeSeriesPanel): coefficients.
+        b (float, array, TimeSeries, TimeSeriesPanel): independent terms.
+        init (float, array): initial value `x[-1]` (a value per row for
+            2-D batches).
+        workers (int): number of threads used for splitting the time axis of
+            long recurrences. By default, the computation is done in the
+            calling thread.
+
+    Returns:
+        The values `x[t]` (array, TimeSeries or TimeSeriesPanel).
+
+    A single recurrence (or a small batch) is computed by recursive doubling,
+    in `log2(nper)` vectorized steps; large batches are computed period by
+    period for all the rows at once.
+
+    >>> affine_scan(a=1.05, b=[0, 0, 0, 0], init=100).round(4).tolist()
+    [105.0, 110.25, 115.7625, 121.5506]
+
+    >>> round(float(affine_scan(a=1.01, b=np.ones(1000), workers=4)[-1]), 4)
+    2095815.5638
+
+    """
+    acoef, bcoef, init, template = _coefficients(a, b, init)
+    return _wrap(template, _scan(acoef, bcoef, init, workers))
+
+
+def affine_scan_floor(a, b, init=0, start=0, workers=None):
+    """Computes the recurrence `x[t] = a[t] * x[t-1] + b[t]` with a floor at
+    zero: when `b[t]` is negative and `x[t]` would be negative, `b[t]` is
+    reduced to `-a[t] * x[t-1]` and `x[t]` is zero.
+
+    Args:
+        a (float, array, TimeSeries, TimeSeriesPanel): coefficients.
+        b (float, array, TimeSeries, TimeSeriesPanel): independent terms.
+        init (float, array): initial value `x[-1]`.
+        start (int): the floor is applied from the period `start`.
+        workers (int): number of threads (see `affine_scan`).
+
+    Returns:
+        A tuple `(x, b)` with the values of the recurrence and the independent
+        terms after applying the floor.
+
+    Large batches are computed period by period; otherwise, the recurrence
+    is scanned without the floor, and only the rows where the floor is
+    reached are computed period by period from the first floored period.
+
+    >>> balance, flows = affine_scan_floor(a=[[1, 1, 1], [1, 1, 1]], b=[[10, -20, 5], [10, -5, -5]])
+    >>> balance.tolist()
+    [[10.0, 0.0, 5.0], [10.0, 5.0, 0.0]]
+    >>> flows.tolist()
+    [[10.0, -10.0, 5.0], [10.0, -5.0, -5.0]]
+
+    """
+    #pylint: disable=too-many-arguments
+    acoef, bcoef, init, template = _coefficients(a, b, init)
+    shape = acoef.shape
+    acoef = acoef.reshape(-1, shape[-1])
+    bcoef = bcoef.reshape(-1, shape[-1])
+    init = init.reshape(-1)
+
+    if (workers is None or workers <= 1) and len(acoef) >= _SEQUENTIAL_ROWS:
+        values, clamped = _scan_sequential(acoef, bcoef, init, start)
+    else:
+        values, clamped = _scan_floor(acoef, bcoef, init, start, workers)
+
+    # independent terms that take the value to zero
+    rows, periods = np.nonzero(clamped)
+    if rows.size > 0:
+        bcoef = np.array(bcoef)
+        previous = np.where(periods > 0, values[rows, periods - 1], init[rows])
+        bcoef[rows, periods] = -acoef[rows, periods] * previous
+
+    values = values.reshape(shape)
+    bcoef = bcoef.reshape(shape)
+    return _wrap(template, values), _wrap(template, bcoef)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
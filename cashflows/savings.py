@@ -49,7 +49,8 @@ Description of the functions and objects in this module
 
 # sys.path.insert(0, os.path.abspath('..'))
 
-from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.recurrence import affine_scan_floor
 
 
 
@@ -59,38 +60,37 @@ def savings(deposits, rate, initbal=0, noprint=True):
     withdrawls and variable interset rate.
 
     Args:
-        deposits (TimeSeries): deposits to the account.
-        rate (TimeSeries): interest rate paid by the account.
-        initbal (float): initial balance of the account.
+        deposits (TimeSeries, TimeSeriesPanel): deposits to the account.
+        rate (TimeSeries, TimeSeriesPanel): interest rate paid by the account.
+        initbal (float, list): initial balance of the account.
         noprint (bool): prints summary report?
 
     Return:
         interest, end_balance (TimeSeries, TimeSeries)
 
+    With a TimeSeriesPanel, the balances of many accounts are computed at
+    once (a row per account, and `initbal` may be a list with a value per
+    account).
+
+    >>> deposits = TimeSeriesPanel([cashflow([100, 100, -500, 100]), cashflow([100, 0, 0, 0])])
+    >>> interest, endbal = savings(deposits=deposits, rate=nominal_rate([10]*4), initbal=[0, 100])
+    >>> endbal.tolist() # doctest: +ELLIPSIS
+    [[100.0, 210.0..., 0.0, 100.0], [210.0..., 231.0..., 254.1..., 279.5...]]
+
     """
     verify_eq_time_range(deposits, rate)
 
-    begbal = deposits.copy()
-    interest = deposits.copy()
-    endbal = deposits.copy()
-
-    for time, _ in enumerate(deposits):
-        if time == 0:
-            begbal[0] = initbal
-            interest[0] = begbal[0] * rate[0] / 100 / rate.pyr
-            endbal[0] = begbal[0] + deposits[0] + interest[0]
-        else:
-            begbal[time] = endbal[time - 1]
-            interest[time] = begbal[time] * rate[time] / 100 / rate.pyr
-            if deposits[time] < 0 and -deposits[time] > begbal[time] + interest[time]:
-                deposits[time] = -(begbal[time] + interest[time])
-            endbal[time] = begbal[time] + deposits[time] + interest[time]
+    # endbal[t] = (1 + rate[t]) * endbal[t - 1] + deposits[t]; from the second
+    # period, withdrawals are limited to the available balance
+    prate = rate.data / 100 / rate.pyr
+    endbal, deposits = affine_scan_floor(a=rate._new(1 + prate), b=deposits, init=initbal, start=1)
+    begbal = endbal.lag(fill=initbal)
+    interest = endbal._new(begbal.data * prate)
 
     if noprint is True:
         return (interest, endbal)
 
 
-
     len_timeid = len(deposits.end.__repr__())
     len_number = max(len('{:1.2f}'.format(endbal[-1])), len('{:1.2f}'.format(begbal[0])), 9)
 
@@ -0,0 +1,315 @@
+"""
+Piecewise constant time series
+===============================================================================
+
+Interest rates and many cashflows are constant during long intervals of
+time. A `SegmentSeries` stores only the periods where the value changes and
+the value of each segment, and materializes the values of all the periods
+only when they are requested.
+
+>>> rate = segment_rate(const_value=6, start=(2000, 0), nper=360, pyr=12, spec=[(120, 8), (240, 7)])
+>>> rate.nsegments, len(rate)
+(3, 360)
+>>> rate.starts.tolist(), rate.values.tolist()
+([0, 120, 240], [6.0, 8.0, 7.0])
+>>> rate[(2021, 3)]
+7.0
+
+The arithmetic operators work over the segments:
+
+>>> (rate + 1).values.tolist()
+[7.0, 9.0, 8.0]
+
+`timevalue` computes the net value of a piecewise constant cashflow with a
+piecewise constant rate with a closed-form geometric sum for each segment:
+
+>>> from cashflows.gcashana import timevalue
+>>> payments = compact(cashflow([0] + [-100] * 359, start=(2000, 0), pyr=12))
+>>> payments.nsegments
+2
+>>> round(timevalue(payments, rate), 4)
+-15648.5324
+>>> round(timevalue(payments.dense(), rate.dense()), 4)
+-15648.5324
+
+
+Description of the functions and objects in this module
+===============================================================================
+
+"""
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeAxis, cashflow, nominal_rate
+from cashflows.gtimeseries import verify_eq_time_range, _new_series, _spec_arrays
+from cashflows.gtimeseries import _axis_index, _add_periods
+
+_OPERATIONS = {'add': np.add, 'sub': np.subtract, 'mul': np.multiply,
+               'truediv': np.true_divide}
+
+
+class SegmentSeries():
+    """Time series with a constant value in each segment of periods.
+
+    Args:
+        axis (TimeAxis): time range of the series.
+        starts (list, array): index of the first period of each segment, in
+            increasing order. The first segment starts at zero.
+        values (list, array): value of each segment.
+
+    The series is not modified in place; the operators return new series.
+    Use `dense` to obtain a TimeSeries with the values of all the periods.
+
+    >>> x = SegmentSeries(TimeAxis((0,), (5,), 1), starts=[0, 2, 4], values=[1, 1, 3])
+    >>> x.starts.tolist(), x.values.tolist(), x.tolist()
+    ([0, 4], [1.0, 3.0], [1.0, 1.0, 1.0, 1.0, 3.0, 3.0])
+
+    """
+
+    def __init__(self, axis, starts, values):
+        starts = np.asarray(starts, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        if starts.ndim != 1 or starts.shape != values.shape or starts.size == 0:
+            raise ValueError('`starts` and `values` must be vectors with the same length')
+        if starts[0] != 0 or (np.diff(starts) <= 0).any() or starts[-1] >= axis.nper:
+            raise ValueError('`starts` must be increasing periods from zero')
+        # adjacent segments with the same value are merged
+        keep = np.ones(starts.size, dtype=bool)
+        keep[1:] = values[1:] != values[:-1]
+        self.axis = axis
+        self.starts = starts[keep]
+        self.values = values[keep]
+        self._data = None
+
+    @property
+    def start(self):
+        """Timeid of the first period."""
+        return self.axis.start
+
+    @property
+    def end(self):
+        """Timeid of the last period."""
+        return self.axis.end
+
+    @property
+    def pyr(self):
+        """Number of periods per year."""
+        return self.axis.pyr
+
+    @property
+    def nsegments(self):
+        """Number of segments."""
+        return self.starts.size
+
+    @property
+    def lengths(self):
+        """Number of periods of each segment."""
+        return np.diff(np.append(self.starts, self.axis.nper))
+
+    @property
+    def data(self):
+        """Values of all the periods (read-only array)."""
+        if self._data is None:
+            data = np.repeat(self.values, self.lengths)
+            data.setflags(write=False)
+            self._data = data
+        return self._data
+
+    def dense(self):
+        """Returns the values as a TimeSeries."""
+        return _new_series(self.axis, self.data.copy())
+
+    def tolist(self):
+        """Returns the values as a list"""
+        return self.data.tolist()
+
+    def __len__(self):
+        return self.axis.nper
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __repr__(self):
+        return self.dense().__repr__()
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.data, dtype=dtype, copy=True)
+        return np.asarray(self.data, dtype=dtype)
+
+    def _segment(self, index):
+        """Returns the segment of the periods `index`."""
+        return np.searchsorted(self.starts, index, side='right') - 1
+
+    def __getitem__(self, key):
+        """Returns the value at an index or a timeid, or the periods of a
+        slice as a SegmentSeries.
+
+        >>> x = segment_rate(const_value=5, nper=10, spec=(4, 6))
+        >>> x[3], x[-1], x[2:6].tolist()
+        (5.0, 6.0, [5.0, 5.0, 6.0, 6.0])
+
+        """
+        key = _axis_index(self.axis, key)
+        if isinstance(key, slice):
+            first, last = key.start, key.stop
+            if last <= first:
+                raise ValueError('Empty slice of time series')
+            segments = slice(self._segment(first), self._segment(last - 1) + 1)
+            starts = np.maximum(self.starts[segments] - first, 0)
+            axis = TimeAxis(_add_periods(self.start, first, self.pyr),
+                            _add_periods(self.start, last - 1, self.pyr), self.pyr)
+            return SegmentSeries(axis, starts, self.values[segments])
+        if key < 0:
+            key += self.axis.nper
+        if not 0 <= key < self.axis.nper:
+            raise IndexError('Index out of the range of the time series')
+        return self.values[self._segment(key)].item()
+
+    def _merged(self, other):
+        """Returns the starts of the segments of `self` and `other`, and the
+        values of both series in each segment."""
+        starts = np.union1d(self.starts, other.starts)
+        return (starts, self.values[self._segment(starts)],
+                other.values[other._segment(starts)])
+
+    def _operation(self, operation, other, reverse=False):
+        """Applies `operation` to the series and `other`."""
+        func = _OPERATIONS[operation]
+        if isinstance(other, SegmentSeries):
+            verify_eq_time_range(self, other)
+            starts, values, other = self._merged(other)
+        elif isinstance(other, TimeSeries):
+            verify_eq_time_range(self, other)
+            args = (other.data, self.data) if reverse else (self.data, other.data)
+            return _new_series(self.axis, func(*args))
+        elif isinstance(other, (int, float, np.number)):
+            starts, values = self.starts, self.values
+        else:
+            return NotImplemented
+        args = (other, values) if reverse else (values, other)
+        return SegmentSeries(self.axis, starts, func(*args))
+
+    def __add__(self, other):
+        return self._operation('add', other)
+
+    def __sub__(self, other):
+        return self._operation('sub', other)
+
+    def __mul__(self, other):
+        return self._operation('mul', other)
+
+    def __truediv__(self, other):
+        return self._operation('truediv', other)
+
+    def __radd__(self, other):
+        return self._operation('add', other, reverse=True)
+
+    def __rsub__(self, other):
+        return self._operation('sub', other, reverse=True)
+
+    def __rmul__(self, other):
+        return self._operation('mul', other, reverse=True)
+
+    def __rtruediv__(self, other):
+        return self._operation('truediv', other, reverse=True)
+
+    def __neg__(self):
+        return SegmentSeries(self.axis, self.starts, -self.values)
+
+    def __abs__(self):
+        return SegmentSeries(self.axis, self.starts, np.abs(self.values))
+
+    def _log_growth(self):
+        """Returns, for the series as a nominal rate, the logarithm of the
+        growth `1 + r / pyr` of a period of each segment and the logarithm
+        of the compound factor before the start of each segment."""
+        log_growth = np.log1p(self.values / self.pyr / 100)
+        before = np.zeros(self.nsegments)
+        np.cumsum((log_growth * self.lengths)[:-1], out=before[1:])
+        return log_growth, before
+
+    def growth(self, index=None):
+        """Returns the cumulative product of `1 + r / pyr` of the series as a
+        nominal rate, for all the periods or for the periods `index`. The
+        product is computed in closed form for each segment.
+
+        >>> segment_rate(const_value=10, nper=3).growth().round(4).tolist()
+        [1.1, 1.21, 1.331]
+
+        """
+        log_growth, before = self._log_growth()
+        if index is None:
+            index = np.arange(self.axis.nper)
+        segment = self._segment(index)
+        return np.exp(before[segment] + (index - self.starts[segment] + 1) * log_growth[segment])
+
+
+def compact(series):
+    """Returns the TimeSeries `series` as a SegmentSeries.
+
+    >>> compact(cashflow([0, 0, 5, 5, 5, 2])).starts.tolist()
+    [0, 2, 5]
+
+    """
+    if isinstance(series, SegmentSeries):
+        return series
+    if not isinstance(series, TimeSeries):
+        raise TypeError('`series` must be a TimeSeries')
+    data = series.data
+    starts = np.flatnonzero(np.diff(data)) + 1
+    starts = np.insert(starts, 0, 0)
+    return SegmentSeries(series.axis, starts, data[starts])
+
+
+def segment_rate(const_value=0, start=None, end=None, nper=None, pyr=1, spec=None):
+    """Returns an interest rate as a SegmentSeries. The arguments are the
+    same of `nominal_rate`, with a constant `const_value`; the values of
+    `spec` are kept until the next specified period.
+
+    >>> segment_rate(const_value=1, start=(2000, 0), nper=8, pyr=4, spec=[(3, 10), (6, 20)]).tolist()
+    [1.0, 1.0, 1.0, 10.0, 10.0, 10.0, 20.0, 20.0]
+
+    """
+    #pylint: disable=too-many-arguments
+    axis = TimeSeries(start=start, end=end, nper=nper, pyr=pyr).axis
+    starts, values = np.zeros(1, dtype=np.intp), np.array([float(const_value)])
+    if spec:
+        times, spec_values = _spec_arrays(spec, axis)
+        times = np.where(times < 0, times + axis.nper, times)
+        order = np.argsort(times, kind='stable')
+        times, spec_values = times[order], spec_values[order]
+        # the last value specified for a period is kept
+        last = np.append(times[1:] != times[:-1], True)
+        times, spec_values = times[last], spec_values[last]
+        if times[0] == 0:
+            starts, values = times, spec_values
+        else:
+            starts = np.append(starts, times)
+            values = np.append(values, spec_values)
+    return SegmentSeries(axis, starts, values)
+
+
+def _segment_timevalue(cflo, marr, base_date=0):
+    """Returns the net value at `base_date` of the piecewise constant
+    cashflow `cflo` with the piecewise constant rate `marr`. The discounted
+    values of each segment are added with the sum of a geometric series."""
+    verify_eq_time_range(cflo, marr)
+    if isinstance(base_date, tuple):
+        base_date = marr.axis.index(base_date)
+    starts, values, rates = cflo._merged(marr)
+    lengths = np.diff(np.append(starts, marr.axis.nper))
+    # compound factor before the start of each segment
+    log_growth = np.log1p(rates / marr.pyr / 100)
+    before = np.zeros(starts.size)
+    np.cumsum((log_growth * lengths)[:-1], out=before[1:])
+    # sum of (1 + r)^-k for k = 1 ... length
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(log_growth == 0, lengths,
+                           -np.expm1(-lengths * log_growth) / np.expm1(log_growth))
+    reference = marr.growth(np.array([base_date]))[0]
+    return float(reference * np.sum(values * annuity * np.exp(-before)))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,378 @@
+"""
+Monte Carlo simulation
+===============================================================================
+
+The items of a cashflow, the minimum attractive rate of return, the inflation
+and the tax rate can be specified as random variables. Each draw of the
+simulation is a row of a TimeSeriesPanel, and the net present value, the
+internal rate of return and the benefit-cost ratio of all the draws are
+computed at once.
+
+A `StochasticSeries` is a time series `base` multiplied by a random `scale`
+and/or displaced by a random `shift`:
+
+>>> investment = cashflow([0]*6, spec=(0, -1000))
+>>> revenues = StochasticSeries(cashflow([0] + [300]*5), scale=Normal(mean=1, std=0.2))
+>>> marr = nominal_rate([12]*6)
+
+>>> panel = simulate_cashflows(cflo=[investment, revenues], ndraws=1000, seed=123)
+>>> panel # doctest: +NORMALIZE_WHITESPACE
+Time Series Panel:
+Start = (0,)
+End = (5,)
+pyr = 1
+Rows = 1000
+
+>>> result = simulate(cflo=[investment, revenues], marr=marr, ndraws=1000, seed=123)
+>>> sorted(result.keys())
+['bcr', 'irr', 'npv']
+>>> result['npv'].shape
+(1000,)
+>>> bool(abs(result['npv'].mean() - timevalue(investment + revenues.base, marr)) < 20)
+True
+
+The draws are reproducible for a given `seed`, and they do not depend on
+the number of worker processes:
+
+>>> other = simulate(cflo=[investment, revenues], marr=marr, ndraws=1000, seed=123, workers=2)
+>>> bool((other['npv'] == result['npv']).all())
+True
+
+
+Description of the functions and objects in this module
+===============================================================================
+
+"""
+
+import concurrent.futures
+
+import numpy as np
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate, verify_eq_time_range
+from cashflows.gcashana import timevalue, _irr_rows
+from cashflows.summary import Summary
+
+
+# number of draws computed at once by each task
+_CHUNK_SIZE = 2 ** 16
+
+
+class Normal():
+    """Normal distribution.
+
+    Args:
+        mean (float, array): mean (an array specifies a value per period).
+        std (float, array): standard deviation.
+        per_period (bool): when True, each period is drawn independently;
+            otherwise, a single standardized value is drawn for all the
+            periods of a draw, and the parameters of each period are applied
+            to it.
+
+    >>> values = Normal(mean=[1, 1.1, 1.2], std=0.1).sample(np.random.default_rng(0), 2, 3)
+    >>> values.shape
+    (2, 3)
+    >>> bool(np.allclose(values - values[:, [0]], [0, 0.1, 0.2]))
+    True
+
+    """
+
+    def __init__(self, mean=0, std=1, per_period=False):
+        self.mean = mean
+        self.std = std
+        self.per_period = per_period
+
+    def sample(self, rng, nrows, nper):
+        """Returns an array of random values with `nrows` rows and `nper`
+        columns (or a single column when `per_period` is False)."""
+        if self.per_period:
+            return rng.normal(self.mean, self.std, size=(nrows, nper))
+        zvalue = rng.standard_normal(size=(nrows, 1))
+        return np.asarray(self.mean) + np.asarray(self.std) * zvalue
+
+
+class Uniform():
+    """Uniform distribution in the interval `[low, high)`.
+
+    Args:
+        low (float, array): lower end of the interval.
+        high (float, array): upper end of the interval.
+        per_period (bool): see `Normal`.
+
+    """
+
+    def __init__(self, low=0, high=1, per_period=False):
+        self.low = low
+        self.high = high
+        self.per_period = per_period
+
+    def sample(self, rng, nrows, nper):
+        """Returns an array of random values (see `Normal.sample`)."""
+        if self.per_period:
+            return rng.uniform(self.low, self.high, size=(nrows, nper))
+        low, high = np.asarray(self.low), np.asarray(self.high)
+        return low + (high - low) * rng.random(size=(nrows, 1))
+
+
+class Triangular():
+    """Triangular distribution.
+
+    Args:
+        left (float, array): lower limit.
+        mode (float, array): value with the highest probability.
+        right (float, array): upper limit.
+        per_period (bool): see `Normal`.
+
+    """
+
+    def __init__(self, left, mode, right, per_period=False):
+        self.left = left
+        self.mode = mode
+        self.right = right
+        self.per_period = per_period
+
+    def sample(self, rng, nrows, nper):
+        """Returns an array of random values (see `Normal.sample`)."""
+        if self.per_period:
+            return rng.triangular(self.left, self.mode, self.right, size=(nrows, nper))
+        # inverse of the distribution function at a uniform value per row
+        left, mode, right = (np.asarray(x, dtype=np.float64)
+                             for x in (self.left, self.mode, self.right))
+        uvalue = rng.random(size=(nrows, 1))
+        ratio = (mode - left) / (right - left)
+        return np.where(uvalue <= ratio,
+                        left + np.sqrt(uvalue * (right - left) * (mode - left)),
+                        right - np.sqrt((1 - uvalue) * (right - left) * (right - mode)))
+
+
+class StochasticSeries():
+    """Time series with random values computed as `base * scale + shift`.
+
+    Args:
+        base (TimeSeries): values of the series.
+        scale (distribution): random factor applied to `base`. By default,
+            one.
+        shift (distribution): random value added to the scaled `base`. By
+            default, zero.
+
+    >>> rate = StochasticSeries(nominal_rate([10]*3), shift=Uniform(-1, 1))
+    >>> values = rate.sample(np.random.default_rng(0), nrows=4)
+    >>> values.shape
+    (4, 3)
+    >>> bool(((values >= 9) & (values < 11)).all())
+    True
+
+    """
+
+    def __init__(self, base, scale=None, shift=None):
+        if not isinstance(base, TimeSeries):
+            raise TypeError("`base` must be a TimeSeries")
+        self.base = base
+        self.scale = scale
+        self.shift = shift
+
+    def sample(self, rng, nrows):
+        """Returns an array with `nrows` random draws of the series."""
+        nper = len(self.base)
+        values = np.broadcast_to(self.base.data, (nrows, nper))
+        if self.scale is not None:
+            values = values * self.scale.sample(rng, nrows, nper)
+        if self.shift is not None:
+            values = values + self.shift.sample(rng, nrows, nper)
+        return np.array(values)
+
+
+def _as_stochastic(name, value):
+    """Returns `value` (TimeSeries or StochasticSeries) as a StochasticSeries."""
+    if isinstance(value, StochasticSeries):
+        return value
+    if isinstance(value, TimeSeries):
+        return StochasticSeries(value)
+    raise TypeError("`" + name + "` must be a TimeSeries or a StochasticSeries")
+
+
+def _specs(cflo, marr=None, inflation=None, tax_rate=None):
+    """Returns the inputs of the simulation as StochasticSeries (a list for
+    `cflo`) with the same time range."""
+    if not isinstance(cflo, list):
+        cflo = [cflo]
+    if len(cflo) == 0:
+        raise ValueError('`cflo` must contain at least an item')
+    cflo = [_as_stochastic('cflo', item) for item in cflo]
+    others = []
+    for name, value in (('marr', marr), ('inflation', inflation), ('tax_rate', tax_rate)):
+        others.append(None if value is None else _as_stochastic(name, value))
+    for spec in cflo[1:] + [x for x in others if x is not None]:
+        verify_eq_time_range(cflo[0].base, spec.base)
+    return [cflo] + others
+
+
+def _draw_cashflows(rng, nrows, cflo, inflation, tax_rate):
+    """Returns `nrows` draws of the net cashflow: the sum of the items of
+    `cflo` converted to current money with `inflation`, after taxes."""
+    values = cflo[0].sample(rng, nrows)
+    for item in cflo[1:]:
+        values += item.sample(rng, nrows)
+    pyr = cflo[0].base.pyr
+    if inflation is not None:
+        rates = inflation.sample(rng, nrows)
+        growth = np.cumprod(1 + rates / pyr / 100, axis=1)
+        values *= growth / growth[:, :1]
+    if tax_rate is not None:
+        rates = tax_rate.sample(rng, nrows)
+        values -= np.where(values > 0, values * rates / 100, 0.0)
+    return values
+
+
+def _draw_chunk(task):
+    """Returns the draws of the net cashflow of a chunk."""
+    seed, nrows, cflo, inflation, tax_rate = task
+    rng = np.random.default_rng(seed)
+    return _draw_cashflows(rng, nrows, cflo, inflation, tax_rate)
+
+
+def _simulate_chunk(task):
+    """Returns the net present value, the internal rate of return and the
+    benefit-cost ratio of the draws of a chunk."""
+    seed, nrows, cflo, marr, inflation, tax_rate, summary = task
+    rng = np.random.default_rng(seed)
+    values = _draw_cashflows(rng, nrows, cflo, inflation, tax_rate)
+    pyr = cflo[0].base.pyr
+    # discount factors to the first period
+    growth = np.cumprod(1 + marr.sample(rng, nrows) / pyr / 100, axis=1)
+    factor = growth[:, :1] / growth
+    npv = np.einsum('ij,ij->i', values, factor)
+    benefits = np.einsum('ij,ij->i', np.maximum(values, 0), factor)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bcr = benefits / (benefits - npv)
+    prate = _irr_rows(values)[0]
+    result = {'npv': npv, 'irr': 100 * pyr * prate, 'bcr': bcr}
+    if summary is True:
+        for key, value in result.items():
+            result[key] = Summary()
+            result[key].update(value)
+    return result
+
+
+def _tasks(ndraws, seed, chunk_size):
+    """Returns the seed and the number of draws of each chunk. The seeds are
+    spawned from `seed`, one for each chunk."""
+    if ndraws < 1:
+        raise ValueError('`ndraws` must be a positive integer')
+    if chunk_size is None:
+        chunk_size = _CHUNK_SIZE
+    sizes = [min(chunk_size, ndraws - first) for first in range(0, ndraws, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+
+def _run(func, tasks, workers):
+    """Returns the results of `func` for each task, computed in a pool of
+    `workers` processes (or in the calling process)."""
+    if workers is None or workers <= 1 or len(tasks) == 1:
+        return [func(task) for task in tasks]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, tasks))
+
+
+def simulate_cashflows(cflo, inflation=None, tax_rate=None, ndraws=1000, seed=None,
+                       workers=None, chunk_size=None):
+    """Draws the net cashflow of an investment.
+
+    Args:
+        cflo (TimeSeries, StochasticSeries, list): items of the cashflow in
+            constant money. The items are added.
+        inflation (TimeSeries, StochasticSeries): inflation rate. The items
+            are converted to current money of the first period.
+        tax_rate (TimeSeries, StochasticSeries): income tax rate, applied to
+            the positive values of the cashflow.
+        ndraws (int): number of draws.
+        seed (int): seed of the random number generators.
+        workers (int): number of worker processes. By default, the draws are
+            computed in the calling process.
+        chunk_size (int): number of draws computed by each task.
+
+    Returns:
+        A TimeSeriesPanel with a row per draw.
+
+    The draws are computed in chunks. Each chunk has its own random number
+    generator, seeded with a child of `numpy.random.SeedSequence(seed)`, so
+    the draws only depend on `seed` and `chunk_size`.
+
+    >>> cflo = StochasticSeries(cashflow([100]*3), shift=Normal(0, 10, per_period=True))
+    >>> panel = simulate_cashflows(cflo, tax_rate=nominal_rate([30]*3), ndraws=5, seed=1)
+    >>> panel.data.shape
+    (5, 3)
+
+    """
+    #pylint: disable=too-many-arguments
+    cflo, _, inflation, tax_rate = _specs(cflo, None, inflation, tax_rate)
+    tasks = [task + (cflo, inflation, tax_rate) for task in _tasks(ndraws, seed, chunk_size)]
+    values = np.concatenate(_run(_draw_chunk, tasks, workers))
+    panel = TimeSeriesPanel(nrows=0, start=cflo[0].base.start, end=cflo[0].base.end,
+                            pyr=cflo[0].base.pyr)
+    return panel._new(values)
+
+
+def simulate(cflo, marr, inflation=None, tax_rate=None, ndraws=1000, seed=None,
+             workers=None, chunk_size=None, summary=False):
+    """Computes the distribution of the net present value, the internal rate
+    of return and the benefit-cost ratio of an investment.
+
+    Args:
+        cflo (TimeSeries, StochasticSeries, list): items of the cashflow in
+            constant money (see `simulate_cashflows`).
+        marr (TimeSeries, StochasticSeries): minimum attractive rate of return.
+        inflation (TimeSeries, StochasticSeries): inflation rate.
+        tax_rate (TimeSeries, StochasticSeries): income tax rate.
+        ndraws (int): number of draws.
+        seed (int): seed of the random number generators.
+        workers (int): number of worker processes. By default, the draws are
+            computed in the calling process.
+        chunk_size (int): number of draws computed by each task.
+        summary (bool): when True, a `Summary` of each measure is returned
+            instead of the values of the draws.
+
+    Returns:
+        A dictionary with the arrays `npv` (net present value at the first
+        period), `irr` (internal rate of return, `nan` when it does not exist)
+        and `bcr` (benefit-cost ratio) with a value per draw, or with their
+        summaries.
+
+    The cashflows of each chunk are drawn as in `simulate_cashflows` and
+    evaluated without keeping the draws. With `summary=True`, each chunk is
+    summarized by the process that computes it and the summaries are merged,
+    so the memory used depends on `chunk_size` and not on `ndraws`.
+
+    >>> cflo = cashflow([100]*5, spec=(0, -200))
+    >>> result = simulate(cflo, marr=nominal_rate([12]*5), ndraws=3)
+    >>> result['npv'].round(2).tolist()
+    [103.73, 103.73, 103.73]
+    >>> result['irr'].round(2).tolist()
+    [34.9, 34.9, 34.9]
+    >>> result['bcr'].round(3).tolist()
+    [1.519, 1.519, 1.519]
+
+    >>> result = simulate(cflo, marr=nominal_rate([12]*5), ndraws=3, summary=True)
+    >>> result['npv'] # doctest: +ELLIPSIS
+    Summary:
+    Count = 3
+    Mean = 103.7349
+    Std = 0.0000
+    ...
+
+    """
+    #pylint: disable=too-many-arguments
+    cflo, marr, inflation, tax_rate = _specs(cflo, marr, inflation, tax_rate)
+    tasks = [task + (cflo, marr, inflation, tax_rate, summary)
+             for task in _tasks(ndraws, seed, chunk_size)]
+    results = _run(_simulate_chunk, tasks, workers)
+    if summary is True:
+        for result in results[1:]:
+            for key, value in result.items():
+                results[0][key].merge(value)
+        return results[0]
+    return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,159 @@
+"""
+Vectorized root finding
+===============================================================================
+
+Newton iterations used to solve many equations at once, one per row. Rows
+are removed from the computation as soon as they converge.
+
+`newton_bracketed` is the safeguarded version: each row carries its own
+bracket `[lower, upper]`; when a Newton step leaves the bracket (or is not
+finite) a bisection step is taken instead, so every row with a valid bracket
+converges. `newton` takes plain Newton steps from an initial point.
+
+>>> import numpy as np
+>>> def func(x, rows):
+...     target = np.array([2.0, 9.0, 16.0])[rows]
+...     return x * x - target, 2 * x
+>>> root, iterations, converged = newton_bracketed(func, lower=[0, 0, 0], upper=[10, 10, 10])
+>>> root.tolist() # doctest: +ELLIPSIS
+[1.41421356..., 3.0, 4.0]
+>>> converged.tolist()
+[True, True, True]
+
+>>> root, iterations, converged = newton(func, guess=[1, 1, 1])
+>>> root.tolist() # doctest: +ELLIPSIS
+[1.41421356..., 3.0, 4.0]
+
+
+Description of the functions in this module
+===============================================================================
+
+"""
+
+import numpy as np
+
+
+def newton(func, guess, tol=1e-10, maxiter=100):
+    """Solves `func(x) = 0` for many rows at once.
+
+    Args:
+        func (function): `func(x, rows)` returns the tuple `(f, df)` with the
+            values of the function and its derivative at `x` for the rows
+            indexed by the integer array `rows`.
+        guess (array): initial point of each row.
+        tol (float): relative tolerance for the step size.
+        maxiter (int): maximum number of iterations.
+
+    Returns:
+        `(root, iterations, converged)`: the root of each row (`nan` for rows
+        that did not converge), the number of iterations used by each row and
+        a boolean array with the convergence flag of each row.
+
+    """
+    xval = np.array(guess, dtype=np.float64, ndmin=1)
+    nrows = len(xval)
+    iterations = np.zeros(nrows, dtype=np.int64)
+    converged = np.zeros(nrows, dtype=bool)
+    active = np.isfinite(xval)
+
+    with np.errstate(all='ignore'):
+        for _ in range(maxiter):
+
+            rows = np.flatnonzero(active)
+            if rows.size == 0:
+                break
+
+            xrows = xval[rows]
+            fval, dfval = func(xrows, rows)
+            iterations[rows] += 1
+
+            xnew = np.where(fval == 0, xrows, xrows - fval / dfval)
+            failed = ~np.isfinite(xnew)
+            done = ~failed & (np.abs(xnew - xrows) <= tol * (1 + np.abs(xrows)))
+
+            xval[rows] = xnew
+            converged[rows[done]] = True
+            active[rows[done | failed]] = False
+
+    root = np.where(converged, xval, np.nan)
+    return root, iterations, converged
+
+
+def newton_bracketed(func, lower, upper, guess=None, tol=1e-12, maxiter=100):
+    """Solves `func(x) = 0` for many rows at once.
+
+    Args:
+        func (function): `func(x, rows)` returns the tuple `(f, df)` with the
+            values of the function and its derivative at `x` for the rows
+            indexed by the integer array `rows`.
+        lower (array): lower end of the bracket of each row.
+        upper (array): upper end of the bracket of each row. `func` must have
+            opposite signs at `lower` and `upper`. Rows with a `nan` bracket
+            are not solved.
+        guess (array): initial point of each row. By default, the midpoint of
+            the bracket.
+        tol (float): relative tolerance for the step size.
+        maxiter (int): maximum number of iterations.
+
+    Returns:
+        `(root, iterations, converged)`: the root of each row (`nan` for rows
+        that did not converge), the number of iterations used by each row and
+        a boolean array with the convergence flag of each row.
+
+    """
+    #pylint: disable=too-many-arguments,too-many-locals
+    lower = np.array(lower, dtype=np.float64, ndmin=1)
+    upper = np.array(upper, dtype=np.float64, ndmin=1)
+    if guess is None:
+        xval = (lower + upper) / 2
+    else:
+        xval = np.array(np.broadcast_to(guess, lower.shape), dtype=np.float64)
+
+    nrows = len(lower)
+    iterations = np.zeros(nrows, dtype=np.int64)
+    converged = np.zeros(nrows, dtype=bool)
+    active = np.isfinite(lower) & np.isfinite(upper)
+
+    with np.errstate(all='ignore'):
+
+        rows = np.flatnonzero(active)
+        flower = np.full(nrows, np.nan)
+        flower[rows] = func(lower[rows], rows)[0]
+
+        for _ in range(maxiter):
+
+            rows = np.flatnonzero(active)
+            if rows.size == 0:
+                break
+
+            xrows = xval[rows]
+            fval, dfval = func(xrows, rows)
+            iterations[rows] += 1
+
+            # shrinks the bracket keeping a sign change inside it
+            same = np.sign(fval) == np.sign(flower[rows])
+            lower[rows] = np.where(same, xrows, lower[rows])
+            flower[rows] = np.where(same, fval, flower[rows])
+            upper[rows] = np.where(same, upper[rows], xrows)
+
+            # Newton step, or bisection when the step leaves the bracket
+            xnew = xrows - fval / dfval
+            outside = ~np.isfinite(xnew) | (xnew <= lower[rows]) | (xnew >= upper[rows])
+            xnew = np.where(outside, (lower[rows] + upper[rows]) / 2, xnew)
+            xnew = np.where(fval == 0, xrows, xnew)
+
+            scale = tol * (1 + np.abs(xrows))
+            done = (fval == 0) | (np.abs(xnew - xrows) <= scale)
+            done |= (upper[rows] - lower[rows]) <= scale
+
+            xval[rows] = xnew
+            converged[rows[done]] = True
+            active[rows[done]] = False
+
+    root = np.where(converged, xval, np.nan)
+    return root, iterations, converged
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,241 @@
+"""
+Streaming summaries
+===============================================================================
+
+A `Summary` accumulates the count, mean, variance, skewness, minimum, maximum,
+probability of loss and quantiles of a stream of values, consumed chunk by
+chunk, with a memory use that does not depend on the number of values.
+Summaries of different chunks (or computed in different processes) are
+combined with `merge`.
+
+>>> summary = Summary()
+>>> for seed in range(10):
+...     summary.update(np.random.default_rng(seed).normal(100, 20, size=10000))
+>>> summary.count
+100000
+>>> round(summary.mean), round(summary.std)
+(100, 20)
+>>> round(summary.quantile(0.5))
+100
+>>> bool(abs(summary.quantile(0.975) - 139.2) < 0.01 * 139.2)
+True
+
+>>> other = Summary()
+>>> other.update(-np.ones(100000))
+>>> summary.merge(other)
+>>> summary.count, summary.min
+(200000, -1.0)
+>>> round(summary.probability_of_loss, 3)
+0.5
+
+
+Description of the functions and objects in this module
+===============================================================================
+
+"""
+
+import numpy as np
+
+
+class _Store():
+    """Counts of the values in the buckets `offset`, `offset + 1`, ...
+    stored in a contiguous array."""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _extend(self, lower, upper):
+        """Extends the array to the buckets `lower` to `upper`."""
+        if self.counts.size == 0:
+            self.offset = lower
+            self.counts = np.zeros(upper - lower + 1, dtype=np.int64)
+            return
+        lower = min(lower, self.offset)
+        upper = max(upper, self.offset + self.counts.size - 1)
+        if lower == self.offset and upper == self.offset + self.counts.size - 1:
+            return
+        counts = np.zeros(upper - lower + 1, dtype=np.int64)
+        counts[self.offset - lower:self.offset - lower + self.counts.size] = self.counts
+        self.offset = lower
+        self.counts = counts
+
+    def add(self, buckets):
+        """Counts the values of the integer array `buckets`."""
+        if buckets.size == 0:
+            return
+        lower, upper = int(buckets.min()), int(buckets.max())
+        self._extend(lower, upper)
+        self.counts[lower - self.offset:upper - self.offset + 1] += \
+            np.bincount(buckets - lower, minlength=upper - lower + 1)
+
+    def merge(self, other):
+        """Adds the counts of the store `other`."""
+        if other.counts.size == 0:
+            return
+        self._extend(other.offset, other.offset + other.counts.size - 1)
+        first = other.offset - self.offset
+        self.counts[first:first + other.counts.size] += other.counts
+
+
+class Summary():
+    """Online summary of a stream of values.
+
+    Args:
+        relative_accuracy (float): relative accuracy of the quantiles. The
+            values are counted in buckets with logarithmic sizes, so the
+            quantile `q` is returned with a relative error lower than
+            `relative_accuracy`.
+        min_value (float): values with absolute value lower than `min_value`
+            are counted as zeros in the quantiles.
+
+    The non finite values (as the `nan` returned by `irr` when a cashflow has
+    no rate of return) are counted in `nans` and excluded from the rest of
+    the statistics.
+
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-12):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('`relative_accuracy` must be in the interval (0, 1)')
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.count = 0
+        self.nans = 0
+        self.losses = 0
+        self.mean = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._zeros = 0
+        self._positive = _Store()
+        self._negative = _Store()
+
+    def __repr__(self):
+        txt = ['Summary:']
+        txt.append('Count = {:d}'.format(self.count))
+        txt.append('Mean = {:1.4f}'.format(self.mean))
+        txt.append('Std = {:1.4f}'.format(self.std))
+        txt.append('Min = {:1.4f}'.format(self.min))
+        txt.append('Max = {:1.4f}'.format(self.max))
+        return '\n'.join(txt) + '\n'
+
+    def _buckets(self, values):
+        """Returns the buckets of the absolute values `values`."""
+        return np.ceil(np.log(values) / np.log(self._gamma)).astype(np.int64)
+
+    def update(self, values):
+        """Adds the values of an array (or a TimeSeries, or the net values of
+        a batch evaluation with `timevalue` or `irr`)."""
+        values = np.asarray(getattr(values, 'data', values), dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        self.nans += int(values.size - np.count_nonzero(finite))
+        values = values[finite]
+        if values.size == 0:
+            return
+
+        # moments of the chunk, merged with the moments of the summary
+        count = values.size
+        mean = values.mean()
+        deviation = values - mean
+        square = deviation * deviation
+        self._merge_moments(count, mean, square.sum(), (square * deviation).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.losses += int(np.count_nonzero(values < 0))
+
+        magnitude = np.abs(values)
+        small = magnitude < self.min_value
+        self._zeros += int(np.count_nonzero(small))
+        self._positive.add(self._buckets(magnitude[(values > 0) & ~small]))
+        self._negative.add(self._buckets(magnitude[(values < 0) & ~small]))
+
+    def _merge_moments(self, count, mean, m2, m3):
+        """Combines the moments with the moments of other `count` values."""
+        total = self.count + count
+        delta = mean - self.mean
+        self._m3 += m3 + delta ** 3 * self.count * count * (self.count - count) / total ** 2
+        self._m3 += 3 * delta * (self.count * m2 - count * self._m2) / total
+        self._m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def merge(self, other):
+        """Adds the values summarized in `other`, which must have the same
+        `relative_accuracy`."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Summaries must have the same relative accuracy')
+        self.nans += other.nans
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other._m2, other._m3)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.losses += other.losses
+        self._zeros += other._zeros
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+
+    @property
+    def variance(self):
+        """Variance (population) of the values."""
+        if self.count == 0:
+            return np.nan
+        return self._m2 / self.count
+
+    @property
+    def std(self):
+        """Standard deviation (population) of the values."""
+        return np.sqrt(self.variance)
+
+    @property
+    def skewness(self):
+        """Skewness (population) of the values."""
+        if self.count == 0 or self._m2 == 0:
+            return np.nan
+        return np.sqrt(self.count) * self._m3 / self._m2 ** 1.5
+
+    @property
+    def probability_of_loss(self):
+        """Fraction of the values lower than zero."""
+        if self.count == 0:
+            return np.nan
+        return self.losses / self.count
+
+    def quantile(self, q):
+        """Returns the quantile `q` (a number between 0 and 1, or an array) of
+        the values.
+
+        >>> summary = Summary(relative_accuracy=0.001)
+        >>> summary.update(np.arange(-500, 1001))
+        >>> [round(float(x)) for x in summary.quantile([0, 0.25, 0.5, 1])]
+        [-500, -125, 250, 1000]
+
+        """
+        qarr = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(qarr.shape, np.nan)[()]
+        # buckets in increasing order of the values
+        negative = self._negative
+        positive = self._positive
+        counts = np.concatenate([negative.counts[::-1], [self._zeros], positive.counts])
+        nbuckets = negative.counts.size
+        index = np.concatenate([negative.offset + np.arange(nbuckets)[::-1],
+                                [0], positive.offset + np.arange(positive.counts.size)])
+        sign = np.concatenate([-np.ones(nbuckets), [0], np.ones(positive.counts.size)])
+        # the value of a bucket is the one with the same relative error to
+        # both ends of the bucket
+        values = sign * 2 * self._gamma ** index / (self._gamma + 1)
+
+        rank = np.clip(qarr, 0, 1) * (self.count - 1)
+        position = np.searchsorted(np.cumsum(counts), rank, side='right')
+        result = np.clip(values[np.minimum(position, counts.size - 1)], self.min, self.max)
+        result = np.where(qarr <= 0, self.min, np.where(qarr >= 1, self.max, result))
+        return result[()]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
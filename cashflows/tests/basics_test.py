@@ -7,7 +7,7 @@
 import unittest
 import numpy as np
 
-from cashflows.basics import iconv
+from cashflows.basics import iconv, tvmm, amortize
 
 # from cashflows.basics import compound
 
@@ -63,6 +63,59 @@ class RateProc_TestCase(unittest.TestCase):
 
 
 
+class TvmmArray_TestCase(unittest.TestCase):
+    """Time value of money over arrays"""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.nrate = rng.uniform(1, 30, 1000)
+        self.nper = rng.randint(2, 360, 1000).astype(float)
+        self.pval = rng.uniform(100, 10000, 1000)
+        self.fval = rng.uniform(-100, 100, 1000)
+
+    def test_roundtrip(self):
+        pmt = tvmm(pval=self.pval, fval=self.fval, nrate=self.nrate, nper=self.nper, pyr=12)
+        self.assertIsInstance(pmt, np.ndarray)
+        np.testing.assert_allclose(
+            tvmm(fval=self.fval, pmt=pmt, nrate=self.nrate, nper=self.nper, pyr=12), self.pval)
+        np.testing.assert_allclose(
+            tvmm(pval=self.pval, pmt=pmt, nrate=self.nrate, nper=self.nper, pyr=12),
+            self.fval, atol=1e-6)
+        np.testing.assert_allclose(
+            tvmm(pval=self.pval, fval=self.fval, pmt=pmt, nrate=self.nrate, pyr=12), self.nper)
+        np.testing.assert_allclose(
+            tvmm(pval=self.pval, fval=self.fval, pmt=pmt, nper=self.nper, pyr=12), self.nrate)
+
+    def test_due(self):
+        pmt = tvmm(pval=100, nrate=10, nper=5, fval=0, due=1)
+        self.assertAlmostEqual(pmt, tvmm(pval=100, nrate=10, nper=5, fval=0) / 1.1)
+
+    def test_zero_rate(self):
+        self.assertAlmostEqual(tvmm(pval=100, nrate=0, nper=5, fval=0), -20)
+        self.assertAlmostEqual(tvmm(pval=100, nrate=0, pmt=-20, fval=0), 5)
+
+
+class AmortizeBatch_TestCase(unittest.TestCase):
+    """Amortization schedules of a batch of loans"""
+
+    def test_batch(self):
+        pval = np.array([100.0, 250.0, 80.0])
+        nrate = np.array([10.0, 0.0, 24.0])
+        nper = np.array([5, 3, 8])
+        for due in (0, 1):
+            principal, interest, payment, balance = amortize(
+                pval=pval, nrate=nrate, nper=nper, fval=0, due=due)
+            self.assertEqual(balance.shape, (3, 9))
+            for row in range(3):
+                single = amortize(pval=pval[row], nrate=nrate[row], nper=int(nper[row]),
+                                  fval=0, due=due)
+                for batch, xsingle in zip((principal, interest, payment, balance), single):
+                    np.testing.assert_allclose(batch[row, :nper[row] + 1], xsingle, atol=1e-9)
+                    self.assertTrue((batch[row, nper[row] + 1:] == 0).all())
+            np.testing.assert_allclose(balance[:, -1], 0, atol=1e-9)
+            np.testing.assert_allclose(principal.sum(axis=1), -pval)
+
+
 
 if __name__ == '__main__':
     unittest.main()
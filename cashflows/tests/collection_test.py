@@ -0,0 +1,131 @@
+"""File-backed collections of time series
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeriesPanel, cashflow, nominal_rate
+from cashflows.gcashana import timevalue, irr
+from cashflows.collection import CollectionWriter, save_collection, open_collection
+from cashflows.collection import encode, decode
+
+
+class CollectionTestCase(unittest.TestCase):
+    """Writing and memory mapping of collections"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'book.cfts')
+        rng = np.random.default_rng(0)
+        self.values = rng.normal(100, 20, size=(50, 12))
+        self.values[:, 0] = -1000
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        monthly = cashflow([1] * 24, start=(2010, 5), pyr=12)
+        with CollectionWriter(self.path) as writer:
+            writer.append(TimeSeriesPanel(nrows=1, nper=12))
+            for row in self.values:
+                writer.append(cashflow(row.tolist()))
+            writer.append(monthly)
+            writer.append(monthly * 2)
+        book = open_collection(self.path)
+        self.assertEqual(len(book), 53)
+        self.assertEqual(book.nblocks, 2)
+        np.testing.assert_array_equal(book.blocks[0].data[1:], self.values)
+        self.assertIs(book[-1].axis, monthly.axis)
+        self.assertEqual(book[-1].tolist(), [2.0] * 24)
+        self.assertEqual([len(x) for x in book], [12] * 51 + [24] * 2)
+        with self.assertRaises(IndexError):
+            book[53]
+
+    def test_streaming(self):
+        save_collection(self.path, [TimeSeriesPanel([cashflow(row.tolist()) for row in self.values])])
+        book = open_collection(self.path)
+        marr = nominal_rate([8] * 12)
+        streamed = np.concatenate([timevalue(panel, marr) for panel in book.panels(nrows=7)])
+        expected = [timevalue(cashflow(row.tolist()), marr) for row in self.values]
+        np.testing.assert_allclose(streamed, expected)
+        rates = np.concatenate([irr(panel) for panel in book.panels(nrows=16)])
+        np.testing.assert_allclose(rates, irr(book.blocks[0]))
+
+    def test_many_blocks(self):
+        # a block for each series: the file is mapped once
+        with CollectionWriter(self.path) as writer:
+            for index in range(5000):
+                writer.append(cashflow([index] * 3, start=index % 2))
+        book = open_collection(self.path)
+        self.assertEqual(book.nblocks, 5000)
+        self.assertEqual(book[4999].tolist(), [4999.0] * 3)
+        self.assertEqual(book[4999].start, (1,))
+
+    def test_alignment(self):
+        # blocks of 3 and 5 values are padded to 64 bytes
+        with CollectionWriter(self.path) as writer:
+            for index in range(6):
+                writer.append(cashflow([index] * (3 + 2 * (index % 2))))
+        book = open_collection(self.path)
+        self.assertEqual(book.nblocks, 6)
+        for block in book.blocks:
+            self.assertEqual(block.data.ctypes.data % 64, 0)
+        self.assertEqual(book[5].tolist(), [5.0] * 5)
+        self.assertEqual(os.path.getsize(self.path) % 64, 0)
+
+    def test_modes(self):
+        save_collection(self.path, [cashflow([1, 2, 3])])
+        with self.assertRaises(ValueError):
+            open_collection(self.path)[0].data[0] = 10
+        book = open_collection(self.path, mode='r+')
+        row = book[0]
+        row.data[0] = 10
+        book.flush()
+        self.assertEqual(open_collection(self.path)[0].tolist(), [10.0, 2.0, 3.0])
+        with open(self.path, 'r+b') as file:
+            file.write(b'XXXX')
+        with self.assertRaises(ValueError):
+            open_collection(self.path)
+        with self.assertRaises(TypeError):
+            save_collection(self.path, [[1, 2, 3]])
+
+
+class EncodingTestCase(unittest.TestCase):
+    """Binary encoding of a series or a panel"""
+
+    def test_round_trip(self):
+        series = cashflow([1.5] * 100 + [2.5] * 20, start=(2000, 7), pyr=12)
+        panel = TimeSeriesPanel([series, series * 2])
+        for value in (series, panel, cashflow([1, 2, 3])):
+            for compress in (0, 1, 9):
+                result = decode(encode(value, compress=compress))
+                self.assertIs(result.__class__, value.__class__)
+                self.assertIs(result.axis, value.axis)
+                self.assertEqual(result.tolist(), value.tolist())
+        self.assertEqual(len(encode(series)), 64 + 120 * 8)
+        self.assertLess(len(encode(series, compress=6)), 120 * 8)
+
+    def test_views(self):
+        data = bytearray(encode(cashflow([1, 2, 3])))
+        result = decode(data)
+        self.assertTrue(np.shares_memory(result.data, np.frombuffer(data, dtype=np.uint8)))
+        result = decode(bytes(data))
+        result[0] = 10
+        self.assertEqual(result.tolist(), [10.0, 2.0, 3.0])
+
+    def test_errors(self):
+        data = encode(cashflow([1, 2, 3]))
+        with self.assertRaises(ValueError):
+            decode(b'XXXX' + data[4:])
+        with self.assertRaises(ValueError):
+            decode(data[:-8])
+        with self.assertRaises(TypeError):
+            encode([1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
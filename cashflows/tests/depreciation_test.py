@@ -0,0 +1,142 @@
+"""Depreciation
+
+"""
+
+import contextlib
+import io
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import cashflow
+from cashflows.depreciation import depreciation_table, print_depr
+from cashflows.depreciation import depreciation_sl, depreciation_soyd, depreciation_db
+
+
+def asset_depreciation(method, cost, life, salvage, factor=1, convert_to_sl=True):
+    """Depreciation per period of a single asset, computed period by period."""
+    #pylint: disable=too-many-arguments
+    if method == 'sl':
+        return [(cost * (100 - salvage) / 100) / life] * life
+    if method == 'soyd':
+        sumdig = life * (life + 1) / 2
+        return [(cost * (100 - salvage) / 100) * (life - time) / sumdig for time in range(life)]
+    xdepr = [0] * life
+    rem_cost = cost
+    sl_depr = (cost - salvage) / life
+    for time in range(life):
+        xdepr[time] = rem_cost * factor / life
+        if convert_to_sl is True and xdepr[time] < sl_depr:
+            xdepr[time] = sl_depr
+        rem_cost -= xdepr[time]
+        if rem_cost < salvage:
+            rem_cost += xdepr[time]
+            xdepr[time] = rem_cost - salvage
+            rem_cost = salvage
+    return xdepr
+
+
+def register_depreciation(method, costs, life, salvage, delay, factor=1, convert_to_sl=True):
+    """Depreciation of a register of assets, asset by asset."""
+    #pylint: disable=too-many-arguments
+    depr = [0] * len(costs)
+    for index, cost in enumerate(costs):
+        if cost == 0:
+            continue
+        xdepr = asset_depreciation(method, cost, life[index], salvage[index], factor, convert_to_sl)
+        for time, value in enumerate(xdepr):
+            if index + time + delay[index] + 1 < len(costs):
+                depr[index + time + delay[index] + 1] += value
+    return depr
+
+
+class DepreciationTableTestCase(unittest.TestCase):
+    """Grouped depreciation against the depreciation of each asset"""
+
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        nper = 40
+        self.costs = np.where(rng.uniform(size=nper) < 0.6, rng.uniform(100, 5000, nper), 0).round(2)
+        # few distinct lives, salvages and delays, so the assets share groups
+        self.life = rng.choice([3, 5, 8], nper)
+        self.salvage = rng.choice([0, 10, 25], nper)
+        self.delay = rng.choice([0, 0, 2], nper)
+
+    def assertTable(self, table, costs, expected):
+        """Compares the arrays of `depreciation_table` with `expected`."""
+        depr, adepr, begbook, endbook = table
+        np.testing.assert_allclose(depr, expected, atol=1e-8)
+        np.testing.assert_allclose(adepr, np.cumsum(expected), atol=1e-8)
+        np.testing.assert_allclose(endbook, np.cumsum(costs) - np.cumsum(expected), atol=1e-8)
+        np.testing.assert_allclose(begbook[1:], endbook[:-1])
+        self.assertEqual(begbook[0], 0)
+
+    def test_sl_soyd(self):
+        for method in ('sl', 'soyd'):
+            expected = register_depreciation(method, self.costs, self.life, self.salvage, self.delay)
+            table = depreciation_table(self.costs, self.life, salvalue=self.salvage,
+                                       delay=self.delay, method=method)
+            self.assertTable(table, self.costs, expected)
+
+    def test_db(self):
+        costs = self.costs.copy()
+        costs[[3, 17]] *= -1
+        salvage = self.salvage * 4
+        for factor, convert_to_sl in ((1, True), (2, True), (1.5, False)):
+            expected = register_depreciation('db', costs, self.life, salvage, self.delay,
+                                             factor, convert_to_sl)
+            table = depreciation_table(costs, self.life, salvalue=salvage, delay=self.delay,
+                                       method='db', factor=factor, convert_to_sl=convert_to_sl)
+            self.assertTable(table, costs, expected)
+
+    def test_defaults(self):
+        costs = cashflow(const_value=0, nper=12, spec=[(0, 1000), (2, 600), (5, 1000)])
+        expected = register_depreciation('sl', costs.data, [4] * 12, [0] * 12, [0] * 12)
+        self.assertTable(depreciation_table(costs, life=4), costs.data, expected)
+        with self.assertRaises(ValueError):
+            depreciation_table(costs, life=4, method='ddb')
+        with self.assertRaises(TypeError):
+            depreciation_table(costs, life=4, method='db', factor='2')
+
+
+class DepreciationSeriesTestCase(unittest.TestCase):
+    """Depreciation functions over time series"""
+
+    def setUp(self):
+        self.costs = cashflow(const_value=0, start=(2000, 0), nper=16, pyr=4,
+                              spec=[(0, 1000), (3, 500), (6, 1000), (7, 250)])
+        self.life = cashflow(const_value=[4, 6, 4, 4] * 4, start=(2000, 0), pyr=4)
+        self.salvage = cashflow(const_value=[10] * 16, start=(2000, 0), pyr=4)
+        self.delay = cashflow(const_value=[1, 0] * 8, start=(2000, 0), pyr=4)
+
+    def test_functions(self):
+        args = (self.costs.data, self.life.data.astype(int), self.salvage.data,
+                self.delay.data.astype(int))
+        for function, method in ((depreciation_sl, 'sl'), (depreciation_soyd, 'soyd'),
+                                 (depreciation_db, 'db')):
+            result = function(self.costs, self.life, salvalue=self.salvage, delay=self.delay)
+            self.assertIs(result.axis, self.costs.axis)
+            np.testing.assert_allclose(result.data, register_depreciation(method, *args), atol=1e-8)
+        result = depreciation_sl(self.costs, self.life)
+        expected = register_depreciation('sl', self.costs.data, args[1], [0] * 16, [0] * 16)
+        np.testing.assert_allclose(result.data, expected, atol=1e-8)
+
+    def test_noprint(self):
+        depr, adepr, begbook, endbook = depreciation_table(self.costs, self.life,
+                                                           salvalue=self.salvage,
+                                                           delay=self.delay, method='soyd')
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            print_depr(depr, adepr, self.costs, begbook, endbook)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = depreciation_soyd(self.costs, self.life, salvalue=self.salvage,
+                                       delay=self.delay, noprint=False)
+        self.assertIsNone(result)
+        self.assertEqual(output.getvalue(), expected.getvalue())
+        self.assertIn('(2003, 3)', output.getvalue())
+        with self.assertRaises(ValueError):
+            depreciation_sl(self.costs, cashflow([4] * 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
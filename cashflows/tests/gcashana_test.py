@@ -0,0 +1,130 @@
+"""Analysis of cashflows
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import cashflow, nominal_rate, TimeSeriesPanel
+from cashflows.gcashana import irr, mirr, timevalue, timevalue_matrix
+from cashflows.utilityfun import exp_utility_fun
+
+
+def irr_roots(values):
+    """Rate of return closest to zero computed from the polynomial roots."""
+    roots = np.roots(values[::-1])
+    roots = roots[(roots.imag == 0) & (roots.real > 0)].real
+    if roots.size == 0:
+        return np.nan
+    rates = 1 / roots - 1
+    return rates[np.argmin(np.abs(rates))]
+
+
+class IrrTestCase(unittest.TestCase):
+    """Internal rate of return computed in batch"""
+
+    def test_irr_conventional(self):
+        rng = np.random.RandomState(1)
+        values = rng.uniform(10, 50, size=(200, 24))
+        values[:, 0] = -rng.uniform(100, 600, size=200)
+        panel = TimeSeriesPanel(nrows=200, nper=24)
+        panel.data[:] = values
+        rate, info = irr(panel, full_output=True)
+        expected = [100 * irr_roots(row) for row in values]
+        np.testing.assert_allclose(rate, expected, rtol=1e-8)
+        self.assertTrue(info['converged'].all())
+        self.assertTrue((info['sign_changes'] == 1).all())
+
+    def test_irr_no_solution(self):
+        rate, info = irr(cashflow([100] * 5), full_output=True)
+        self.assertTrue(np.isnan(rate))
+        self.assertFalse(info['converged'])
+        self.assertEqual(info['sign_changes'], 0)
+
+    def test_irr_pyr(self):
+        cflo = cashflow([100] * 8, spec=(0, -500), pyr=4)
+        self.assertAlmostEqual(irr(cflo), 400 * irr_roots(np.array(cflo.tolist())))
+
+    def test_mirr(self):
+        cflo = cashflow([100] * 5, spec=(0, -200))
+        future_value = 100 * (1.1**3 + 1.1**2 + 1.1 + 1)
+        self.assertAlmostEqual(mirr(cflo, 0.05, 0.1),
+                               100 * ((future_value / 200) ** 0.25 - 1))
+
+
+class PanelTimevalueTestCase(unittest.TestCase):
+    """Net values of panels against the net values of each row"""
+
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.rows = [cashflow(rng.uniform(-100, 100, 12).tolist(), pyr=4) for _ in range(5)]
+        self.rates = [nominal_rate(rng.uniform(2, 15, 12).tolist(), pyr=4) for _ in range(5)]
+        self.cflo = TimeSeriesPanel(self.rows)
+        self.marr = TimeSeriesPanel(self.rates)
+
+    def test_panel_cashflow(self):
+        for base_date in (0, 7, (1, 2)):
+            expected = [timevalue(row, self.rates[0], base_date) for row in self.rows]
+            np.testing.assert_allclose(timevalue(self.cflo, self.rates[0], base_date), expected)
+
+    def test_panel_rate(self):
+        expected = [timevalue(self.rows[0], rate) for rate in self.rates]
+        np.testing.assert_allclose(timevalue(self.rows[0], self.marr), expected)
+        expected = [timevalue(row, rate, 3) for row, rate in zip(self.rows, self.rates)]
+        np.testing.assert_allclose(timevalue(self.cflo, self.marr, 3), expected)
+
+    def test_base_dates(self):
+        base_date = [0, 3, 11, 5, (0, 1)]
+        expected = [timevalue(row, rate, xbase_date)
+                    for row, rate, xbase_date in zip(self.rows, self.rates, base_date)]
+        np.testing.assert_allclose(timevalue(self.cflo, self.marr, base_date), expected)
+        with self.assertRaises(ValueError):
+            timevalue(self.cflo, nominal_rate([10] * 12))
+
+
+class TimevalueMatrixTestCase(unittest.TestCase):
+    """Net values of K cashflows under M interest rate curves"""
+
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        self.cflo = [cashflow(rng.uniform(-100, 100, 10).tolist(), start=(2000, 1), pyr=2)
+                     for _ in range(6)]
+        self.marr = [nominal_rate(rng.uniform(1, 12, 10).tolist(), start=(2000, 1), pyr=2)
+                     for _ in range(3)]
+
+    def expected(self, base_date, utility=None):
+        """Net values computed with a call to `timevalue` for each pair."""
+        return [[timevalue(xcflo, xmarr, xbase_date, utility=utility)
+                 for xmarr, xbase_date in zip(self.marr, base_date)] for xcflo in self.cflo]
+
+    def test_matrix(self):
+        result = timevalue_matrix(self.cflo, self.marr)
+        self.assertEqual(result.shape, (6, 3))
+        np.testing.assert_allclose(result, self.expected([0] * 3))
+        np.testing.assert_allclose(timevalue_matrix(TimeSeriesPanel(self.cflo), TimeSeriesPanel(self.marr)),
+                                   result)
+        np.testing.assert_allclose(timevalue_matrix(self.cflo[0], self.marr[1]), [[result[0, 1]]])
+
+    def test_base_date(self):
+        np.testing.assert_allclose(timevalue_matrix(self.cflo, self.marr, base_date=(2002, 0)),
+                                   self.expected([(2002, 0)] * 3))
+        base_date = [0, 9, (2001, 1)]
+        np.testing.assert_allclose(timevalue_matrix(self.cflo, self.marr, base_date=base_date),
+                                   self.expected(base_date))
+        utility = exp_utility_fun(500)
+        np.testing.assert_allclose(timevalue_matrix(self.cflo, self.marr, base_date=4, utility=utility),
+                                   self.expected([4] * 3, utility))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            timevalue_matrix(self.cflo, nominal_rate([10] * 10, start=(2000, 0), pyr=2))
+        with self.assertRaises(ValueError):
+            timevalue_matrix(self.cflo, [self.marr[0], nominal_rate([10] * 10, pyr=4)])
+        with self.assertRaises(ValueError):
+            timevalue_matrix(self.cflo, self.marr, base_date=[0, 1])
+        with self.assertRaises(TypeError):
+            timevalue_matrix([1, 2, 3], self.marr)
+
+
+if __name__ == '__main__':
+    unittest.main()
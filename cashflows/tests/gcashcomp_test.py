@@ -0,0 +1,97 @@
+"""Computations over cashflows and rates
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import cashflow, nominal_rate, TimeSeriesPanel
+from cashflows.gcashcomp import after_tax_cashflow, const2curr, curr2const
+from cashflows.gcashcomp import to_discount_factor, to_compound_factor
+from cashflows.gcashcomp import discount_factor_cache_info, discount_factor_cache_clear
+
+
+class PanelTestCase(unittest.TestCase):
+    """Conversions of panels against the conversions of each row"""
+
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.rows = [cashflow(rng.uniform(-100, 100, 8).tolist(), start=(2000, 0), pyr=2)
+                     for _ in range(4)]
+        self.rates = [nominal_rate(rng.uniform(0, 20, 8).tolist(), start=(2000, 0), pyr=2)
+                      for _ in range(4)]
+        self.cflo = TimeSeriesPanel(self.rows)
+        self.rate = TimeSeriesPanel(self.rates)
+
+    def assertRows(self, panel, expected):
+        """Compares the rows of `panel` with the series `expected`."""
+        self.assertIsInstance(panel, TimeSeriesPanel)
+        self.assertIs(panel.axis, self.cflo.axis)
+        np.testing.assert_allclose(panel.data, [row.tolist() for row in expected])
+
+    def test_after_tax_cashflow(self):
+        self.assertRows(after_tax_cashflow(self.cflo, self.rates[0]),
+                        [after_tax_cashflow(row, self.rates[0]) for row in self.rows])
+        self.assertRows(after_tax_cashflow(self.cflo, self.rate),
+                        [after_tax_cashflow(row, rate) for row, rate in zip(self.rows, self.rates)])
+
+    def test_const2curr(self):
+        for base_date in (0, 5, (2001, 1)):
+            self.assertRows(const2curr(self.cflo, self.rates[1], base_date),
+                            [const2curr(row, self.rates[1], base_date) for row in self.rows])
+        self.assertRows(const2curr(self.cflo, self.rate),
+                        [const2curr(row, rate) for row, rate in zip(self.rows, self.rates)])
+        self.assertRows(curr2const(const2curr(self.cflo, self.rate, 3), self.rate, 3), self.rows)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            const2curr(self.cflo, nominal_rate([10] * 8))
+        with self.assertRaises(TypeError):
+            after_tax_cashflow(self.cflo, [10] * 8)
+
+
+class FactorCacheTestCase(unittest.TestCase):
+    """Cache of discount factors by content of the rate series"""
+
+    def setUp(self):
+        self.maxsize = discount_factor_cache_info().maxsize
+        discount_factor_cache_clear()
+
+    def tearDown(self):
+        discount_factor_cache_clear(self.maxsize)
+
+    def test_content(self):
+        to_discount_factor(nominal_rate([10] * 5))
+        to_compound_factor(nominal_rate([10] * 5), base_date=3)
+        to_discount_factor(nominal_rate([10] * 5, pyr=4))
+        to_discount_factor(nominal_rate([10] * 6))
+        to_discount_factor(nominal_rate([10] * 4 + [11]))
+        info = discount_factor_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 4, 4))
+
+    def test_eviction(self):
+        discount_factor_cache_clear(maxsize=2)
+        for value in (1, 2, 3, 2, 1):
+            to_discount_factor(nominal_rate([value] * 5))
+        info = discount_factor_cache_info()
+        self.assertEqual((info.hits, info.misses, info.maxsize, info.currsize), (1, 4, 2, 2))
+        discount_factor_cache_clear(maxsize=0)
+        to_discount_factor(nominal_rate([1] * 5))
+        to_discount_factor(nominal_rate([1] * 5))
+        info = discount_factor_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 2, 0))
+        with self.assertRaises(ValueError):
+            discount_factor_cache_clear(maxsize=-1)
+
+    def test_mutation(self):
+        nrate = nominal_rate([10] * 5)
+        self.assertAlmostEqual(to_discount_factor(nrate)[4], 1 / 1.1**4)
+        nrate[2] = 20
+        self.assertAlmostEqual(to_discount_factor(nrate)[4], 1 / (1.1**3 * 1.2))
+        nrate += 10
+        self.assertAlmostEqual(to_discount_factor(nrate)[1], 1 / 1.2)
+        self.assertEqual(discount_factor_cache_info().misses, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
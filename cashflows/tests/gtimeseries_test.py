@@ -0,0 +1,460 @@
+"""Time series
+
+"""
+
+import copy
+import unittest
+import pickle
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, TimeAxis, cashflow, nominal_rate
+from cashflows.gtimeseries import verify_eq_time_range, reindex, align, alignment, resample
+from cashflows.gtimeseries import cashflow_panel, nominal_rate_panel
+from cashflows.basics import iconv
+
+
+class ViewTestCase(unittest.TestCase):
+    """Slices of time series sharing the values"""
+
+    def setUp(self):
+        self.series = cashflow(const_value=list(range(24)), start=(2000, 1), pyr=12)
+
+    def test_time_range(self):
+        view = self.series[(2000, 11):(2001, 2)]
+        self.assertEqual((view.start, view.end), ((2000, 11), (2001, 2)))
+        self.assertEqual(view.tolist(), [10.0, 11.0, 12.0, 13.0])
+        view = self.series[-3:]
+        self.assertEqual((view.start, view.end), ((2001, 10), (2002, 0)))
+        self.assertTrue(np.shares_memory(view.data, self.series.data))
+        view = self.series.window(2001)
+        self.assertEqual((view.start, view.end, len(view)), ((2001, 0), (2002, 0), 13))
+        with self.assertRaises(ValueError):
+            self.series[5:5]
+        with self.assertRaises(ValueError):
+            self.series[::2]
+
+    def test_copy_on_write(self):
+        view = self.series[2:6]
+        inner = view[1:3]
+        view += 100
+        self.assertEqual(view.tolist(), [102.0, 103.0, 104.0, 105.0])
+        self.assertEqual(inner.tolist(), [3.0, 4.0])
+        self.assertEqual(self.series[2], 2.0)
+        self.series[(2000, 4)] = -1
+        self.assertEqual(inner.tolist(), [3.0, 4.0])
+        self.assertEqual(self.series[3], -1.0)
+        with self.assertRaises(ValueError):
+            inner.data[0] = 0
+
+    def test_detached_parent(self):
+        series = TimeSeries(nper=10)
+        view = series[:5]
+        del view
+        series[0] = 1
+        self.assertTrue(series.data.flags.owndata)
+        series.data[1] = 2
+        self.assertEqual(series.tolist()[:2], [1.0, 2.0])
+
+
+class PanelTestCase(unittest.TestCase):
+    """Panels of time series on the same time range"""
+
+    def setUp(self):
+        self.rows = [cashflow([1, 2, 3, 4], start=(2000, 1), pyr=4),
+                     cashflow([5, 6, 7, 8], start=(2000, 1), pyr=4)]
+        self.panel = TimeSeriesPanel(self.rows)
+
+    def test_construction(self):
+        self.assertIs(self.panel.axis, self.rows[0].axis)
+        self.assertEqual(self.panel.data.shape, (2, 4))
+        self.assertEqual(self.panel.data.dtype, np.float64)
+        panel = TimeSeriesPanel(nrows=3, start=(2000, 0), nper=8, pyr=4)
+        self.assertEqual(panel.data.shape, (3, 8))
+        self.assertEqual(panel.end, (2001, 3))
+        self.assertEqual(TimeSeriesPanel(self.rows[0]).tolist(), [[1.0, 2.0, 3.0, 4.0]])
+        with self.assertRaises(ValueError):
+            TimeSeriesPanel([self.rows[0], cashflow([1, 2, 3, 4])])
+        with self.assertRaises(TypeError):
+            TimeSeriesPanel([self.rows[0], [1, 2, 3, 4]])
+        with self.assertRaises(ValueError):
+            TimeSeriesPanel([])
+        with self.assertRaises(ValueError):
+            TimeSeriesPanel(nper=4)
+
+    def test_items(self):
+        row = self.panel[1]
+        self.assertIsInstance(row, TimeSeries)
+        self.assertIs(row.axis, self.panel.axis)
+        self.assertEqual(row.tolist(), [5.0, 6.0, 7.0, 8.0])
+        self.panel[0] = cashflow([9, 9, 9, 9], start=(2000, 1), pyr=4)
+        self.assertEqual(self.panel[0].tolist(), [9.0] * 4)
+        self.panel[1] = 0
+        self.assertEqual(self.panel.tolist()[1], [0.0] * 4)
+        self.assertEqual(self.rows[0].tolist(), [1.0, 2.0, 3.0, 4.0])
+        with self.assertRaises(ValueError):
+            self.panel[0] = cashflow([1, 2, 3, 4])
+
+    def test_row_keys(self):
+        rows = self.panel[0:1]
+        self.assertIsInstance(rows, TimeSeriesPanel)
+        self.assertIs(rows.axis, self.panel.axis)
+        self.assertEqual(rows.tolist(), [[1.0, 2.0, 3.0, 4.0]])
+        self.assertIn('Rows = 1', repr(rows))
+        self.assertEqual(self.panel[np.int64(1)].tolist(), [5.0, 6.0, 7.0, 8.0])
+        for key in ((slice(None), 1), 1.0, [0, 1], True):
+            with self.assertRaises(TypeError):
+                self.panel[key]
+
+    def test_arithmetic(self):
+        series = cashflow([10, 20, 30, 40], start=(2000, 1), pyr=4)
+        self.assertEqual((self.panel + series).tolist(),
+                         [[11.0, 22.0, 33.0, 44.0], [15.0, 26.0, 37.0, 48.0]])
+        self.assertEqual((series - self.panel).tolist(),
+                         [[9.0, 18.0, 27.0, 36.0], [5.0, 14.0, 23.0, 32.0]])
+        self.assertEqual((self.panel * self.panel).tolist(),
+                         [[1.0, 4.0, 9.0, 16.0], [25.0, 36.0, 49.0, 64.0]])
+        self.assertEqual((2 / self.panel).data[0].tolist(), [2.0, 1.0, 2 / 3, 0.5])
+        panel = self.panel.copy()
+        panel += series
+        self.assertEqual(panel.tolist()[0], [11.0, 22.0, 33.0, 44.0])
+        self.assertEqual(self.panel.tolist()[0], [1.0, 2.0, 3.0, 4.0])
+        for index, row in enumerate(self.panel):
+            self.assertEqual((self.panel * series)[index].tolist(), (row * series).tolist())
+
+
+class TimeAxisTestCase(unittest.TestCase):
+    """Interned time axes"""
+
+    def test_shared(self):
+        series = TimeSeries(start=(2000, 1), nper=8, pyr=4)
+        other = cashflow([0] * 8, start=(2000, 1), pyr=4)
+        self.assertIs(series.axis, other.axis)
+        self.assertIs((series + other).axis, series.axis)
+        self.assertIs(series[2:5].axis, TimeAxis((2000, 3), (2001, 1), 4))
+        self.assertIs(pickle.loads(pickle.dumps(series.axis)), series.axis)
+
+    def test_immutable(self):
+        series = TimeSeries(nper=4)
+        with self.assertRaises(AttributeError):
+            series.axis.nper = 5
+        with self.assertRaises(AttributeError):
+            series.start = (1,)
+
+    def test_index(self):
+        axis = TimeAxis((2000, 0), (2001, 3), 4)
+        self.assertEqual(axis.timeids[5], (2001, 1))
+        self.assertEqual(axis.index((2001, 1)), 5)
+        self.assertEqual(axis.index((2002, 0)), 8)
+
+    def test_verify(self):
+        with self.assertRaisesRegex(ValueError, 'different end date'):
+            verify_eq_time_range(TimeSeries(nper=4), TimeSeries(nper=5))
+        with self.assertRaisesRegex(ValueError, 'different periods per year'):
+            verify_eq_time_range(TimeSeries(nper=4), TimeSeries(nper=4, pyr=2))
+
+
+class AlignmentTestCase(unittest.TestCase):
+    """Alignment of series with different time ranges"""
+
+    def setUp(self):
+        self.flows = cashflow([100] * 4, start=(2020, 1), pyr=4)
+        self.rates = nominal_rate([8, 9, 10, 11], start=(2019, 3), pyr=4)
+
+    def test_joins(self):
+        flows, rates = align(self.flows, self.rates)
+        self.assertEqual((flows.start, flows.end), ((2019, 3), (2021, 0)))
+        self.assertIs(flows.axis, rates.axis)
+        flows, rates = align(self.flows, self.rates, join='inner')
+        self.assertEqual(rates.tolist(), [10.0, 11.0])
+        flows, rates = align(self.flows, self.rates, join='left', fill=[0, 'ffill'])
+        self.assertEqual(rates.tolist(), [10.0, 11.0, 11.0, 11.0])
+        self.assertIs(flows, self.flows)
+        with self.assertRaises(ValueError):
+            align(self.flows, self.rates, join='cross')
+        with self.assertRaises(ValueError):
+            align(self.flows, cashflow([1] * 4, start=(2022, 0), pyr=4), join='inner')
+        with self.assertRaises(ValueError):
+            align(self.flows, cashflow([1] * 4))
+
+    def test_disjoint(self):
+        result = reindex(self.rates, start=(2022, 0), end=(2022, 2), fill='ffill')
+        self.assertEqual(result.tolist(), [11.0] * 3)
+        result = reindex(self.rates, start=(2018, 0), end=(2018, 1), fill=-1)
+        self.assertEqual(result.tolist(), [-1.0, -1.0])
+
+    def test_panel(self):
+        panel = TimeSeriesPanel([self.flows, 2 * self.flows])
+        result = reindex(panel, start=(2020, 0), fill='ffill')
+        self.assertIsInstance(result, TimeSeriesPanel)
+        self.assertEqual(result.tolist(), [[100.0] * 5, [200.0] * 5])
+
+    def test_operators(self):
+        with self.assertRaises(ValueError):
+            self.flows * self.rates
+        with alignment(join='inner'):
+            result = self.flows * self.rates
+            flows = self.flows.copy()
+            flows += self.rates
+        self.assertEqual(result.tolist(), [1000.0, 1100.0])
+        self.assertEqual(flows.tolist(), [110.0, 111.0, 100.0, 100.0])
+        with self.assertRaises(ValueError):
+            self.flows * self.rates
+
+
+class ResampleTestCase(unittest.TestCase):
+    """Conversion between numbers of periods per year"""
+
+    def test_cashflow(self):
+        flows = cashflow(list(range(1, 8)), start=(2000, 2), pyr=12)
+        result = resample(flows, pyr=4)
+        self.assertEqual((result.start, result.end), ((2000, 0), (2000, 2)))
+        self.assertEqual(result.tolist(), [1.0, 9.0, 18.0])
+        self.assertEqual(sum(resample(result, pyr=12).tolist()), 28.0)
+        annual = resample(cashflow([10, 20], start=(2000,)), pyr=2)
+        self.assertEqual((annual.start, annual.tolist()), ((2000, 0), [5.0, 5.0, 10.0, 10.0]))
+
+    def test_rate(self):
+        rate = nominal_rate([6] * 24, start=(2000, 0), pyr=12)
+        result = resample(rate, pyr=1, kind='rate')
+        self.assertEqual(result.start, (2000,))
+        erate, _ = iconv(nrate=6, pyr=12)
+        np.testing.assert_allclose(result.tolist(), [erate, erate])
+        rate = nominal_rate([6, 6, 9], start=(2000, 1), pyr=4)
+        np.testing.assert_allclose(resample(rate, pyr=2, kind='rate').tolist(),
+                                   [200 * (1.015 * 1.015 - 1), 200 * (1.015 * 1.0225 - 1)])
+
+    def test_panel(self):
+        panel = TimeSeriesPanel([cashflow([1] * 12, pyr=12), cashflow([2] * 12, pyr=12)])
+        result = resample(panel, pyr=4)
+        self.assertIsInstance(result, TimeSeriesPanel)
+        self.assertEqual(result.tolist(), [[3.0] * 4, [6.0] * 4])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            resample(cashflow([1] * 12, pyr=12), pyr=5)
+        with self.assertRaises(ValueError):
+            resample(cashflow([1] * 4, pyr=4), pyr=6)
+        with self.assertRaises(ValueError):
+            resample(cashflow([1] * 4, pyr=4), pyr=2, kind='price')
+
+
+class ConstructorTestCase(unittest.TestCase):
+    """Construction of cashflows and rates"""
+
+    def test_values(self):
+        self.assertEqual(cashflow(np.arange(3)).tolist(), [0.0, 1.0, 2.0])
+        self.assertEqual(cashflow([1, 2, 3, 4], nper=2).tolist(), [1.0, 2.0])
+        self.assertEqual(nominal_rate(5, nper=3).tolist(), [5.0] * 3)
+
+    def test_spec(self):
+        flows = cashflow(1, start=(2000, 0), nper=6, pyr=4, spec=[((2000, 3), 10), (-1, 5)])
+        self.assertEqual(flows.tolist(), [1.0, 1.0, 1.0, 10.0, 1.0, 5.0])
+        rate = nominal_rate(1, nper=8, spec=[(6, 20), ((3,), 10)])
+        self.assertEqual(rate.tolist(), [1.0, 1.0, 1.0, 10.0, 10.0, 10.0, 20.0, 20.0])
+
+    def test_panel(self):
+        flows = cashflow_panel([100, 200], nrows=3, spec=(0, [-1, -2, -3]))
+        self.assertIsInstance(flows, TimeSeriesPanel)
+        self.assertEqual(flows.tolist(), [[-1.0, 200.0], [-2.0, 200.0], [-3.0, 200.0]])
+        rates = nominal_rate_panel(np.full((2, 5), 4.0), pyr=4, spec=[(3, [6, 7])])
+        self.assertEqual(rates.tolist(), [[4.0, 4.0, 4.0, 6.0, 6.0], [4.0, 4.0, 4.0, 7.0, 7.0]])
+        self.assertEqual(rates[1].tolist(), nominal_rate(4, nper=5, pyr=4, spec=(3, 7)).tolist())
+        with self.assertRaises(ValueError):
+            cashflow_panel([1, 2, 3])
+
+
+class ReductionTestCase(unittest.TestCase):
+    """Cumulative operations and reductions"""
+
+    def test_series(self):
+        x = cashflow([3, -1, 4, 1, 5], start=(2000, 2), pyr=4)
+        self.assertIs(x.cumsum().axis, x.axis)
+        self.assertEqual(x.cumsum().diff().tolist(), x.tolist())
+        self.assertEqual(x.diff(initial=3).tolist(), [0.0, -4.0, 5.0, -3.0, 4.0])
+        self.assertEqual(x.cumprod().tolist(), [3.0, -3.0, -12.0, -12.0, -60.0])
+        self.assertEqual((x.sum(), x.min(), x.max(), x.argmax()), (12.0, -1.0, 5.0, 4))
+
+    def test_panel(self):
+        x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([6, 5, 4])])
+        self.assertEqual(x.cumsum().tolist(), [[1.0, 3.0, 6.0], [6.0, 11.0, 15.0]])
+        self.assertEqual(x.diff(initial=[1, 6]).tolist(), [[0.0, 1.0, 1.0], [0.0, -1.0, -1.0]])
+        self.assertEqual(x.cumprod().data[:, -1].tolist(), [6.0, 120.0])
+        self.assertEqual(x.max().tolist(), [3.0, 6.0])
+        self.assertEqual(x.argmax().tolist(), [2, 0])
+
+
+class ArrayProtocolTestCase(unittest.TestCase):
+    """NumPy ufuncs and functions over series and panels"""
+
+    def setUp(self):
+        self.series = cashflow([1, -2, 3, -4], start=(2000, 1), pyr=4)
+
+    def test_asarray(self):
+        array = np.asarray(self.series)
+        self.assertTrue(np.shares_memory(array, self.series.data))
+        self.assertFalse(np.shares_memory(np.array(self.series), self.series.data))
+        self.assertEqual(array.tolist(), [1.0, -2.0, 3.0, -4.0])
+
+    def test_ufunc(self):
+        result = np.exp(self.series) + np.zeros(4)
+        self.assertIsInstance(result, TimeSeries)
+        self.assertIs(result.axis, self.series.axis)
+        self.assertEqual(np.sign(self.series).tolist(), [1.0, -1.0, 1.0, -1.0])
+        self.assertEqual(float(np.add.reduce(self.series)), -2.0)
+        self.assertIsInstance(np.float64(2) * self.series, TimeSeries)
+        with self.assertRaises(ValueError):
+            np.add(self.series, cashflow([1] * 4, pyr=4))
+
+    def test_out(self):
+        view = self.series[1:3]
+        result = np.multiply(view, 10, out=view)
+        self.assertIs(result, view)
+        self.assertEqual(view.tolist(), [-20.0, 30.0])
+        self.assertEqual(self.series.tolist(), [1.0, -2.0, 3.0, -4.0])
+
+    def test_function(self):
+        result = np.where(self.series > 0, self.series, 0)
+        self.assertIsInstance(result, TimeSeries)
+        self.assertEqual(result.tolist(), [1.0, 0.0, 3.0, 0.0])
+        self.assertEqual(float(np.sum(self.series)), -2.0)
+        self.assertEqual(np.clip(self.series, -1, 1).tolist(), [1.0, -1.0, 1.0, -1.0])
+        panel = TimeSeriesPanel([self.series, self.series])
+        self.assertIsInstance(np.cumsum(panel, axis=1), TimeSeriesPanel)
+        self.assertIsInstance(np.mean(panel, axis=0), TimeSeries)
+        joined = np.concatenate([self.series, cashflow([0] * 2)])
+        self.assertIsInstance(joined, np.ndarray)
+
+
+class MaskTestCase(unittest.TestCase):
+    """Masks, where, clip and sign splitting"""
+
+    def setUp(self):
+        self.series = cashflow([-3, 1, 0, 4, -2])
+
+    def test_masks(self):
+        mask = (self.series > -3) & ~(self.series >= 4)
+        self.assertEqual(mask.tolist(), [False, True, True, False, True])
+        self.assertEqual(((self.series < 0) | (self.series > 3)).tolist(),
+                         [True, False, False, True, True])
+        self.assertEqual(self.series.where(mask, self.series * 10).tolist(),
+                         [-30.0, 1.0, 0.0, 40.0, -2.0])
+        with self.assertRaises(ValueError):
+            self.series.where(cashflow([1] * 4))
+
+    def test_equality(self):
+        self.assertEqual((self.series == 1).tolist(), [False, True, False, False, False])
+        self.assertEqual((self.series != cashflow([-3, 0, 0, 0, -2])).tolist(),
+                         [False, True, False, True, False])
+        self.assertEqual((1 == self.series).tolist(), (self.series == 1).tolist())
+        panel = TimeSeriesPanel([self.series, -self.series])
+        self.assertEqual((panel == self.series).tolist(),
+                         [[True] * 5, [False, False, True, False, False]])
+        self.assertFalse(self.series == None)
+        for value in (self.series == self.series, self.series != 1, panel == self.series, panel):
+            with self.assertRaises(ValueError):
+                bool(value)
+        with self.assertRaises(ValueError):
+            self.series in [cashflow([-3, 1, 0, 4, -2])]
+        with self.assertRaises(TypeError):
+            hash(self.series)
+        with self.assertRaises(TypeError):
+            hash(panel)
+
+    def test_mask_arithmetic(self):
+        mask = self.series > 0
+        self.assertEqual(mask.data.dtype, np.bool_)
+        for result in (mask + 1, mask + mask, mask - mask, -mask, abs(mask), mask * 2,
+                       self.series * mask):
+            self.assertEqual(result.data.dtype, np.float64)
+        self.assertEqual((mask + 1).tolist(), [1.0, 2.0, 1.0, 2.0, 1.0])
+        self.assertEqual((-mask).tolist(), [0.0, -1.0, 0.0, -1.0, 0.0])
+        self.assertEqual(((TimeSeriesPanel([self.series]) > 0) * 2).data.dtype, np.float64)
+        view = mask[1:4]
+        view += 1
+        self.assertEqual(view.tolist(), [2.0, 1.0, 2.0])
+        self.assertEqual(view.data.dtype, np.float64)
+        self.assertEqual(mask.tolist(), [False, True, False, True, False])
+
+    def test_parts(self):
+        positive = self.series.positive_part()
+        negative = self.series.negative_part()
+        self.assertEqual((positive + negative).tolist(), self.series.tolist())
+        self.assertEqual(self.series.clip(lower=cashflow([0, 0, 0, 0, -1])).tolist(),
+                         [0.0, 1.0, 0.0, 4.0, -1.0])
+        panel = TimeSeriesPanel([self.series, -self.series])
+        self.assertEqual(panel.negative_part().tolist(),
+                         [[-3.0, 0.0, 0.0, 0.0, -2.0], [0.0, -1.0, 0.0, -4.0, 0.0]])
+        self.assertEqual(panel.clip(upper=self.series).data[1].tolist(),
+                         [-3.0, -1.0, 0.0, -4.0, -2.0])
+        with self.assertRaises(TypeError):
+            self.series.where(panel > 0)
+
+
+class ShiftTestCase(unittest.TestCase):
+    """Shifts, lags and leads"""
+
+    def test_series(self):
+        x = cashflow([1, 2, 3, 4, 5], start=(2000, 3), pyr=4)
+        self.assertIs(x.lag().axis, x.axis)
+        self.assertEqual(x.lag(2, fill=-1).tolist(), [-1.0, -1.0, 1.0, 2.0, 3.0])
+        self.assertEqual(x.lead(1).tolist(), [2.0, 3.0, 4.0, 5.0, 0.0])
+        self.assertEqual(x.shift(0).tolist(), x.tolist())
+        self.assertEqual(x.shift(7, fill=9).tolist(), [9.0] * 5)
+        self.assertEqual(x.lead(7).tolist(), [0.0] * 5)
+        self.assertEqual((x - x.lag()).tolist(), x.diff().tolist())
+
+    def test_panel(self):
+        x = TimeSeriesPanel([cashflow([1, 2, 3]), cashflow([4, 5, 6])])
+        self.assertEqual(x.lead(fill=[7, 8]).tolist(), [[2.0, 3.0, 7.0], [5.0, 6.0, 8.0]])
+        self.assertEqual(x.lag(2).tolist(), [[0.0, 0.0, 1.0], [0.0, 0.0, 4.0]])
+
+
+class PickleTestCase(unittest.TestCase):
+    """Pickling of series and panels"""
+
+    def setUp(self):
+        self.series = cashflow(const_value=list(range(12)), start=(2000, 1), pyr=4)
+
+    def test_protocols(self):
+        view = self.series[3:9]
+        panel = TimeSeriesPanel([self.series, -self.series])
+        for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+            for value in (self.series, view, panel):
+                result = pickle.loads(pickle.dumps(value, protocol))
+                self.assertIs(result.__class__, value.__class__)
+                self.assertIs(result.axis, value.axis)
+                self.assertEqual(result.tolist(), value.tolist())
+
+    def test_out_of_band(self):
+        buffers = []
+        data = pickle.dumps(self.series, protocol=5, buffer_callback=buffers.append)
+        self.assertLess(len(data), 200)
+        result = pickle.loads(data, buffers=buffers)
+        self.assertTrue(np.shares_memory(result.data, self.series.data))
+
+    def test_copy_on_write(self):
+        view = self.series[0:4]
+        result = pickle.loads(pickle.dumps(view, protocol=5))
+        result[0] = 100
+        self.assertEqual(result.tolist(), [100.0, 1.0, 2.0, 3.0])
+        self.assertEqual(view[0], 0.0)
+
+    def test_writable(self):
+        panel = TimeSeriesPanel([self.series, -self.series])
+        for result in (copy.deepcopy(panel), copy.copy(panel), pickle.loads(pickle.dumps(panel, 4)),
+                       pickle.loads(pickle.dumps(panel, 5))):
+            result[0] = self.series * 2
+            result.data[1, 0] = 100
+            self.assertEqual(result.data[:, 0].tolist(), [0.0, 100.0])
+        self.assertEqual(panel.data[:, 0].tolist(), [0.0, 0.0])
+        for protocol in (2, 4):
+            result = pickle.loads(pickle.dumps(self.series, protocol))
+            result.data[0] = 1
+            self.assertEqual(result[0], 1.0)
+        result = copy.deepcopy(self.series[2:6])
+        result.data[0] = 1
+        self.assertEqual(self.series[2], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""Lazy expressions
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, nominal_rate
+from cashflows.gcashana import timevalue
+from cashflows.lazy import lazy, evaluate, _program
+
+
+class LazyTestCase(unittest.TestCase):
+    """Evaluation of lazy expressions by blocks"""
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.revenue = TimeSeries(nper=40000, pyr=12)
+        self.revenue.data[:] = rng.uniform(50, 100, 40000)
+        self.costs = TimeSeries(nper=40000, pyr=12)
+        self.costs.data[:] = rng.uniform(20, 80, 40000)
+        self.panel = TimeSeriesPanel(nrows=3, nper=40000, pyr=12)
+        self.panel.data[:] = rng.normal(size=(3, 40000))
+
+    def test_eager(self):
+        tax = nominal_rate([30] * 40000, pyr=12) / 100
+        expr = (lazy(self.revenue) - self.costs) * (1 - tax) + abs(-lazy(self.panel)) ** 2
+        expected = (self.revenue - self.costs) * (1 - tax) + self.panel * self.panel
+        np.testing.assert_allclose(expr.data, expected.data)
+        self.assertIsInstance(expr.evaluate(), TimeSeriesPanel)
+        marr = nominal_rate([12] * 40000, pyr=12)
+        np.testing.assert_allclose(timevalue(expr, marr), timevalue(expected, marr))
+
+    def test_common_subexpressions(self):
+        profit = lazy(self.revenue) - self.costs
+        other = lazy(self.revenue) - self.costs
+        program, outputs = _program([profit * 2, other * 3, profit * 2])
+        # revenue, costs, profit, profit * 2, profit * 3
+        self.assertEqual(len(program), 5)
+        self.assertEqual(outputs[0], outputs[2])
+        double, triple, _ = evaluate(profit * 2, other * 3, profit * 2)
+        np.testing.assert_allclose(triple.data, 1.5 * double.data)
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            lazy([1, 2, 3])
+        with self.assertRaises(ValueError):
+            lazy(self.revenue) + TimeSeries(nper=40000, pyr=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Loans
+
+"""
+
+import unittest
+import pickle
+import numpy as np
+
+from cashflows.gtimeseries import cashflow, nominal_rate
+from cashflows.loan import LoanBook, fixed_rate_loan, fixed_ppal_loan
+
+
+def loop_fixed_ppal(amount, nrate, grace, prepmt, pyr=1):
+    """Principal payments and ending balances of a fixed principal loan,
+    computed period by period."""
+    pmt = amount / (len(nrate) - grace - 1)
+    ppalpmt, endbal = [0.0], [amount - prepmt[0]]
+    for time in range(1, len(nrate)):
+        ppal = prepmt[time] + (pmt if time > grace else 0)
+        if endbal[-1] - ppal < 0:
+            ppal = endbal[-1]
+            pmt = 0
+        ppalpmt.append(ppal)
+        endbal.append(endbal[-1] - ppal)
+    return ppalpmt, endbal
+
+
+class LoanBookTestCase(unittest.TestCase):
+    """Loan book against individual fixed rate loans"""
+
+    def assertSameLoan(self, book, index, loan):
+        """Compares the schedules of a loan of the book with `loan`."""
+        for name in ['begppalbal', 'intpmt', 'ppalpmt', 'totpmt', 'endppalbal']:
+            expected = getattr(loan, name).tolist()
+            np.testing.assert_allclose(getattr(book[index], name).tolist(), expected, atol=1e-9)
+            self.assertTrue((getattr(book, name)[index, len(expected):] == 0).all())
+
+    def test_fixed_rate_loan(self):
+        amount = [1000, 500, 2000, 750]
+        nrate = [10, 0, 18, 6]
+        life = [8, 6, 8, 4]
+        grace = [0, 2, 1, 3]
+        prepmt = np.zeros((4, 10))
+        prepmt[0, 4] = 300     # partial prepayment
+        prepmt[2, 3] = 5000    # early payoff
+        prepmt[3, 5] = -400    # capitalization
+        balloonpmt = np.zeros((4, 10))
+        balloonpmt[1, 8] = 100
+        book = LoanBook(amount=amount, nrate=nrate, life=life, pyr=4, grace=grace,
+                        dispoints=0.01, orgpoints=0.02, prepmt=prepmt, balloonpmt=balloonpmt)
+        for index in range(4):
+            nper = life[index] + grace[index] + 1
+            loan = fixed_rate_loan(amount=amount[index], nrate=nrate[index], life=life[index],
+                                   start=None, pyr=4, grace=grace[index], dispoints=0.01,
+                                   orgpoints=0.02,
+                                   prepmt=cashflow(prepmt[index, :nper].tolist(), pyr=4),
+                                   balloonpmt=cashflow(balloonpmt[index, :nper].tolist(), pyr=4))
+            self.assertSameLoan(book, index, loan)
+            np.testing.assert_allclose(book.to_cashflow(30).data[index, :nper],
+                                       loan.to_cashflow(30).tolist(), atol=1e-9)
+
+    def test_periods(self):
+        with self.assertRaises(ValueError):
+            LoanBook(amount=[1000, 500], nrate=10, life=4, prepmt=np.zeros((2, 3)))
+
+    def test_fixed_ppal_redraw(self):
+        # the loan is paid off at the period 2, and 50 is redrawn at the
+        # period 3; the redraw is not amortized by the periodic payment
+        loan = fixed_ppal_loan(amount=1000, nrate=nominal_rate([10] * 6),
+                               prepmt=cashflow([0, 0, 900, -50, 0, 0]))
+        self.assertEqual(loan.ppalpmt.tolist(), [0.0, 200.0, 800.0, -50.0, 0.0, 0.0])
+        self.assertEqual(loan.endppalbal.tolist(), [1000.0, 800.0, 0.0, 50.0, 50.0, 50.0])
+        np.testing.assert_allclose(loan.totpmt.tolist(), [0.0, 300.0, 880.0, -50.0, 5.0, 5.0])
+
+    def test_fixed_ppal_loop(self):
+        rng = np.random.RandomState(9)
+        for _ in range(50):
+            prepmt = np.where(rng.uniform(size=12) < 0.2, rng.uniform(-100, 600, 12), 0).round(2)
+            prepmt[0] = 0
+            nrate = nominal_rate(rng.uniform(0, 15, 12).round(2).tolist(), pyr=4)
+            grace = rng.randint(0, 3)
+            loan = fixed_ppal_loan(amount=1000, nrate=nrate, grace=grace,
+                                   prepmt=cashflow(prepmt.tolist(), pyr=4))
+            ppalpmt, endbal = loop_fixed_ppal(1000, nrate, grace, prepmt)
+            np.testing.assert_allclose(loan.ppalpmt.tolist(), ppalpmt, atol=1e-9)
+            np.testing.assert_allclose(loan.endppalbal.tolist(), endbal, atol=1e-9)
+            np.testing.assert_allclose(loan.intpmt.data[1:],
+                                       np.array(endbal[:-1]) * nrate.data[1:] / 400, atol=1e-9)
+
+    def test_pickle(self):
+        loan = fixed_rate_loan(amount=1000, nrate=12, life=24, start=(2020, 0), pyr=12)
+        result = pickle.loads(pickle.dumps(loan, protocol=5))
+        for name in ['begppalbal', 'intpmt', 'ppalpmt', 'totpmt', 'endppalbal']:
+            self.assertIs(getattr(result, name).axis, getattr(loan, name).axis)
+            self.assertEqual(getattr(result, name).tolist(), getattr(loan, name).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
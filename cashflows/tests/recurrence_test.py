@@ -0,0 +1,110 @@
+"""Linear recurrences
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeries, TimeSeriesPanel, cashflow, nominal_rate
+from cashflows.recurrence import affine_scan, affine_scan_floor
+
+
+def loop_scan(acoef, bcoef, init, start=None):
+    """Values of the recurrence (and independent terms) computed period by
+    period, with a floor at zero from `start`."""
+    values, flows = [], []
+    previous = init
+    for time, (xacoef, xbcoef) in enumerate(zip(acoef, bcoef)):
+        current = xacoef * previous + xbcoef
+        if start is not None and time >= start and xbcoef < 0 and current < 0:
+            xbcoef = -xacoef * previous
+            current = 0.0
+        values.append(current)
+        flows.append(xbcoef)
+        previous = current
+    return values, flows
+
+
+class AffineScanTestCase(unittest.TestCase):
+    """Recurrences against a loop over the periods"""
+
+    def setUp(self):
+        rng = np.random.RandomState(6)
+        self.acoef = rng.uniform(0.98, 1.03, size=(300, 97))
+        self.bcoef = rng.uniform(-60, 50, size=(300, 97))
+        self.init = rng.uniform(0, 200, size=300)
+
+    def test_single(self):
+        expected, _ = loop_scan(self.acoef[0], self.bcoef[0], self.init[0])
+        np.testing.assert_allclose(affine_scan(self.acoef[0], self.bcoef[0], self.init[0]), expected)
+        for workers in (2, 3, 8):
+            np.testing.assert_allclose(affine_scan(self.acoef[0], self.bcoef[0], self.init[0],
+                                                   workers=workers), expected)
+
+    def test_batches(self):
+        for nrows in (5, 300):
+            result = affine_scan(self.acoef[:nrows], self.bcoef[:nrows], self.init[:nrows])
+            self.assertEqual(result.shape, (nrows, 97))
+            for row in range(0, nrows, 37):
+                expected, _ = loop_scan(self.acoef[row], self.bcoef[row], self.init[row])
+                np.testing.assert_allclose(result[row], expected)
+        result = affine_scan(self.acoef[:5], self.bcoef[:5], self.init[:5], workers=4)
+        np.testing.assert_allclose(result[3], loop_scan(self.acoef[3], self.bcoef[3], self.init[3])[0])
+
+    def test_series(self):
+        result = affine_scan(a=nominal_rate([10] * 4) / 100 + 1, b=cashflow([100] * 4))
+        self.assertIsInstance(result, TimeSeries)
+        panel = TimeSeriesPanel([cashflow([100] * 4), cashflow([50] * 4)])
+        result = affine_scan(a=1, b=panel, init=[0, 10])
+        self.assertIsInstance(result, TimeSeriesPanel)
+        self.assertEqual(result.tolist(), [[100.0, 200.0, 300.0, 400.0], [60.0, 110.0, 160.0, 210.0]])
+        with self.assertRaises(ValueError):
+            affine_scan(a=1, b=2)
+
+
+class AffineScanFloorTestCase(unittest.TestCase):
+    """Recurrences with a floor at zero against a loop over the periods"""
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.acoef = rng.uniform(1.0, 1.02, size=(300, 120))
+        self.bcoef = rng.uniform(-100, 80, size=(300, 120))
+        self.init = rng.uniform(0, 100, size=300)
+
+    def assertRows(self, result, rows, start):
+        """Compares the rows of `result` with the loop."""
+        values, flows = result
+        for row in rows:
+            expected = loop_scan(self.acoef[row], self.bcoef[row], self.init[row], start)
+            np.testing.assert_allclose(values[row], expected[0], atol=1e-9)
+            np.testing.assert_allclose(flows[row], expected[1], atol=1e-9)
+
+    def test_single(self):
+        for start in (0, 1, 50):
+            values, flows = affine_scan_floor(self.acoef[0], self.bcoef[0], self.init[0], start=start)
+            expected = loop_scan(self.acoef[0], self.bcoef[0], self.init[0], start)
+            np.testing.assert_allclose(values, expected[0], atol=1e-9)
+            np.testing.assert_allclose(flows, expected[1], atol=1e-9)
+            self.assertTrue((values[start:] >= 0).all())
+
+    def test_batches(self):
+        for nrows in (7, 300):
+            result = affine_scan_floor(self.acoef[:nrows], self.bcoef[:nrows], self.init[:nrows], start=3)
+            self.assertRows(result, range(0, nrows, 23), 3)
+        result = affine_scan_floor(self.acoef[:7], self.bcoef[:7], self.init[:7], start=2, workers=3)
+        self.assertRows(result, range(7), 2)
+        result = affine_scan_floor(self.acoef, self.bcoef, self.init, workers=4)
+        self.assertRows(result, range(0, 300, 41), 0)
+
+    def test_long(self):
+        # many floored periods and values beyond the range of the products
+        # of the coefficients
+        bcoef = np.tile([100.0, -150.0], 20000)
+        values, flows = affine_scan_floor(1.05, bcoef)
+        expected = loop_scan([1.05] * 40000, bcoef, 0, 0)
+        np.testing.assert_allclose(values, expected[0])
+        np.testing.assert_allclose(flows, expected[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
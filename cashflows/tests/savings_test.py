@@ -0,0 +1,58 @@
+"""Savings accounts
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeriesPanel, cashflow, nominal_rate
+from cashflows.savings import savings
+
+
+def loop_savings(deposits, rate, initbal, pyr=1):
+    """Interest and ending balance computed period by period."""
+    interest, endbal = [], []
+    balance = initbal
+    for time, (deposit, xrate) in enumerate(zip(deposits, rate)):
+        xinterest = balance * xrate / 100 / pyr
+        if time > 0 and deposit < 0 and -deposit > balance + xinterest:
+            deposit = -(balance + xinterest)
+        balance = balance + deposit + xinterest
+        interest.append(xinterest)
+        endbal.append(balance)
+    return interest, endbal
+
+
+class SavingsTestCase(unittest.TestCase):
+    """Balances against a loop over the periods"""
+
+    def setUp(self):
+        rng = np.random.RandomState(8)
+        self.deposits = [cashflow(rng.uniform(-150, 100, 60).round(2).tolist(), pyr=12)
+                         for _ in range(4)]
+        self.rate = nominal_rate(rng.uniform(1, 9, 60).round(2).tolist(), pyr=12)
+
+    def test_series(self):
+        for deposits, initbal in zip(self.deposits, (0, 50, 500, 0)):
+            interest, endbal = savings(deposits, self.rate, initbal=initbal)
+            expected = loop_savings(deposits.tolist(), self.rate.tolist(), initbal, pyr=12)
+            np.testing.assert_allclose(interest.tolist(), expected[0], atol=1e-9)
+            np.testing.assert_allclose(endbal.tolist(), expected[1], atol=1e-9)
+
+    def test_panel(self):
+        initbal = [0, 50, 500, 0]
+        interest, endbal = savings(TimeSeriesPanel(self.deposits), self.rate, initbal=initbal)
+        for row, (deposits, xinitbal) in enumerate(zip(self.deposits, initbal)):
+            expected = loop_savings(deposits.tolist(), self.rate.tolist(), xinitbal, pyr=12)
+            np.testing.assert_allclose(interest.data[row], expected[0], atol=1e-9)
+            np.testing.assert_allclose(endbal.data[row], expected[1], atol=1e-9)
+
+    def test_first_withdrawal(self):
+        # the withdrawals of the first period are not limited
+        interest, endbal = savings(cashflow([-100, 50, -80]), nominal_rate([10] * 3))
+        np.testing.assert_allclose(endbal.tolist(), [-100.0, -60.0, 0.0], atol=1e-9)
+        np.testing.assert_allclose(interest.tolist(), [0.0, -10.0, -6.0], atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
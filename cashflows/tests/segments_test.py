@@ -0,0 +1,74 @@
+"""Piecewise constant time series
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import TimeSeries, cashflow, nominal_rate
+from cashflows.gcashcomp import to_discount_factor
+from cashflows.gcashana import timevalue
+from cashflows.segments import SegmentSeries, compact, segment_rate
+
+
+class SegmentSeriesTestCase(unittest.TestCase):
+    """Operations over the segments and the dense values"""
+
+    def setUp(self):
+        self.rate = segment_rate(const_value=5, start=(2000, 0), nper=48, pyr=4,
+                                 spec=[(10, 0), ((2005, 0), 9), (30, 7)])
+        values = np.repeat([100.0, -20.0, 0.0, 50.0], [5, 12, 20, 11])
+        self.flows = compact(cashflow(values.tolist(), start=(2000, 0), pyr=4))
+
+    def test_encoding(self):
+        self.assertEqual(self.rate.starts.tolist(), [0, 10, 20, 30])
+        self.assertEqual(self.flows.nsegments, 4)
+        self.assertEqual(compact(self.flows.dense()).starts.tolist(), self.flows.starts.tolist())
+        rate = nominal_rate(5, start=(2000, 0), nper=48, pyr=4,
+                            spec=[(10, 0), ((2005, 0), 9), (30, 7)])
+        self.assertEqual(self.rate.tolist(), rate.tolist())
+        with self.assertRaises(ValueError):
+            SegmentSeries(self.rate.axis, [1, 5], [1, 2])
+
+    def test_operations(self):
+        dense = self.flows.dense() * 2 - self.rate.dense()
+        result = self.flows * 2 - self.rate
+        self.assertIsInstance(result, SegmentSeries)
+        self.assertEqual(result.tolist(), dense.tolist())
+        self.assertEqual((1 / (self.rate + 1)).tolist(), (1 / (self.rate.dense() + 1)).tolist())
+        result = self.rate.dense() + self.flows
+        self.assertIsInstance(result, TimeSeries)
+        self.assertEqual(result.tolist(), (self.rate.dense() + self.flows.dense()).tolist())
+        with self.assertRaises(ValueError):
+            self.rate + segment_rate(1, nper=48, pyr=4)
+
+    def test_indexing(self):
+        # slices and timeids are resolved on the axis, without the dense values
+        view = self.rate[(2001, 2):(2010, 1)]
+        self.assertIsNone(self.rate._data)
+        self.assertEqual((view.start, view.end, len(view)), ((2001, 2), (2010, 1), 36))
+        self.assertEqual(view.starts.tolist(), [0, 4, 14, 24])
+        self.assertEqual(self.rate[-5:].start, (2010, 3))
+        with self.assertRaises(ValueError):
+            self.rate[0:10:2]
+        dense = self.flows.dense()
+        self.assertEqual([self.flows[t] for t in range(48)], dense.tolist())
+        self.assertEqual(self.flows[(2003, 1)], dense[(2003, 1)])
+        view = self.flows[3:40]
+        self.assertEqual(view.start, (2000, 3))
+        self.assertEqual(view.tolist(), dense[3:40].tolist())
+        with self.assertRaises(IndexError):
+            self.flows[48]
+
+    def test_discount(self):
+        dense = self.rate.dense()
+        np.testing.assert_allclose(to_discount_factor(self.rate, base_date=7),
+                                   to_discount_factor(dense, base_date=7))
+        for base_date in (0, 13, (2011, 3)):
+            self.assertAlmostEqual(timevalue(self.flows, self.rate, base_date),
+                                   timevalue(self.flows.dense(), dense, base_date))
+        self.assertAlmostEqual(timevalue(self.flows, dense), timevalue(self.flows.dense(), dense))
+
+
+if __name__ == '__main__':
+    unittest.main()
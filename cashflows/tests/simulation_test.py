@@ -0,0 +1,91 @@
+"""Monte Carlo simulation
+
+"""
+
+import unittest
+import numpy as np
+
+from cashflows.gtimeseries import cashflow, nominal_rate
+from cashflows.gcashcomp import after_tax_cashflow, const2curr
+from cashflows.gcashana import timevalue, irr, benefit_cost_ratio
+from cashflows.simulation import simulate, simulate_cashflows
+from cashflows.simulation import StochasticSeries, Normal, Uniform, Triangular
+
+
+class SimulationTestCase(unittest.TestCase):
+    """Simulation of the net present value, IRR and B/C ratio"""
+
+    def setUp(self):
+        self.investment = cashflow([0] * 6, spec=(0, -1000))
+        self.revenues = StochasticSeries(cashflow([0] + [300] * 5),
+                                         scale=Triangular(0.5, 1, 1.2),
+                                         shift=Normal(0, 20, per_period=True))
+        self.marr = StochasticSeries(nominal_rate([12] * 6), shift=Uniform(-2, 2))
+
+    def test_deterministic(self):
+        cflo = cashflow([100] * 6, spec=[(0, -500), (3, -50)])
+        marr = nominal_rate([8] * 6)
+        inflation = nominal_rate([3] * 6)
+        tax_rate = nominal_rate([30] * 6)
+        result = simulate(cflo, marr, inflation=inflation, tax_rate=tax_rate, ndraws=2)
+        expected = const2curr(cflo, inflation)
+        expected = expected - after_tax_cashflow(expected, tax_rate)
+        self.assertAlmostEqual(result['npv'][1], timevalue(expected, marr))
+        self.assertAlmostEqual(result['irr'][1], irr(expected))
+        self.assertAlmostEqual(result['bcr'][1], benefit_cost_ratio(expected, marr))
+
+    def test_reproducible(self):
+        cflo = [self.investment, self.revenues]
+        result = simulate(cflo, self.marr, ndraws=5000, seed=3, chunk_size=1000)
+        other = simulate(cflo, self.marr, ndraws=5000, seed=3, chunk_size=1000, workers=3)
+        for key in ('npv', 'irr', 'bcr'):
+            np.testing.assert_array_equal(result[key], other[key])
+        other = simulate(cflo, self.marr, ndraws=5000, seed=4, chunk_size=1000)
+        self.assertFalse((result['npv'] == other['npv']).any())
+
+    def test_panel(self):
+        cflo = [self.investment, self.revenues]
+        marr = nominal_rate([12] * 6)
+        panel = simulate_cashflows(cflo, ndraws=3000, seed=5, chunk_size=700)
+        result = simulate(cflo, marr, ndraws=3000, seed=5, chunk_size=700)
+        self.assertEqual(panel.data.shape, (3000, 6))
+        np.testing.assert_allclose(result['npv'], timevalue(panel, marr))
+        np.testing.assert_allclose(result['irr'], irr(panel))
+
+    def test_summary(self):
+        cflo = [self.investment, self.revenues]
+        result = simulate(cflo, self.marr, ndraws=5000, seed=8, chunk_size=1000)
+        summary = simulate(cflo, self.marr, ndraws=5000, seed=8, chunk_size=1000,
+                           summary=True, workers=2)
+        for key in ('npv', 'irr', 'bcr'):
+            values = result[key][np.isfinite(result[key])]
+            self.assertEqual(summary[key].count, values.size)
+            self.assertAlmostEqual(summary[key].mean, values.mean())
+            self.assertAlmostEqual(summary[key].std, values.std())
+        self.assertAlmostEqual(summary['npv'].probability_of_loss, (result['npv'] < 0).mean())
+
+    def test_period_parameters(self):
+        rng = np.random.default_rng(12)
+        values = Normal(mean=[1, 1.1, 1.2], std=[0.1, 0.2, 0.3]).sample(rng, 1000, 3)
+        self.assertEqual(values.shape, (1000, 3))
+        standard = (values - [1, 1.1, 1.2]) / [0.1, 0.2, 0.3]
+        np.testing.assert_allclose(standard, np.repeat(standard[:, [0]], 3, axis=1))
+        values = Uniform(low=[0, 10], high=[1, 20]).sample(rng, 1000, 2)
+        np.testing.assert_allclose(values[:, 1], 10 + 10 * values[:, 0])
+        values = Triangular(left=[0, 0], mode=[0.5, 1], right=[1, 2]).sample(rng, 1000, 2)
+        np.testing.assert_allclose(values[:, 1], 2 * values[:, 0])
+        self.assertTrue(((values >= 0) & (values <= [1, 2])).all())
+        self.assertAlmostEqual(values[:, 0].mean(), 0.5, delta=0.03)
+        # scalar parameters give the draws of the generator
+        values = Uniform(2, 3).sample(np.random.default_rng(1), 5, 4)
+        np.testing.assert_allclose(values, np.random.default_rng(1).uniform(2, 3, size=(5, 1)))
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            simulate([100] * 5, nominal_rate([10] * 5))
+        with self.assertRaises(ValueError):
+            simulate(cashflow([100] * 5), nominal_rate([10] * 5), ndraws=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
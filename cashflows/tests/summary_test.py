@@ -0,0 +1,64 @@
+"""Streaming summaries
+
+"""
+
+import pickle
+import unittest
+import numpy as np
+
+from cashflows.summary import Summary
+
+
+class SummaryTestCase(unittest.TestCase):
+    """Moments and quantiles computed chunk by chunk"""
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.values = np.concatenate([rng.lognormal(3, 1, 30000) - 30,
+                                      rng.normal(-5, 2, 20000), [np.nan, 0.0]])
+        self.finite = self.values[np.isfinite(self.values)]
+
+    def summarize(self, chunks):
+        result = Summary()
+        for chunk in chunks:
+            summary = Summary()
+            summary.update(chunk)
+            # summaries are sent between processes
+            result.merge(pickle.loads(pickle.dumps(summary)))
+        return result
+
+    def test_moments(self):
+        summary = self.summarize(np.array_split(self.values, 7))
+        deviation = self.finite - self.finite.mean()
+        self.assertEqual(summary.count, self.finite.size)
+        self.assertEqual(summary.nans, 1)
+        self.assertAlmostEqual(summary.mean, self.finite.mean())
+        self.assertAlmostEqual(summary.variance, self.finite.var())
+        self.assertAlmostEqual(summary.skewness,
+                               (deviation**3).mean() / self.finite.std()**3)
+        self.assertEqual(summary.min, self.finite.min())
+        self.assertEqual(summary.max, self.finite.max())
+        self.assertAlmostEqual(summary.probability_of_loss, (self.finite < 0).mean())
+
+    def test_quantiles(self):
+        summary = self.summarize(np.array_split(self.values, 3))
+        qarr = np.linspace(0, 1, 41)
+        expected = np.quantile(self.finite, qarr, method='lower')
+        result = summary.quantile(qarr)
+        tolerance = 0.01 * np.abs(expected) + 1e-12
+        self.assertTrue((np.abs(result - expected) <= tolerance).all())
+
+    def test_merge_order(self):
+        chunks = np.array_split(self.values, 5)
+        summary = self.summarize(chunks)
+        other = self.summarize(chunks[::-1])
+        self.assertAlmostEqual(summary.mean, other.mean)
+        self.assertAlmostEqual(summary.variance, other.variance)
+        np.testing.assert_array_equal(summary.quantile([0.1, 0.5, 0.9]),
+                                      other.quantile([0.1, 0.5, 0.9]))
+        with self.assertRaises(ValueError):
+            summary.merge(Summary(relative_accuracy=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()